@@ -0,0 +1,180 @@
+#! /usr/bin/env python
+"""
+Compare the per-tick cost of updating and serializing kernel metrics
+between the legacy Decimal-based metric objects and the MetricStore-backed ones.
+
+Usage: python scripts/bench-metric-store.py [--kernels 1000] [--metrics 8] [--ticks 20]
+"""
+
+import argparse
+from decimal import Decimal
+import random
+import time
+from typing import List, Optional, Tuple
+
+from ai.backend.agent.stats import (
+    Measurement,
+    Metric,
+    MetricStore,
+    MetricTypes,
+)
+from ai.backend.agent.utils import remove_exponent
+
+
+class LegacyMovingStatistics:
+    # The Decimal-based implementation used before MetricStore.
+
+    def __init__(self, initial_value: Decimal) -> None:
+        self._sum = initial_value
+        self._min = initial_value
+        self._max = initial_value
+        self._count = 1
+        self._last: List[Tuple[Decimal, float]] = [(initial_value, time.perf_counter())]
+
+    def update(self, value: Decimal) -> None:
+        self._sum += value
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+        self._count += 1
+        self._last.append((value, time.perf_counter()))
+        if len(self._last) > 2:
+            self._last.pop(0)
+
+    @property
+    def diff(self) -> Decimal:
+        if len(self._last) == 2:
+            return self._last[-1][0] - self._last[-2][0]
+        return Decimal(0)
+
+    @property
+    def rate(self) -> Decimal:
+        if len(self._last) == 2:
+            return ((self._last[-1][0] - self._last[-2][0]) /
+                    Decimal(self._last[-1][1] - self._last[-2][1]))
+        return Decimal(0)
+
+    def to_serializable_dict(self):
+        q = Decimal('0.000')
+        return {
+            'min': str(remove_exponent(self._min.quantize(q))),
+            'max': str(remove_exponent(self._max.quantize(q))),
+            'sum': str(remove_exponent(self._sum.quantize(q))),
+            'avg': str(remove_exponent((self._sum / self._count).quantize(q))),
+            'diff': str(remove_exponent(self.diff.quantize(q))),
+            'rate': str(remove_exponent(self.rate.quantize(q))),
+            'version': 2,
+        }
+
+
+class LegacyMetric:
+
+    def __init__(self, key: str, current: Decimal, capacity: Optional[Decimal],
+                 stats_filter, current_hook=None) -> None:
+        self.key = key
+        self.current = current
+        self.capacity = capacity
+        self.stats = LegacyMovingStatistics(current)
+        self.stats_filter = stats_filter
+        self.current_hook = current_hook
+
+    def update(self, value: Measurement) -> None:
+        if value.capacity is not None:
+            self.capacity = value.capacity
+        self.stats.update(value.value)
+        self.current = value.value
+        if self.current_hook is not None:
+            self.current = self.current_hook(self)
+
+    def to_serializable_dict(self):
+        q = Decimal('0.000')
+        q_pct = Decimal('0.00')
+        return {
+            'current': str(remove_exponent(self.current.quantize(q))),
+            'capacity': (str(remove_exponent(self.capacity.quantize(q)))
+                         if self.capacity is not None else None),
+            'pct': (
+                str(remove_exponent(
+                    (Decimal(self.current) / Decimal(self.capacity) * 100).quantize(q_pct)))
+                if (self.capacity is not None and
+                    self.capacity.is_normal() and
+                    self.capacity > 0)
+                else None),
+            'unit_hint': None,
+            **{f'stats.{k}': v
+               for k, v in self.stats.to_serializable_dict().items()
+               if k in self.stats_filter},
+        }
+
+
+def metric_specs(num_metrics: int):
+    # Mimic the intrinsic plugins: a mix of plain usage metrics and hooked counters.
+    specs = []
+    for idx in range(num_metrics):
+        if idx % 2 == 0:
+            specs.append((f'metric{idx}', Decimal(8 * 2 ** 30), frozenset({'max'}), None))
+        else:
+            specs.append((f'metric{idx}', None, frozenset({'rate'}),
+                          lambda metric: metric.stats.diff))
+    return specs
+
+
+def run(make_metric, num_kernels: int, num_metrics: int, num_ticks: int,
+        samples: List[List[List[Measurement]]]) -> float:
+    specs = metric_specs(num_metrics)
+    kernels = [
+        [make_metric(key, samples[0][k][m].value, capacity, stats_filter, hook)
+         for m, (key, capacity, stats_filter, hook) in enumerate(specs)]
+        for k in range(num_kernels)
+    ]
+    begin = time.perf_counter()
+    for tick in range(1, num_ticks):
+        for k, metrics in enumerate(kernels):
+            measures = samples[tick][k]
+            for m, metric in enumerate(metrics):
+                metric.update(measures[m])
+        for metrics in kernels:
+            for metric in metrics:
+                metric.to_serializable_dict()
+    return (time.perf_counter() - begin) / (num_ticks - 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--kernels', type=int, default=1000)
+    parser.add_argument('--metrics', type=int, default=8)
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    q = Decimal('0.000')
+    # Plugins report Decimal measurements in both cases; generate them up front.
+    samples = [
+        [
+            [Measurement(Decimal(rng.random() * 2 ** 32).quantize(q))
+             for _ in range(args.metrics)]
+            for _ in range(args.kernels)
+        ]
+        for _ in range(args.ticks)
+    ]
+
+    legacy_elapsed = run(
+        lambda key, current, capacity, stats_filter, hook:
+            LegacyMetric(key, current, capacity, stats_filter, hook),
+        args.kernels, args.metrics, args.ticks, samples,
+    )
+    store = MetricStore()
+    store_elapsed = run(
+        lambda key, current, capacity, stats_filter, hook:
+            Metric(key, MetricTypes.USAGE, store=store,
+                   current=current, capacity=capacity,
+                   stats_filter=stats_filter, current_hook=hook),
+        args.kernels, args.metrics, args.ticks, samples,
+    )
+    print(f'{args.kernels} kernels x {args.metrics} metrics, per tick (update + serialize):')
+    print(f'  legacy Decimal metrics: {legacy_elapsed * 1000:8.2f} ms')
+    print(f'  MetricStore metrics:    {store_elapsed * 1000:8.2f} ms')
+    print(f'  speedup: {legacy_elapsed / store_elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
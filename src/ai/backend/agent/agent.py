@@ -4,7 +4,7 @@ from abc import ABCMeta, abstractmethod
 import asyncio
 from collections import defaultdict
 from decimal import Decimal
-from io import BytesIO, SEEK_END
+import hashlib
 import json
 import logging
 from pathlib import Path
@@ -13,6 +13,8 @@ import pkg_resources
 import platform
 import re
 import signal
+import time
+import uuid
 from typing import (
     Any,
     AsyncIterator,
@@ -56,7 +58,7 @@ from ai.backend.common.types import (
     HardwareMetadata, aobject,
     # TODO: eliminate use of ContainerId
     ContainerId, KernelId,
-    DeviceName, SlotName,
+    DeviceName, DeviceModelInfo, SlotName,
     AutoPullBehavior, ImageRegistry,
     ClusterInfo,
     KernelCreationConfig,
@@ -75,19 +77,31 @@ from ai.backend.common.plugin.monitor import ErrorPluginContext, StatsPluginCont
 from ai.backend.common.service_ports import parse_service_ports
 from . import __version__ as VERSION
 from .defs import ipc_base_path
+from .events import EventBatchProducer
 from .exception import ResourceError
+from .images import ImagePullCoordinator, ImagePullProgress, PullProgressCallback
 from .kernel import (
     AbstractKernel,
     KernelFeatures,
     match_distro_data,
 )
+from .logs import (
+    ContainerLogReader,
+    LogChunker,
+    LogChunkWriter,
+    LogFollower,
+    get_log_keys,
+)
 from .resources import (
     AbstractComputeDevice,
     AbstractComputePlugin,
     AbstractAllocMap,
     KernelResourceSpec,
     Mount,
+    diff_allocations,
 )
+from .registry import KernelRegistryJournal
+from .spool import RedisCommand, RedisSpool, redis_unavailable_errors
 from .stats import (
     StatContext, StatModes,
 )
@@ -100,12 +114,27 @@ from .types import (
 from .utils import (
     generate_agent_id,
 )
+from .timing import PhaseLatencyHistogram, PhaseTimer, phase
+from .warmpool import WarmPool, get_warm_pool_key
 
 if TYPE_CHECKING:
     from ai.backend.common.etcd import AsyncEtcd
 
 log = BraceStyleAdapter(logging.getLogger('ai.backend.agent.agent'))
 
+# The number of log chunks stored to Redis at once while collecting container logs.
+log_chunks_per_batch = 16
+
+# The time to wait for the log followers to reach the end of the terminated containers' logs.
+log_follower_grace_period = 5.0
+
+# The expiration of the logs stored by the followers, refreshed upon every write.
+# It lets Redis remove the logs of the kernels cleaned up while the agent is not running.
+log_follower_ttl = 86400.0
+
+# The compute plugins rarely change their extra information (e.g., driver versions).
+compute_plugins_info_ttl = 300.0
+
 _sentinel = Sentinel.TOKEN
 
 ACTIVE_STATUS_SET = frozenset([
@@ -130,7 +159,8 @@ class KernelCreationContext:
     image_ref: ImageRef
     internal_data: Mapping[str, Any]
     restarting: bool
-    cancellation_handlers: Sequence[Callable[[], Awaitable[None]]]
+    warm: bool
+    cancellation_handlers: MutableSequence[Callable[[], Awaitable[None]]]
 
 
 KernelCreationContextType = TypeVar('KernelCreationContextType', bound=KernelCreationContext)
@@ -158,11 +188,14 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
     etcd: AsyncEtcd
     agent_id: str
     kernel_registry: MutableMapping[KernelId, AbstractKernel]
+    registry_journal: KernelRegistryJournal
     computers: MutableMapping[str, ComputerContext]
     images: Mapping[str, str]
     port_pool: Set[int]
 
     redis: aioredis.Redis
+    redis_spool: RedisSpool
+    event_producer: EventBatchProducer
     zmq_ctx: zmq.asyncio.Context
 
     restarting_kernels: MutableMapping[KernelId, RestartTracker]
@@ -177,6 +210,19 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
     error_monitor: ErrorPluginContext
 
     _pending_creation_tasks: Dict[str, Set[asyncio.Task]]
+    _allocating_kernels: Dict[KernelId, asyncio.Task]
+    warm_pool: WarmPool
+    _warm_pool_tasks: Set[asyncio.Task]
+    _log_followers: Dict[KernelId, LogFollower]
+    phase_latencies: PhaseLatencyHistogram
+    image_pulls: ImagePullCoordinator
+
+    _images_blob: bytes
+    _images_digest: str
+    _images_sent_digest: Optional[str]
+    _full_heartbeat_requested: bool
+    _compute_plugins_info: Optional[Mapping[str, Any]]
+    _compute_plugins_info_updated_at: float
 
     def __init__(
         self,
@@ -193,11 +239,20 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         self.local_config = local_config
         self.agent_id = generate_agent_id(__file__)
         self.kernel_registry = {}
+        self.registry_journal = KernelRegistryJournal(
+            ipc_base_path / f'registry.{self.agent_id}.journal',
+        )
         self.computers = {}
         self.images = {}  # repoTag -> digest
+        self._pack_images()
+        self._images_sent_digest = None
+        self._full_heartbeat_requested = False
+        self._compute_plugins_info = None
+        self._compute_plugins_info_updated_at = 0.0
         self.restarting_kernels = {}
+        stats_type = local_config['container']['stats-type']
         self.stat_ctx = StatContext(
-            self, mode=StatModes(local_config['container']['stats-type']),
+            self, mode=StatModes(stats_type) if stats_type not in (None, 'auto') else None,
         )
         self.timer_tasks = []
         self.port_pool = set(range(
@@ -208,6 +263,17 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         self.error_monitor = error_monitor
         self._rx_distro = re.compile(r"\.([a-z-]+\d+\.\d+)\.")
         self._pending_creation_tasks = defaultdict(set)
+        self._allocating_kernels = {}
+        self.warm_pool = WarmPool(
+            size=local_config['container']['warm-pool-size'],
+            max_keys=local_config['container']['warm-pool-images'],
+        )
+        self._warm_pool_tasks = set()
+        self._log_followers = {}
+        self.phase_latencies = PhaseLatencyHistogram()
+        self.image_pulls = ImagePullCoordinator(
+            max_concurrency=local_config['container']['max-concurrent-pulls'],
+        )
 
     async def __ainit__(self) -> None:
         """
@@ -216,7 +282,6 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         """
         self.resource_lock = asyncio.Lock()
         self.container_lifecycle_queue = asyncio.Queue()
-        self.producer_lock = asyncio.Lock()
         self.redis_producer_pool = await redis.connect_with_retries(
             self.local_config['redis']['addr'].as_sockaddr(),
             db=4,  # REDIS_STREAM_DB in gateway.defs
@@ -224,6 +289,16 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                       if self.local_config['redis']['password'] else None),
             encoding=None,
         )
+        spool_config = self.local_config['agent']['spool']
+        self.redis_spool = RedisSpool(
+            # The spool must survive reboots, so it should not be under the IPC base path.
+            spool_config['path'] / str(self.agent_id),
+            segment_size=spool_config['segment-size'],
+            max_size=spool_config['max-size'],
+        )
+        await current_loop().run_in_executor(None, self.redis_spool.open)
+        self.event_producer = EventBatchProducer(self._send_events)
+        self.event_producer.start()
         self.redis_stat_pool = await redis.connect_with_retries(
             self.local_config['redis']['addr'].as_sockaddr(),
             db=0,  # REDIS_STAT_DB in backend.ai-manager
@@ -242,13 +317,15 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             self.computers[name] = ComputerContext(computer, devices, alloc_map)
 
         if not self._skip_initial_scan:
-            self.images = await self.scan_images()
+            self._update_images(await self.scan_images())
             self.timer_tasks.append(aiotools.create_timer(self._scan_images_wrapper, 20.0))
             await self.scan_running_kernels()
 
-        # Prepare stat collector tasks.
-        self.timer_tasks.append(aiotools.create_timer(self.collect_node_stat, 5.0))
-        self.timer_tasks.append(aiotools.create_timer(self.collect_container_stat, 5.0))
+        # Prepare replays of the Redis commands spooled while Redis is unavailable.
+        self.timer_tasks.append(aiotools.create_timer(self.replay_spool, 1.0))
+
+        # Prepare the stat collector task.
+        self.timer_tasks.append(aiotools.create_timer(self.collect_stat, 5.0))
 
         # Prepare heartbeats.
         self.timer_tasks.append(aiotools.create_timer(self.heartbeat, 3.0))
@@ -256,6 +333,13 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         # Prepare auto-cleaning of idle kernels.
         self.timer_tasks.append(aiotools.create_timer(self.sync_container_lifecycles, 10.0))
 
+        # Prepare consistency checks of the incrementally maintained alloc maps.
+        self.timer_tasks.append(aiotools.create_timer(self.check_resource_usage, 60.0))
+
+        # Prepare refills of the warm kernel pool.
+        if self.warm_pool.enabled:
+            self.timer_tasks.append(aiotools.create_timer(self.refill_warm_pool, 10.0))
+
         loop = current_loop()
         self.container_lifecycle_handler = loop.create_task(self.process_lifecycle_events())
 
@@ -283,12 +367,25 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             if isinstance(result, Exception):
                 log.error('timer cancellation error: {}', result)
 
+        # Discard the warm kernels as they are not restored upon restarts.
+        for warm_kernel in self.warm_pool.drain():
+            await self.discard_warm_kernel(warm_kernel)
+        if self._warm_pool_tasks:
+            await asyncio.gather(*self._warm_pool_tasks, return_exceptions=True)
+
+        # Stop following container logs; the followers restart upon the next agent startup.
+        await asyncio.gather(*[
+            follower.stop(0) for follower in self._log_followers.values()
+        ])
+        self._log_followers.clear()
+
         # Stop lifecycle event handler.
         await self.container_lifecycle_queue.put(_sentinel)
         await self.container_lifecycle_handler
 
         # Notify the gateway.
         await self.produce_event('instance_terminated', 'shutdown')
+        await self.event_producer.close()
 
         # Close Redis connection pools.
         self.redis_producer_pool.close()
@@ -298,9 +395,20 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
 
         self.zmq_ctx.term()
 
-    async def produce_event(self, event_name: str, *args) -> None:
+    async def produce_event(
+        self,
+        event_name: str,
+        *args,
+        wait: bool = True,
+        spool: bool = True,
+    ) -> None:
         """
         Send an event to the manager(s).
+
+        The events are sent in batches in the order they are produced.
+        If *wait* is false, return without waiting for the delivery of the event.
+        If *spool* is false, drop the event instead of spooling it while Redis is unavailable,
+        for the events which are meaningless when delivered late.
         """
         if self.local_config['debug']['log-heartbeats']:
             _log = log.debug if event_name == 'instance_heartbeat' else log.info
@@ -321,17 +429,66 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             if pending_creation_tasks is not None:
                 for t in pending_creation_tasks:
                     t.cancel()
-        async with self.producer_lock:
-            def _pipe_builder():
-                pipe = self.redis_producer_pool.pipeline()
-                pipe.rpush('events.prodcons', encoded_event)
-                pipe.publish('events.pubsub', encoded_event)
-                return pipe
-            await redis.execute_with_retries(_pipe_builder)
+        await self.event_producer.produce(encoded_event, wait=wait, spool=spool)
+
+    async def _send_events(self, encoded_events: Sequence[bytes], spool: bool) -> None:
+        await self.write_redis([
+            ('rpush', ('events.prodcons', *encoded_events)),
+            *[('publish', ('events.pubsub', encoded_event)) for encoded_event in encoded_events],
+        ], spool=spool)
+
+    async def write_redis(self, commands: Sequence[RedisCommand], *, spool: bool = True) -> None:
+        """
+        Execute the Redis write commands in a single pipeline, or spool them to the disk
+        if Redis is unavailable or does not respond within the latency budget.
+        While there are spooled commands, the new commands are spooled as well
+        to keep their order.
+        If *spool* is false, the commands are dropped instead of being spooled.
+        """
+        if self.redis_spool.is_empty:
+            try:
+                await self._execute_redis_commands(commands)
+                return
+            except redis_unavailable_errors as e:
+                if not spool:
+                    log.debug('dropping Redis commands as Redis is unavailable ({!r})', e)
+                    return
+                log.warning('spooling Redis commands as Redis is unavailable ({!r})', e)
+        elif not spool:
+            return
+        await self.redis_spool.append(commands)
+
+    async def _execute_redis_commands(self, commands: Sequence[RedisCommand]) -> None:
+        def _pipe_builder():
+            # Use a transaction so that the readers never see the partially applied writes,
+            # such as the container log chunks trimmed without their index entries.
+            pipe = self.redis_producer_pool.multi_exec()
+            for command, args in commands:
+                getattr(pipe, command)(*args)
+            return pipe
+        await asyncio.wait_for(
+            redis.execute_with_retries(_pipe_builder),
+            self.local_config['agent']['spool']['latency-budget'],
+        )
+
+    async def replay_spool(self, interval: float) -> None:
+        if self.redis_spool.is_empty:
+            return
+        try:
+            await self.redis_spool.replay(self._execute_redis_commands)
+        except redis_unavailable_errors:
+            pass  # retry in the next interval
+        except Exception:
+            log.exception('unexpected error while replaying the spooled Redis commands')
+            await self.error_monitor.capture_exception()
 
     async def heartbeat(self, interval: float):
         """
         Send my status information and available kernel images to the manager(s).
+
+        In the "digest" heartbeat mode, the image list is sent only when it has changed
+        since the last heartbeat or when the manager has requested it;
+        otherwise only its digest is sent.
         """
         res_slots = {}
         for cctx in self.computers.values():
@@ -340,6 +497,7 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                     slot_type,
                     str(self.slots.get(slot_key, 0)),
                 )
+        images_digest = self._images_digest
         agent_info = {
             'ip': str(self.local_config['agent']['rpc-listen-addr'].host),
             'region': self.local_config['agent']['region'],
@@ -347,114 +505,216 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             'addr': f"tcp://{self.local_config['agent']['rpc-listen-addr']}",
             'resource_slots': res_slots,
             'version': VERSION,
-            'compute_plugins': {
-                key: {
-                    'version': computer.instance.get_version(),
-                    **(await computer.instance.extra_info())
-                }
-                for key, computer in self.computers.items()
-            },
-            'images': snappy.compress(msgpack.packb([
-                (repo_tag, digest) for repo_tag, digest in self.images.items()
-            ])),
+            'compute_plugins': await self._get_compute_plugins_info(),
+            'images_digest': images_digest,
         }
+        if (
+            self.local_config['agent']['heartbeat-mode'] == 'full'
+            or self._full_heartbeat_requested
+            or self._images_sent_digest != images_digest
+        ):
+            agent_info['images'] = self._images_blob
         try:
-            await self.produce_event('instance_heartbeat', agent_info)
+            await self.produce_event('instance_heartbeat', agent_info, spool=False)
         except asyncio.TimeoutError:
             log.warning('event dispatch timeout: instance_heartbeat')
         except Exception:
             log.exception('instance_heartbeat failure')
             await self.error_monitor.capture_exception()
+        else:
+            if 'images' in agent_info:
+                self._images_sent_digest = images_digest
+                self._full_heartbeat_requested = False
+
+    async def request_full_heartbeat(self) -> None:
+        """
+        Send a heartbeat including the full image list right away,
+        e.g., when the manager has lost track of the image list of this agent.
+        """
+        self._full_heartbeat_requested = True
+        await self.heartbeat(0)
+
+    async def _get_compute_plugins_info(self) -> Mapping[str, Any]:
+        now = time.monotonic()
+        if (
+            self._compute_plugins_info is None
+            or now - self._compute_plugins_info_updated_at >= compute_plugins_info_ttl
+        ):
+            self._compute_plugins_info = {
+                key: {
+                    'version': computer.instance.get_version(),
+                    **(await computer.instance.extra_info())
+                }
+                for key, computer in self.computers.items()
+            }
+            self._compute_plugins_info_updated_at = now
+        return self._compute_plugins_info
 
     async def collect_logs(
         self,
         kernel_id: KernelId,
-        container_id: str,
-        async_log_iterator: AsyncIterator[bytes],
+        container_id: ContainerId,
     ) -> None:
-        chunk_size = self.local_config['agent']['container-logs']['chunk-size']
-        log_key = f'containerlog.{container_id}'
-        log_length = 0
-        chunk_buffer = BytesIO()
-        chunk_length = 0
-        try:
-            async for fragment in async_log_iterator:
-                fragment_length = len(fragment)
-                chunk_buffer.write(fragment)
-                chunk_length += fragment_length
-                log_length += fragment_length
-                while chunk_length >= chunk_size:
-                    cb = chunk_buffer.getbuffer()
-                    stored_chunk = bytes(cb[:chunk_size])
-                    await redis.execute_with_retries(
-                        lambda: self.redis_producer_pool.rpush(
-                            log_key, stored_chunk)
-                    )
-                    remaining = cb[chunk_size:]
-                    chunk_length = len(remaining)
-                    next_chunk_buffer = BytesIO(remaining)
-                    next_chunk_buffer.seek(0, SEEK_END)
-                    del remaining, cb
-                    chunk_buffer.close()
-                    chunk_buffer = next_chunk_buffer
-            assert chunk_length < chunk_size
-            if chunk_length > 0:
-                await redis.execute_with_retries(
-                    lambda: self.redis_producer_pool.rpush(
-                        log_key, chunk_buffer.getvalue())
-                )
-        finally:
-            chunk_buffer.close()
+        """
+        Store the console outputs of a terminated container to Redis and notify the manager.
+        If the logs have been followed while the container was running,
+        only the remaining tail is stored here.
+        """
+        compress = self.local_config['agent']['container-logs']['compression'] == 'snappy'
+        follower = self._log_followers.pop(kernel_id, None)
+        if (
+            follower is not None
+            and await follower.stop(log_follower_grace_period)
+            and await self._are_followed_logs_kept(container_id, follower)
+        ):
+            writer = LogChunkWriter(container_id, compress=compress, offset=follower.offset)
+            tail = follower.flush()
+            if tail is not None:
+                await self.write_redis(writer.store([tail]))
+        else:
+            if follower is not None:
+                log.warning('re-collecting the whole container logs (k:{}, c:{})',
+                            kernel_id, container_id)
+            writer = LogChunkWriter(container_id, compress=compress)
+            # Discard the logs partially stored by the followers, if any.
+            await self.write_redis(writer.reset())
+            await self._store_logs(writer, self.iter_container_logs(container_id, follow=False))
         # Keep the log for at most one hour in Redis.
         # This is just a safety measure to prevent memory leak in Redis
         # for cases when the event delivery has failed or processing
         # the log data has failed.
-        await redis.execute_with_retries(
-            lambda: self.redis_producer_pool.expire(log_key, 3600.0)
-        )
+        await self.write_redis(writer.expire(3600.0))
         await self.produce_event(
             'kernel_log', str(kernel_id), container_id
         )
 
-    async def collect_node_stat(self, interval: float):
-        if self.local_config['debug']['log-stats']:
-            log.debug('collecting node statistics')
+    async def _are_followed_logs_kept(
+        self,
+        container_id: ContainerId,
+        follower: LogFollower,
+    ) -> bool:
+        # The followed logs may have expired if the kernel has not written anything for long.
+        if follower.offset == 0:
+            return True
+        if not self.redis_spool.is_empty:
+            # Some of the shipped chunks may not have reached Redis yet.
+            return False
+        log_key, _ = get_log_keys(container_id)
         try:
-            await self.stat_ctx.collect_node_stat()
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            log.exception('unhandled exception while syncing node stats')
-            await self.error_monitor.capture_exception()
+            return bool(await self.redis_producer_pool.exists(log_key))
+        except redis_unavailable_errors:
+            return False
+
+    async def _store_logs(
+        self,
+        writer: LogChunkWriter,
+        async_log_iterator: AsyncIterator[bytes],
+    ) -> None:
+        chunk_size = self.local_config['agent']['container-logs']['chunk-size']
+        chunker = LogChunker(chunk_size)
+        pending_chunks: List[bytes] = []
+        async for fragment in async_log_iterator:
+            pending_chunks.extend(chunker.feed(fragment))
+            if len(pending_chunks) >= log_chunks_per_batch:
+                await self.write_redis(writer.store(pending_chunks))
+                pending_chunks.clear()
+        tail = chunker.flush()
+        if tail is not None:
+            pending_chunks.append(tail)
+        if pending_chunks:
+            await self.write_redis(writer.store(pending_chunks))
+
+    async def _start_log_follower(self, kernel_id: KernelId, container_id: ContainerId) -> None:
+        logs_config = self.local_config['agent']['container-logs']
+        if not logs_config['follow'] or kernel_id in self._log_followers:
+            return
+        if len(self._log_followers) >= logs_config['max-followers']:
+            # The logs of the kernels not followed are collected after they terminate.
+            log.debug('not following the logs of k:{} as there are too many followers',
+                      kernel_id)
+            return
+        writer = LogChunkWriter(
+            container_id,
+            compress=(logs_config['compression'] == 'snappy'),
+            # Keep only the tail within the maximum length as the container runtime does.
+            max_chunks=max(1, logs_config['max-length'] // logs_config['chunk-size']),
+        )
+
+        async def store_chunks(chunks: Sequence[bytes]) -> None:
+            await self.write_redis([*writer.store(chunks), *writer.expire(log_follower_ttl)])
+
+        async def reset_chunks() -> None:
+            await self.write_redis(writer.reset())
+
+        # Discard the logs stored before the agent restart, as we follow them from the beginning.
+        await reset_chunks()
+        follower = LogFollower(
+            lambda: self.iter_container_logs(container_id, follow=True),
+            store_chunks,
+            reset_chunks,
+            chunk_size=logs_config['chunk-size'],
+            rate_limit=logs_config['follow-rate-limit'],
+        )
+        follower.start()
+        self._log_followers[kernel_id] = follower
 
-    async def collect_container_stat(self, interval: float):
+    async def read_container_logs(
+        self,
+        container_id: ContainerId,
+        *,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        tail_lines: Optional[int] = None,
+    ) -> bytes:
+        """
+        Read a part of the container logs stored in Redis by a byte range,
+        a period of time (in UNIX timestamps), or the number of last lines.
+        """
+        reader = ContainerLogReader(self.redis_producer_pool, container_id)
+        if tail_lines is not None:
+            return await reader.read_tail_lines(tail_lines)
+        if since is not None or until is not None:
+            return await reader.read_period(since or 0.0, until)
+        return await reader.read_range(start or 0, end)
+
+    async def collect_stat(self, interval: float):
+        """
+        Collect the node, device, and container statistics at once and let the manager
+        store the statistics of running kernels in the persistent database.
+        """
         if self.local_config['debug']['log-stats']:
-            log.debug('collecting container statistics')
+            log.debug('collecting statistics')
         try:
-            updated_kernel_ids = []
-            container_ids = []
-            for kernel_id, kernel_obj in [*self.kernel_registry.items()]:
-                if not kernel_obj.stats_enabled:
+            changed_kernel_ids = await self.stat_ctx.collect_stat()
+            synced_kernel_ids = []
+            for kernel_id in changed_kernel_ids:
+                kernel_obj = self.kernel_registry.get(kernel_id)
+                if kernel_obj is None or not kernel_obj.stats_enabled:
                     continue
-                updated_kernel_ids.append(kernel_id)
-                container_ids.append(kernel_obj['container_id'])
-            await self.stat_ctx.collect_container_stat(container_ids)
-            # Let the manager store the statistics in the persistent database.
-            if updated_kernel_ids:
+                synced_kernel_ids.append(kernel_id)
+            if synced_kernel_ids:
                 await self.produce_event('kernel_stat_sync',
-                                         ','.join(map(str, updated_kernel_ids)))
+                                         ','.join(map(str, synced_kernel_ids)))
         except asyncio.CancelledError:
             pass
         except Exception:
-            log.exception('unhandled exception while syncing container stats')
+            log.exception('unhandled exception while syncing stats')
             await self.error_monitor.capture_exception()
 
     async def _handle_start_event(self, ev: ContainerLifecycleEvent) -> None:
         kernel_obj = self.kernel_registry.get(ev.kernel_id)
         if kernel_obj is not None:
             kernel_obj.stats_enabled = True
+            if ev.container_id is not None:
+                await self._start_log_follower(ev.kernel_id, ev.container_id)
 
     async def _handle_destroy_event(self, ev: ContainerLifecycleEvent) -> None:
+        with self.phase_latencies.track('destroy_kernel'):
+            await self._destroy_kernel(ev)
+
+    async def _destroy_kernel(self, ev: ContainerLifecycleEvent) -> None:
         result = None
         try:
             kernel_obj = self.kernel_registry.get(ev.kernel_id)
@@ -483,8 +743,10 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                 kernel_obj.stats_enabled = False
                 kernel_obj.termination_reason = ev.reason
                 if kernel_obj.runner is not None:
-                    await kernel_obj.runner.close()
-            result = await self.destroy_kernel(ev.kernel_id, ev.container_id)
+                    with phase('runner-close'):
+                        await kernel_obj.runner.close()
+            with phase('destroy'):
+                result = await self.destroy_kernel(ev.kernel_id, ev.container_id)
         except Exception:
             log.exception('unhandled exception while processing DESTROY event')
             await self.error_monitor.capture_exception()
@@ -494,16 +756,27 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                 setattr(ev.done_event, '_result', result)
 
     async def _handle_clean_event(self, ev: ContainerLifecycleEvent) -> None:
+        with self.phase_latencies.track('clean_kernel'):
+            await self._clean_kernel(ev)
+
+    async def _clean_kernel(self, ev: ContainerLifecycleEvent) -> None:
         result = None
+        kernel_known = False
+        released_resource_spec: Optional[KernelResourceSpec] = None
         try:
             kernel_obj = self.kernel_registry.get(ev.kernel_id)
             if kernel_obj is not None and kernel_obj.runner is not None:
-                await kernel_obj.runner.close()
+                with phase('runner-close'):
+                    await kernel_obj.runner.close()
             result = await self.clean_kernel(
                 ev.kernel_id,
                 ev.container_id,
                 ev.kernel_id in self.restarting_kernels,
             )
+            # The follower remains if the logs have not been collected (e.g., container missing).
+            follower = self._log_followers.pop(ev.kernel_id, None)
+            if follower is not None:
+                await follower.stop(0)
         except Exception:
             log.exception('unhandled exception while processing CLEAN event')
             await self.error_monitor.capture_exception()
@@ -511,6 +784,7 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             try:
                 kernel_obj = self.kernel_registry.get(ev.kernel_id)
                 if kernel_obj is not None:
+                    kernel_known = True
                     # Restore used ports to the port pool.
                     port_range = self.local_config['container']['port-range']
                     # Exclude out-of-range ports, because when the agent restarts
@@ -526,7 +800,11 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                     if kernel_obj.clean_event is not None:
                         kernel_obj.clean_event.set()
                     # Forget.
-                    self.kernel_registry.pop(ev.kernel_id, None)
+                    # Only the handler that actually removes the kernel releases its
+                    # allocations, so that duplicate CLEAN events do not free them twice.
+                    if self.kernel_registry.pop(ev.kernel_id, None) is not None:
+                        released_resource_spec = kernel_obj.resource_spec
+                        await self.registry_journal.forget_kernel(ev.kernel_id)
             finally:
                 if ev.done_event is not None:
                     ev.done_event.set()
@@ -534,7 +812,11 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                 if restart_tracker := self.restarting_kernels.get(ev.kernel_id, None):
                     restart_tracker.destroy_event.set()
                 else:
-                    await self.rescan_resource_usage()
+                    if released_resource_spec is not None:
+                        await self.free_resource_spec(released_resource_spec)
+                    elif not kernel_known:
+                        # We don't know what this kernel has allocated.
+                        await self.rescan_resource_usage()
                     if not ev.suppress_events:
                         await self.produce_event(
                             'kernel_terminated', str(ev.kernel_id),
@@ -546,8 +828,9 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             while True:
                 ev = await self.container_lifecycle_queue.get()
                 if isinstance(ev, Sentinel):
-                    with open(ipc_base_path / f'last_registry.{self.agent_id}.dat', 'wb') as f:
-                        pickle.dump(self.kernel_registry, f)
+                    # Leave a compact snapshot with the latest kernel states.
+                    self.registry_journal.snapshot(self.kernel_registry)
+                    self.registry_journal.close()
                     return
                 # attr currently does not support customizing getstate/setstate dunder methods
                 # until the next release.
@@ -614,16 +897,172 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         Enumerate the containers with the given status filter.
         """
 
+    async def free_resource_spec(self, resource_spec: KernelResourceSpec) -> None:
+        """
+        Return the allocations of a terminated kernel to the alloc maps.
+        """
+        async with self.resource_lock:
+            for dev_name, device_alloc in resource_spec.allocations.items():
+                self.computers[dev_name].alloc_map.free(device_alloc)
+
     async def rescan_resource_usage(self) -> None:
         async with self.resource_lock:
+            await self._restore_resource_usage()
+
+    async def _restore_resource_usage(self) -> None:
+        # Rebuild the alloc maps from scratch.  The caller must hold the resource lock.
+        for computer_set in self.computers.values():
+            computer_set.alloc_map.clear()
+        live_kernel_ids = set()
+        for kernel_id, container in (await self.enumerate_containers()):
+            live_kernel_ids.add(kernel_id)
             for computer_set in self.computers.values():
-                computer_set.alloc_map.clear()
-            for kernel_id, container in (await self.enumerate_containers()):
-                for computer_set in self.computers.values():
-                    await computer_set.instance.restore_from_container(
-                        container,
-                        computer_set.alloc_map,
+                await computer_set.instance.restore_from_container(
+                    container,
+                    computer_set.alloc_map,
+                )
+        # Kernels whose containers are gone but not cleaned up yet still hold
+        # their allocations until their CLEAN events free them.
+        # Warm kernels are not enumerated as they do not have kernel IDs yet.
+        idle_kernels = [
+            kernel_obj for kernel_id, kernel_obj in self.kernel_registry.items()
+            if kernel_id not in live_kernel_ids
+        ]
+        idle_kernels.extend(self.warm_pool.kernels())
+        for kernel_obj in idle_kernels:
+            for dev_name, device_alloc in kernel_obj.resource_spec.allocations.items():
+                self.computers[dev_name].alloc_map.apply_allocation(device_alloc)
+
+    async def check_resource_usage(self, interval: float) -> None:
+        """
+        Periodically rebuild the alloc maps from the containers and report
+        any drift of the incrementally maintained allocations.
+        """
+        try:
+            async with self.resource_lock:
+                for kernel_id, task in [*self._allocating_kernels.items()]:
+                    if task.done():
+                        del self._allocating_kernels[kernel_id]
+                if self._allocating_kernels or self.restarting_kernels:
+                    # Allocations of the kernels being created or restarted
+                    # are not visible from the containers yet.
+                    log.debug('skipping resource usage check due to ongoing kernel creation')
+                    return
+                tracked_allocations = {
+                    dev_name: {
+                        slot_name: dict(per_device_alloc)
+                        for slot_name, per_device_alloc
+                        in computer_set.alloc_map.allocations.items()
+                    }
+                    for dev_name, computer_set in self.computers.items()
+                }
+                await self._restore_resource_usage()
+                for dev_name, computer_set in self.computers.items():
+                    mismatches = diff_allocations(
+                        tracked_allocations[dev_name],
+                        computer_set.alloc_map.allocations,
                     )
+                    for slot_name, device_id, tracked, actual in mismatches:
+                        log.warning('resource usage drift detected ({0}, {1}, dev:{2}): '
+                                    'tracked {3} but actually {4}',
+                                    dev_name, slot_name, device_id, tracked, actual)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            log.exception('unhandled exception while checking resource usage')
+            await self.error_monitor.capture_exception()
+
+    def _claim_warm_kernel(
+        self,
+        kernel_config: KernelCreationConfig,
+        cluster_info: ClusterInfo,
+    ) -> Optional[KernelObjectType]:
+        """
+        Take a warm kernel matching with the given creation request out of the warm pool,
+        returning its resources to the alloc maps.
+        The caller must hold the resource lock and should adopt the warm kernel
+        with its own allocations.
+        """
+        if not self.warm_pool.enabled:
+            return None
+        key = get_warm_pool_key(kernel_config, cluster_info)
+        if key is None:
+            return None
+        self.warm_pool.note_usage(key, kernel_config, cluster_info)
+        warm_kernel = self.warm_pool.claim(key)
+        if warm_kernel is not None:
+            for dev_name, device_alloc in warm_kernel.resource_spec.allocations.items():
+                self.computers[dev_name].alloc_map.free(device_alloc)
+        return warm_kernel
+
+    def _evict_warm_kernel(self) -> bool:
+        # The caller must hold the resource lock.
+        kernel_obj = self.warm_pool.evict()
+        if kernel_obj is None:
+            return False
+        log.info('evicting a warm kernel of {} to release resources', kernel_obj.image.canonical)
+        for dev_name, device_alloc in kernel_obj.resource_spec.allocations.items():
+            self.computers[dev_name].alloc_map.free(device_alloc)
+        self._discard_warm_kernel_later(kernel_obj)
+        return True
+
+    def _discard_warm_kernel_later(self, kernel_obj: KernelObjectType) -> None:
+        # The resources of the warm kernel should be already released.
+        task = asyncio.create_task(self.discard_warm_kernel(kernel_obj))
+        self._warm_pool_tasks.add(task)
+        task.add_done_callback(self._warm_pool_tasks.discard)
+
+    async def handle_warm_kernel_exit(self, kernel_id: KernelId) -> None:
+        """
+        Discard the warm kernel which has terminated while waiting in the warm pool.
+        """
+        async with self.resource_lock:
+            kernel_obj = self.warm_pool.remove(kernel_id)
+            if kernel_obj is None:
+                # It is being adopted or already discarded.
+                return
+            log.warning('the warm kernel of {} has terminated unexpectedly',
+                        kernel_obj.image.canonical)
+            for dev_name, device_alloc in kernel_obj.resource_spec.allocations.items():
+                self.computers[dev_name].alloc_map.free(device_alloc)
+        await self.discard_warm_kernel(kernel_obj)
+
+    async def refill_warm_pool(self, interval: float) -> None:
+        """
+        Periodically create warm kernels of the most frequently requested images
+        and configurations, and discard those which are no longer frequently requested.
+        """
+        try:
+            for kernel_obj in self.warm_pool.take_unwanted():
+                await self.free_resource_spec(kernel_obj.resource_spec)
+                await self.discard_warm_kernel(kernel_obj)
+            for key, kernel_config, cluster_info in self.warm_pool.get_shortages():
+                warm_kernel_id = KernelId(uuid.uuid4())
+                self.warm_pool.begin_warming(warm_kernel_id, key)
+                try:
+                    await self.create_kernel(
+                        '', SessionId(uuid.uuid4()), warm_kernel_id,
+                        kernel_config, cluster_info,
+                        warm=True,
+                    )
+                except ResourceError:
+                    # Do not take resources away from the actual sessions.
+                    self.warm_pool.finish_warming(warm_kernel_id, success=False)
+                    break
+                except Exception:
+                    log.exception('failed to create a warm kernel of {}', key.image)
+                    kernel_obj = self.warm_pool.finish_warming(warm_kernel_id, success=False)
+                    if kernel_obj is not None:
+                        await self.free_resource_spec(kernel_obj.resource_spec)
+                        await self.discard_warm_kernel(kernel_obj)
+                    break
+                else:
+                    self.warm_pool.finish_warming(warm_kernel_id, success=True)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            log.exception('unhandled exception while refilling the warm pool')
+            await self.error_monitor.capture_exception()
 
     async def sync_container_lifecycles(self, interval: float) -> None:
         """
@@ -746,12 +1185,32 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         """
 
     async def _scan_images_wrapper(self, interval: float) -> None:
-        self.images = await self.scan_images()
+        self._update_images(await self.scan_images())
+
+    def _update_images(self, images: Mapping[str, str]) -> None:
+        if images == self.images:
+            return
+        self.images = images
+        self._pack_images()
+
+    def _pack_images(self) -> None:
+        # Sort the list so that the same set of images always yields the same digest.
+        packed_images = msgpack.packb(sorted(self.images.items()))
+        self._images_blob = snappy.compress(packed_images)
+        self._images_digest = hashlib.sha256(packed_images).hexdigest()
 
     @abstractmethod
-    async def pull_image(self, image_ref: ImageRef, registry_conf: ImageRegistry) -> None:
+    async def pull_image(
+        self,
+        image_ref: ImageRef,
+        registry_conf: ImageRegistry,
+        *,
+        progress_cb: Optional[PullProgressCallback] = None,
+    ) -> None:
         '''
         Pull the given image from the given registry.
+        If *progress_cb* is given, it is called with the download progress of the image.
+        The callers should go through :attr:`image_pulls` to avoid duplicate pulls.
         '''
 
     @abstractmethod
@@ -766,16 +1225,25 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         """
         Scan currently running kernels and recreate the kernel objects in
         ``self.kernel_registry`` if any missing.
+        The kernel registry is restored from the journal, which is kept up-to-date
+        even when the agent crashes.
         """
-        try:
-            with open(ipc_base_path / f'last_registry.{self.agent_id}.dat', 'rb') as f:
-                self.kernel_registry = pickle.load(f)
-                for kernel_obj in self.kernel_registry.values():
-                    kernel_obj.agent_config = self.local_config
-                    if kernel_obj.runner is not None:
-                        await kernel_obj.runner.__ainit__()
-        except FileNotFoundError:
-            pass
+        self.kernel_registry = await self.registry_journal.load()
+        if not self.kernel_registry:
+            # Migrate the registry dumped by the older versions.
+            legacy_registry_path = ipc_base_path / f'last_registry.{self.agent_id}.dat'
+            try:
+                with open(legacy_registry_path, 'rb') as f:
+                    self.kernel_registry = pickle.load(f)
+            except FileNotFoundError:
+                pass
+            else:
+                self.registry_journal.snapshot(self.kernel_registry)
+                legacy_registry_path.unlink()
+        for kernel_obj in self.kernel_registry.values():
+            kernel_obj.agent_config = self.local_config
+            if kernel_obj.runner is not None:
+                await kernel_obj.runner.__ainit__()
         async with self.resource_lock:
             for kernel_id, container in (await self.enumerate_containers(
                 ACTIVE_STATUS_SET | DEAD_STATUS_SET,
@@ -789,11 +1257,18 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                         if p.host_port is not None:
                             self.port_pool.discard(p.host_port)
                     # Restore compute resources.
-                    for computer_set in self.computers.values():
-                        await computer_set.instance.restore_from_container(
-                            container,
-                            computer_set.alloc_map,
-                        )
+                    known_kernel = self.kernel_registry.get(kernel_id)
+                    if (known_kernel is not None and
+                            known_kernel.resource_spec.allocations.keys() <= self.computers.keys()):
+                        # Journaled kernels do not need to read their containers' resource records.
+                        for dev_name, device_alloc in known_kernel.resource_spec.allocations.items():
+                            self.computers[dev_name].alloc_map.apply_allocation(device_alloc)
+                    else:
+                        for computer_set in self.computers.values():
+                            await computer_set.instance.restore_from_container(
+                                container,
+                                computer_set.alloc_map,
+                            )
                     await self.inject_container_lifecycle_event(
                         kernel_id,
                         LifecycleEvent.START,
@@ -822,6 +1297,7 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         kernel_config: KernelCreationConfig,
         *,
         restarting: bool = False,
+        warm: bool = False,
     ) -> KernelCreationContextType:
         image_ref = ImageRef(
             kernel_config['image']['canonical'],
@@ -838,6 +1314,7 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             image_ref=image_ref,
             internal_data=kernel_config['internal_data'] or {},
             restarting=restarting,
+            warm=warm,
             cancellation_handlers=[],
         ))
 
@@ -921,6 +1398,25 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
     ) -> KernelObjectType:
         raise NotImplementedError
 
+    async def create_kernel__adopt_warm_kernel(
+        self,
+        ctx: KernelCreationContextType,
+        warm_kernel: KernelObjectType,
+        resource_spec: KernelResourceSpec,
+    ) -> KernelObjectType:
+        """
+        Turn the given warm kernel into the kernel being created,
+        applying the kernel ID and the resource allocations of the creation context.
+        """
+        raise NotImplementedError
+
+    async def discard_warm_kernel(self, kernel_obj: KernelObjectType) -> None:
+        """
+        Destroy the container and the scratch space of a warm kernel.
+        Its resource allocations should be released by the caller.
+        """
+        raise NotImplementedError
+
     async def _create_kernel__mount_vfolders(
         self,
         ctx: KernelCreationContextType,
@@ -1236,63 +1732,123 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         cluster_info: ClusterInfo,
         *,
         restarting: bool = False,
+        warm: bool = False,
     ) -> KernelCreationResult:
         """
         Create a new kernel.
+
+        If *warm* is set, the kernel is created in the warm pool without notifying the manager
+        and adopted by a later creation request for the same image and configuration.
+
+        The elapsed time of each creation phase is sent as the ``kernel_creation_timing``
+        event following the ``kernel_started`` event and accumulated into the agent's
+        phase latency histogram, where the failed creations are kept separately.
         """
+        if warm:
+            operation = 'create_warm_kernel'
+        elif restarting:
+            operation = 'restart_kernel'
+        else:
+            operation = 'create_kernel'
+        with self.phase_latencies.track(operation) as timer:
+            result = await self._create_kernel(
+                creation_id, session_id, kernel_id,
+                kernel_config, cluster_info,
+                timer=timer,
+                restarting=restarting,
+                warm=warm,
+            )
+        return result
 
-        if not restarting:
+    async def _create_kernel(
+        self,
+        creation_id: str,
+        session_id: SessionId,
+        kernel_id: KernelId,
+        kernel_config: KernelCreationConfig,
+        cluster_info: ClusterInfo,
+        *,
+        timer: PhaseTimer,
+        restarting: bool,
+        warm: bool,
+    ) -> KernelCreationResult:
+        if not restarting and not warm:
             await self.produce_event('kernel_preparing', str(kernel_id), creation_id)
 
         # Initialize the creation context
         log.debug('Kernel creation config: {0}', pretty(kernel_config))
-        ctx = await self.create_kernel__init_context(
-            kernel_id, kernel_config,
-            restarting=restarting,
-        )
-        environ: MutableMapping[str, str] = {**kernel_config['environ']}
-
-        # Inject Backend.AI-intrinsic env-variables for gosu
-        if KernelFeatures.UID_MATCH in ctx.kernel_features:
-            uid = self.local_config['container']['kernel-uid']
-            gid = self.local_config['container']['kernel-gid']
-            environ['LOCAL_USER_ID'] = str(uid)
-            environ['LOCAL_GROUP_ID'] = str(gid)
-        environ.update(
-            await self.create_kernel__get_extra_envs(ctx)
-        )
+        with phase('init-context'):
+            ctx = await self.create_kernel__init_context(
+                kernel_id, kernel_config,
+                restarting=restarting,
+                warm=warm,
+            )
+            environ: MutableMapping[str, str] = {**kernel_config['environ']}
+
+            # Inject Backend.AI-intrinsic env-variables for gosu
+            if KernelFeatures.UID_MATCH in ctx.kernel_features:
+                uid = self.local_config['container']['kernel-uid']
+                gid = self.local_config['container']['kernel-gid']
+                environ['LOCAL_USER_ID'] = str(uid)
+                environ['LOCAL_GROUP_ID'] = str(gid)
+            environ.update(
+                await self.create_kernel__get_extra_envs(ctx)
+            )
         image_labels = kernel_config['image']['labels']
         log.debug('image labels:\n{}', pretty(image_labels))
 
         # Check if we need to pull the container image
-        do_pull = await self.check_image(
-            ctx.image_ref,
-            kernel_config['image']['digest'],
-            AutoPullBehavior(kernel_config.get('auto_pull', 'digest')),
-        )
-        if do_pull:
-            await self.produce_event(
-                'kernel_pulling',
-                str(kernel_id),
-                creation_id,
-                ctx.image_ref.canonical,  # passed as "reason" arg
+        with phase('image-check'):
+            do_pull = await self.check_image(
+                ctx.image_ref,
+                kernel_config['image']['digest'],
+                AutoPullBehavior(kernel_config.get('auto_pull', 'digest')),
             )
-            await self.pull_image(ctx.image_ref, kernel_config['image']['registry'])
+        if do_pull:
+            if not warm:
+                await self.produce_event(
+                    'kernel_pulling',
+                    str(kernel_id),
+                    creation_id,
+                    ctx.image_ref.canonical,  # passed as "reason" arg
+                )
 
-        if not restarting:
+            async def _report_pull_progress(progress: ImagePullProgress) -> None:
+                # Sent as a separate event to keep kernel_pulling a one-time status change.
+                await self.produce_event(
+                    'kernel_pull_progress',
+                    str(kernel_id),
+                    creation_id,
+                    ctx.image_ref.canonical,
+                    progress.to_serializable_dict(),
+                )
+
+            registry_conf = kernel_config['image']['registry']
+            with phase('image-pull'):
+                # Concurrent creations of the same image share a single pull.
+                await self.image_pulls.pull(
+                    ctx.image_ref,
+                    lambda progress_cb: self.pull_image(
+                        ctx.image_ref, registry_conf, progress_cb=progress_cb,
+                    ),
+                    progress_cb=None if warm else _report_pull_progress,
+                )
+
+        if not restarting and not warm:
             await self.produce_event('kernel_creating', str(kernel_id), creation_id)
 
         # Get the resource spec from existing kernel scratches
         # or create a new resource spec from ctx.kernel_config
-        resource_spec, resource_opts = await self.create_kernel__prepare_resource_spec(ctx)
-        # When creating a new kernel,
-        # we need to allocate agent resources, prepare the networks,
-        # adn specify the container mounts.
-
-        # Mount backend-specific intrinsic mounts (e.g., scratch directories)
-        resource_spec.mounts.extend(
-            await self.create_kernel__get_intrinsic_mounts(ctx)
-        )
+        with phase('resource-spec'):
+            resource_spec, resource_opts = await self.create_kernel__prepare_resource_spec(ctx)
+            # When creating a new kernel,
+            # we need to allocate agent resources, prepare the networks,
+            # adn specify the container mounts.
+
+            # Mount backend-specific intrinsic mounts (e.g., scratch directories)
+            resource_spec.mounts.extend(
+                await self.create_kernel__get_intrinsic_mounts(ctx)
+            )
 
         # Realize ComputeDevice (including accelerators) allocations.
         slots = resource_spec.slots
@@ -1301,140 +1857,84 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             dev_name = slot_name.split('.', maxsplit=1)[0]
             dev_names.add(DeviceName(dev_name))
 
-        if not restarting:
-            async with self.resource_lock:
-                for dev_name in dev_names:
-                    computer_set = self.computers[dev_name]
-                    device_specific_slots = {
-                        SlotName(slot_name): Decimal(alloc)
-                        for slot_name, alloc in slots.items()
-                        if slot_name.startswith(dev_name)
-                    }
+        kernel_obj: Optional[KernelObjectType] = None
+        warm_kernel: Optional[KernelObjectType] = None
+        with phase('allocation'):
+            if not restarting:
+                async with self.resource_lock:
+                    if not warm:
+                        # Claim a warm kernel before allocating so that this request reuses
+                        # its resources instead of evicting it.
+                        warm_kernel = self._claim_warm_kernel(kernel_config, cluster_info)
                     try:
-                        # TODO: support allocate_evenly()
-                        resource_spec.allocations[dev_name] = \
-                            computer_set.alloc_map.allocate(
-                                device_specific_slots,
-                                context_tag=dev_name)
-                    except ResourceError as e:
-                        log.info(
-                            "resource allocation failed ({}): {} of {}\n"
-                            "(alloc map: {})",
-                            type(e).__name__, device_specific_slots, dev_name,
-                            dict(computer_set.alloc_map.allocations)
-                        )
+                        while True:
+                            try:
+                                self._allocate_resource_spec(resource_spec, dev_names)
+                            except ResourceError:
+                                # Take back the resources held by idle warm kernels
+                                # before giving up.
+                                if warm or not self._evict_warm_kernel():
+                                    raise
+                            else:
+                                break
+                    except ResourceError:
+                        if warm_kernel is not None:
+                            self._discard_warm_kernel_later(warm_kernel)
                         raise
+                    # The allocations are not visible from the containers until spawned.
+                    current_task = asyncio.current_task()
+                    assert current_task is not None
+                    self._allocating_kernels[kernel_id] = current_task
 
-        # Prepare scratch spaces and dotfiles inside it.
-        await self.create_kernel__prepare_scratch(ctx)
-
-        # Prepare networking.
-        await self.create_kernel__apply_network(ctx, cluster_info)
-        await self.create_kernel__install_ssh_keypair(ctx, cluster_info)
-
-        # Mount vfolders and krunner stuffs.
-        await self._create_kernel__mount_vfolders(ctx, kernel_config['mounts'], resource_spec)
-        await self._create_kernel__mount_krunner(ctx, resource_spec, environ)
-
-        # Inject Backend.AI-intrinsic env-variables for libbaihook and gosu
-        label_envs_corecount = image_labels.get('ai.backend.envs.corecount', '')
-        envs_corecount = label_envs_corecount.split(',') if label_envs_corecount else []
-        cpu_core_count = len(resource_spec.allocations[DeviceName('cpu')][SlotName('cpu')])
-        environ.update({k: str(cpu_core_count) for k in envs_corecount})
-
-        # Realize mounts.
-        await self.create_kernel__process_mounts(
-            ctx,
-            resource_spec.mounts,
-        )
-
-        # Get attached devices information (including model_name).
-        attached_devices = {}
-        for dev_name, device_alloc in resource_spec.allocations.items():
-            computer_set = self.computers[dev_name]
-            devices = await computer_set.instance.get_attached_devices(device_alloc)
-            attached_devices[dev_name] = devices
-
-        exposed_ports = [2000, 2001]
-        service_ports = []
-        port_map = {}
-        preopen_ports = ctx.kernel_config.get('preopen_ports')
-        if preopen_ports is None:
-            preopen_ports = []
-
-        if ctx.kernel_config['cluster_role'] in ('main', 'master'):
-            for sport in parse_service_ports(image_labels.get('ai.backend.service-ports', '')):
-                port_map[sport['name']] = sport
-            port_map['sshd'] = {
-                'name': 'sshd',
-                'protocol': ServicePortProtocols('tcp'),
-                'container_ports': (2200,),
-                'host_ports': (None,),
-            }
-            port_map['ttyd'] = {
-                'name': 'ttyd',
-                'protocol': ServicePortProtocols('http'),
-                'container_ports': (7681,),
-                'host_ports': (None,),
-            }
-            for port_no in preopen_ports:
-                sport = {
-                    'name': str(port_no),
-                    'protocol': ServicePortProtocols('preopen'),
-                    'container_ports': (port_no,),
-                    'host_ports': (None,),
-                }
-                service_ports.append(sport)
-                for cport in sport['container_ports']:
-                    exposed_ports.append(cport)
-            for sport in port_map.values():
-                service_ports.append(sport)
-                for cport in sport['container_ports']:
-                    exposed_ports.append(cport)
-            log.debug('exposed ports: {!r}', exposed_ports)
-
-        runtime_type = image_labels.get('ai.backend.runtime-type', 'python')
-        runtime_path = image_labels.get('ai.backend.runtime-path', None)
-        cmdargs: List[str] = []
-        if self.local_config['container']['sandbox-type'] == 'jail':
-            cmdargs += [
-                "/opt/kernel/jail",
-                "-policy", "/etc/backend.ai/jail/policy.yml",
-            ]
-            if self.local_config['container']['jail-args']:
-                cmdargs += map(lambda s: s.strip(), self.local_config['container']['jail-args'])
-        cmdargs += [
-            "/opt/backend.ai/bin/python",
-            "-m", "ai.backend.kernel", runtime_type,
-        ]
-        if runtime_path is not None:
-            cmdargs.append(runtime_path)
-
-        # Store information required for restarts.
-        # NOTE: kconfig may be updated after restarts.
-        resource_spec.freeze()
-        await self.restart_kernel__store_config(
-            kernel_id, 'kconfig.dat',
-            pickle.dumps(ctx.kernel_config),
-        )
-        if not restarting:
-            await self.restart_kernel__store_config(
-                kernel_id, 'cluster.json',
-                json.dumps(cluster_info).encode('utf8'),
+        if warm_kernel is not None:
+            try:
+                with phase('warm-adoption'):
+                    kernel_obj = await self.create_kernel__adopt_warm_kernel(
+                        ctx, warm_kernel, resource_spec,
+                    )
+            except Exception:
+                log.exception('failed to adopt a warm kernel (k:{}), '
+                              'creating a new one instead', kernel_id)
+            else:
+                log.info('adopted a warm kernel for k:{}', kernel_id)
+                try:
+                    service_ports = kernel_obj.service_ports
+                    # Get attached devices information (including model_name).
+                    attached_devices = await self._get_attached_devices(resource_spec)
+                    resource_spec.freeze()
+                    await self.restart_kernel__store_config(
+                        kernel_id, 'kconfig.dat',
+                        pickle.dumps(ctx.kernel_config),
+                    )
+                    await self.restart_kernel__store_config(
+                        kernel_id, 'cluster.json',
+                        json.dumps(cluster_info).encode('utf8'),
+                    )
+                except Exception:
+                    # The adopted container is not registered yet, so nothing else cleans it up.
+                    try:
+                        await self.discard_warm_kernel(kernel_obj)
+                    except Exception:
+                        log.exception('error while discarding the adopted kernel (k:{})',
+                                      kernel_id)
+                    await self._create_kernel__rollback(ctx, resource_spec)
+                    self._allocating_kernels.pop(kernel_id, None)
+                    raise
+        if kernel_obj is None:
+            kernel_obj, service_ports, attached_devices = await self._create_kernel__launch(
+                ctx, resource_spec, resource_opts, environ, cluster_info,
             )
-
-        log.info('kernel starting with resource spec: \n{0}',
-                 pretty(attr.asdict(resource_spec)))
-        kernel_obj = await self.create_kernel__spawn(
-            ctx,
-            resource_spec,
-            resource_opts,
-            environ,
-            service_ports,
-            preopen_ports,
-            cmdargs,
-        )
-        self.kernel_registry[ctx.kernel_id] = kernel_obj
+        if warm:
+            # Warm kernels are kept in the warm pool instead of the kernel registry.
+            self.warm_pool.set_spawned(ctx.kernel_id, kernel_obj)
+            self._allocating_kernels.pop(ctx.kernel_id, None)
+        else:
+            self.kernel_registry[ctx.kernel_id] = kernel_obj
+            self._allocating_kernels.pop(ctx.kernel_id, None)
+            await self.registry_journal.record_kernel(ctx.kernel_id, kernel_obj)
+            # The START event may have been handled before the registration (or not at all
+            # for adopted warm kernels), so start following the logs here as well.
+            await self._start_log_follower(ctx.kernel_id, kernel_obj['container_id'])
         log.debug('kernel repl-in address: {0}:{1}',
                   kernel_obj['kernel_host'], kernel_obj['repl_in_port'])
         log.debug('kernel repl-out address: {0}:{1}',
@@ -1448,11 +1948,13 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             # Wait until bootstrap script is executed.
             # - Main kernel runner is executed after bootstrap script, and
             #   check_status is accessible only after kernel runner is loaded.
-            await kernel_obj.check_status()
+            with phase('check-status'):
+                await kernel_obj.check_status()
 
             # Update the service-ports metadata from the image labels
             # with the extended template metadata from the agent and krunner.
-            live_services = await kernel_obj.get_service_apps()
+            with phase('service-apps'):
+                live_services = await kernel_obj.get_service_apps()
             if live_services['status'] != 'failed':
                 for live_service in live_services['data']:
                     for service_port in service_ports:
@@ -1469,8 +1971,18 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             if not self._pending_creation_tasks[raw_kernel_id]:
                 del self._pending_creation_tasks[raw_kernel_id]
 
-        # Finally we are done.
-        await self.produce_event('kernel_started', str(kernel_id), creation_id)
+        if not warm:
+            # Keep the updated service ports in the journal.
+            await self.registry_journal.record_kernel(ctx.kernel_id, kernel_obj)
+
+            # Finally we are done.
+            await self.produce_event('kernel_started', str(kernel_id), creation_id)
+            timer.finish()
+            await self.produce_event(
+                'kernel_creation_timing', str(kernel_id), creation_id,
+                timer.to_serializable_dict(),
+                wait=False,
+            )
 
         # The startup command for the batch-type sessions will be executed by the manager
         # upon firing of the "session_started" event.
@@ -1488,6 +2000,229 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
             'attached_devices': attached_devices,
         }
 
+    def _allocate_resource_spec(
+        self,
+        resource_spec: KernelResourceSpec,
+        dev_names: Set[DeviceName],
+    ) -> None:
+        # The caller must hold the resource lock.
+        slots = resource_spec.slots
+        for dev_name in dev_names:
+            computer_set = self.computers[dev_name]
+            device_specific_slots = {
+                SlotName(slot_name): Decimal(alloc)
+                for slot_name, alloc in slots.items()
+                if slot_name.startswith(dev_name)
+            }
+            try:
+                # TODO: support allocate_evenly()
+                resource_spec.allocations[dev_name] = \
+                    computer_set.alloc_map.allocate(
+                        device_specific_slots,
+                        context_tag=dev_name)
+            except ResourceError as e:
+                log.info(
+                    "resource allocation failed ({}): {} of {}\n"
+                    "(alloc map: {})",
+                    type(e).__name__, device_specific_slots, dev_name,
+                    dict(computer_set.alloc_map.allocations)
+                )
+                # Roll back the partial allocations so that the caller may retry.
+                for allocated_dev_name, device_alloc in resource_spec.allocations.items():
+                    self.computers[allocated_dev_name].alloc_map.free(device_alloc)
+                resource_spec.allocations.clear()
+                raise
+
+    async def _create_kernel__launch(
+        self,
+        ctx: KernelCreationContextType,
+        resource_spec: KernelResourceSpec,
+        resource_opts,
+        environ: MutableMapping[str, str],
+        cluster_info: ClusterInfo,
+    ) -> Tuple[KernelObjectType, List[Any], Mapping[DeviceName, Sequence[DeviceModelInfo]]]:
+        """
+        Prepare the scratch space, mounts and ports of a new kernel and spawn its container.
+        Returns the kernel object, its service ports and the attached devices.
+        If any step fails, the resources taken for the kernel are released
+        by :meth:`_create_kernel__rollback`.
+        """
+        kernel_id = ctx.kernel_id
+        kernel_config = ctx.kernel_config
+        image_labels = kernel_config['image']['labels']
+        try:
+            # Resolve vfolder mounts first as they are validated without any side effects.
+            with phase('vfolder-mounts'):
+                await self._create_kernel__mount_vfolders(ctx, kernel_config['mounts'], resource_spec)
+
+            # Prepare scratch spaces, networking and krunner stuffs concurrently.
+            attached_devices = await self._create_kernel__prepare(
+                ctx, resource_spec, environ, cluster_info,
+            )
+
+            # Inject Backend.AI-intrinsic env-variables for libbaihook and gosu
+            label_envs_corecount = image_labels.get('ai.backend.envs.corecount', '')
+            envs_corecount = label_envs_corecount.split(',') if label_envs_corecount else []
+            cpu_core_count = len(resource_spec.allocations[DeviceName('cpu')][SlotName('cpu')])
+            environ.update({k: str(cpu_core_count) for k in envs_corecount})
+
+            # Realize mounts.
+            with phase('process-mounts'):
+                await self.create_kernel__process_mounts(
+                    ctx,
+                    resource_spec.mounts,
+                )
+
+            exposed_ports = [2000, 2001]
+            service_ports = []
+            port_map = {}
+            preopen_ports = ctx.kernel_config.get('preopen_ports')
+            if preopen_ports is None:
+                preopen_ports = []
+
+            if ctx.kernel_config['cluster_role'] in ('main', 'master'):
+                for sport in parse_service_ports(image_labels.get('ai.backend.service-ports', '')):
+                    port_map[sport['name']] = sport
+                port_map['sshd'] = {
+                    'name': 'sshd',
+                    'protocol': ServicePortProtocols('tcp'),
+                    'container_ports': (2200,),
+                    'host_ports': (None,),
+                }
+                port_map['ttyd'] = {
+                    'name': 'ttyd',
+                    'protocol': ServicePortProtocols('http'),
+                    'container_ports': (7681,),
+                    'host_ports': (None,),
+                }
+                for port_no in preopen_ports:
+                    sport = {
+                        'name': str(port_no),
+                        'protocol': ServicePortProtocols('preopen'),
+                        'container_ports': (port_no,),
+                        'host_ports': (None,),
+                    }
+                    service_ports.append(sport)
+                    for cport in sport['container_ports']:
+                        exposed_ports.append(cport)
+                for sport in port_map.values():
+                    service_ports.append(sport)
+                    for cport in sport['container_ports']:
+                        exposed_ports.append(cport)
+                log.debug('exposed ports: {!r}', exposed_ports)
+
+            runtime_type = image_labels.get('ai.backend.runtime-type', 'python')
+            runtime_path = image_labels.get('ai.backend.runtime-path', None)
+            cmdargs: List[str] = []
+            if self.local_config['container']['sandbox-type'] == 'jail':
+                cmdargs += [
+                    "/opt/kernel/jail",
+                    "-policy", "/etc/backend.ai/jail/policy.yml",
+                ]
+                if self.local_config['container']['jail-args']:
+                    cmdargs += map(lambda s: s.strip(), self.local_config['container']['jail-args'])
+            cmdargs += [
+                "/opt/backend.ai/bin/python",
+                "-m", "ai.backend.kernel", runtime_type,
+            ]
+            if runtime_path is not None:
+                cmdargs.append(runtime_path)
+
+            # Store information required for restarts.
+            # NOTE: kconfig may be updated after restarts.
+            resource_spec.freeze()
+            await self.restart_kernel__store_config(
+                kernel_id, 'kconfig.dat',
+                pickle.dumps(ctx.kernel_config),
+            )
+            if not ctx.restarting:
+                await self.restart_kernel__store_config(
+                    kernel_id, 'cluster.json',
+                    json.dumps(cluster_info).encode('utf8'),
+                )
+
+            log.info('kernel starting with resource spec: \n{0}',
+                     pretty(attr.asdict(resource_spec)))
+            kernel_obj = await self.create_kernel__spawn(
+                ctx,
+                resource_spec,
+                resource_opts,
+                environ,
+                service_ports,
+                preopen_ports,
+                cmdargs,
+            )
+        except Exception:
+            await self._create_kernel__rollback(ctx, resource_spec)
+            raise
+        return kernel_obj, service_ports, attached_devices
+
+    async def _create_kernel__prepare(
+        self,
+        ctx: KernelCreationContextType,
+        resource_spec: KernelResourceSpec,
+        environ: MutableMapping[str, str],
+        cluster_info: ClusterInfo,
+    ) -> Mapping[DeviceName, Sequence[DeviceModelInfo]]:
+        """
+        Run the preparation steps of a new container which do not depend on each other
+        concurrently, and return the attached device information.
+        If a step fails, the other steps are cancelled and its error is re-raised.
+        """
+
+        async def _prepare_scratch() -> None:
+            # Prepare scratch spaces and dotfiles inside it.
+            with phase('scratch'):
+                await self.create_kernel__prepare_scratch(ctx)
+            # The cluster keypair is written into the scratch space.
+            with phase('ssh-keypair'):
+                await self.create_kernel__install_ssh_keypair(ctx, cluster_info)
+
+        async def _prepare_network() -> None:
+            with phase('network'):
+                await self.create_kernel__apply_network(ctx, cluster_info)
+
+        async def _mount_krunner() -> None:
+            with phase('krunner-mounts'):
+                await self._create_kernel__mount_krunner(ctx, resource_spec, environ)
+
+        try:
+            async with aiotools.TaskGroup() as tg:
+                tg.create_task(_prepare_scratch())
+                tg.create_task(_prepare_network())
+                tg.create_task(_mount_krunner())
+                attached_devices_task = tg.create_task(self._get_attached_devices(resource_spec))
+        except aiotools.TaskGroupError as e:
+            # Report the original error instead of the wrapping one.
+            raise e.__errors__[0]
+        return attached_devices_task.result()
+
+    async def _get_attached_devices(
+        self,
+        resource_spec: KernelResourceSpec,
+    ) -> Mapping[DeviceName, Sequence[DeviceModelInfo]]:
+        dev_names = [*resource_spec.allocations.keys()]
+        results = await asyncio.gather(*[
+            self.computers[dev_name].instance.get_attached_devices(
+                resource_spec.allocations[dev_name],
+            )
+            for dev_name in dev_names
+        ])
+        return dict(zip(dev_names, results))
+
+    async def _create_kernel__rollback(
+        self,
+        ctx: KernelCreationContextType,
+        resource_spec: KernelResourceSpec,
+    ) -> None:
+        # Undo the backend-specific preparations (e.g., scratch directories) in the reverse order.
+        for handler in reversed(ctx.cancellation_handlers):
+            try:
+                await handler()
+            except Exception:
+                log.exception('error while rolling back the creation of k:{}', ctx.kernel_id)
+        await self.free_resource_spec(resource_spec)
+
     @abstractmethod
     async def destroy_kernel(
         self,
@@ -1525,6 +2260,18 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         In such cases, skip container-specific cleanups.
         """
 
+    @abstractmethod
+    def iter_container_logs(
+        self,
+        container_id: ContainerId,
+        *,
+        follow: bool,
+    ) -> AsyncIterator[bytes]:
+        """
+        Iterate over the console outputs of the container as raw bytes.
+        If *follow* is true, continue until the container terminates.
+        """
+
     @abstractmethod
     async def create_overlay_network(self, network_name: str) -> None:
         """
@@ -1676,7 +2423,7 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         if restart_tracker is not None:
             await restart_tracker.done_event.wait()
 
-        await self.produce_event("execution_started", str(kernel_id))
+        await self.produce_event("execution_started", str(kernel_id), wait=False, spool=False)
         try:
             kernel_obj = self.kernel_registry[kernel_id]
             result = await kernel_obj.execute(
@@ -1685,7 +2432,7 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
                 flush_timeout=flush_timeout,
                 api_version=api_version)
         except asyncio.CancelledError:
-            await self.produce_event("execution_cancelled", str(kernel_id))
+            await self.produce_event("execution_cancelled", str(kernel_id), wait=False, spool=False)
             raise
         except KeyError:
             # This situation is handled in the lifecycle management subsystem.
@@ -1695,9 +2442,9 @@ class AbstractAgent(aobject, Generic[KernelObjectType, KernelCreationContextType
         if result['status'] in ('finished', 'exec-timeout'):
             log.debug('_execute({0}) {1}', kernel_id, result['status'])
         if result['status'] == 'finished':
-            await self.produce_event("execution_finished", str(kernel_id))
+            await self.produce_event("execution_finished", str(kernel_id), wait=False, spool=False)
         elif result['status'] == 'exec-timeout':
-            await self.produce_event("execution_timeout", str(kernel_id))
+            await self.produce_event("execution_timeout", str(kernel_id), wait=False, spool=False)
             await self.inject_container_lifecycle_event(
                 kernel_id,
                 LifecycleEvent.DESTROY,
@@ -16,6 +16,13 @@ coredump_defaults = {
     'size-limit': '64M',
 }
 
+spool_defaults = {
+    'path': '/var/lib/backend.ai/spool',
+    'segment-size': '8M',
+    'max-size': '1G',
+    'latency-budget': 2.0,
+}
+
 agent_local_config_iv = t.Dict({
     t.Key('agent'): t.Dict({
         tx.AliasedKey(['backend', 'mode']): tx.Enum(AgentBackend),
@@ -31,20 +38,33 @@ agent_local_config_iv = t.Dict({
                                                        allow_devnull=True),
         t.Key('event-loop', default='asyncio'): t.Enum('asyncio', 'uvloop'),
         t.Key('skip-manager-detection', default=False): t.ToBool,
+        t.Key('heartbeat-mode', default='full'): t.Enum('full', 'digest'),
+        t.Key('spool', default=spool_defaults): t.Dict({
+            # The directory is created by the agent upon startup, not during validation.
+            t.Key('path', default=spool_defaults['path']):
+                tx.Path(type='dir', allow_nonexisting=True),
+            t.Key('segment-size', default=spool_defaults['segment-size']): tx.BinarySize,
+            t.Key('max-size', default=spool_defaults['max-size']): tx.BinarySize,
+            t.Key('latency-budget', default=spool_defaults['latency-budget']): t.Float[0:],
+        }).allow_extra('*'),
     }).allow_extra('*'),
     t.Key('container'): t.Dict({
         t.Key('kernel-uid', default=-1): tx.UserID,
         t.Key('kernel-gid', default=-1): tx.GroupID,
         t.Key('kernel-host', default=''): t.String(allow_blank=True),
         t.Key('port-range', default=(30000, 31000)): tx.PortRange,
-        t.Key('stats-type', default='docker'):
-            t.Null | t.Enum(*[e.value for e in StatModes]),
+        t.Key('stats-type', default='auto'):
+            t.Null | t.Enum('auto', *[e.value for e in StatModes]),
         t.Key('sandbox-type', default='docker'): t.Enum('docker', 'jail'),
         t.Key('jail-args', default=[]): t.List(t.String),
         t.Key('scratch-type'): t.Enum('hostdir', 'memory'),
         t.Key('scratch-root', default='./scratches'):
             tx.Path(type='dir', auto_create=True),
         t.Key('scratch-size', default='0'): tx.BinarySize,
+        t.Key('scratch-size-refresh-budget', default=10_000): t.Int[1:],
+        t.Key('warm-pool-size', default=0): t.Int[0:],
+        t.Key('warm-pool-images', default=3): t.Int[1:],
+        t.Key('max-concurrent-pulls', default=2): t.Int[1:],
     }).allow_extra('*'),
     t.Key('logging'): t.Any,  # checked in ai.backend.common.logging
     t.Key('resource'): t.Dict({
@@ -61,7 +81,8 @@ agent_local_config_iv = t.Dict({
         t.Key('coredump', default=coredump_defaults): t.Dict({
             t.Key('enabled', default=coredump_defaults['enabled']): t.Bool,
             t.Key('path', default=coredump_defaults['path']):
-                tx.Path(type='dir', auto_create=True),
+                # created upon the agent startup (not during the validation)
+                tx.Path(type='dir', allow_nonexisting=True),
             t.Key('backup-count', default=coredump_defaults['backup-count']):
                 t.Int[1:],
             t.Key('size-limit', default=coredump_defaults['size-limit']):
@@ -79,12 +100,24 @@ docker_extra_config_iv = t.Dict({
 default_container_logs_config = {
     'max-length': '10M',  # the maximum tail size
     'chunk-size': '64K',  # used when storing logs to Redis as a side-channel to the event bus
+    'follow': True,  # store the logs while containers are running
+    'follow-rate-limit': '1M',  # the maximum bytes per second stored while following a container
+    # the maximum number of containers followed at the same time; each takes a connection
+    # to the container runtime for its whole lifetime, so keep it well below the client's limit
+    'max-followers': 32,
+    'compression': 'none',  # "snappy" requires the manager to decompress the stored chunks
 }
 
 agent_etcd_config_iv = t.Dict({
     t.Key('container-logs', default=default_container_logs_config): t.Dict({
         t.Key('max-length', default=default_container_logs_config['max-length']): tx.BinarySize(),
         t.Key('chunk-size', default=default_container_logs_config['chunk-size']): tx.BinarySize(),
+        t.Key('follow', default=default_container_logs_config['follow']): t.ToBool,
+        t.Key('follow-rate-limit', default=default_container_logs_config['follow-rate-limit']):
+            tx.BinarySize(),
+        t.Key('max-followers', default=default_container_logs_config['max-followers']): t.Int[0:],
+        t.Key('compression', default=default_container_logs_config['compression']):
+            t.Enum('none', 'snappy'),
     }).allow_extra('*')
 }).allow_extra('*')
 
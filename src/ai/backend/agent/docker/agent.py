@@ -15,8 +15,10 @@ import shutil
 import signal
 import struct
 import sys
+import time
 from typing import (
     Any,
+    AsyncIterator,
     FrozenSet,
     Dict,
     List,
@@ -27,19 +29,17 @@ from typing import (
     Tuple,
     TYPE_CHECKING,
 )
+import uuid
 
 from aiodocker.docker import Docker, DockerContainer
 from aiodocker.exceptions import DockerError, DockerContainerError
+import aiohttp
 import aiotools
 from async_timeout import timeout
 import attr
 import zmq
 
-from ai.backend.common.docker import (
-    ImageRef,
-    MIN_KERNELSPEC,
-    MAX_KERNELSPEC,
-)
+from ai.backend.common.docker import ImageRef
 from ai.backend.common.exception import ImageNotAvailable
 from ai.backend.common.logging import BraceStyleAdapter, pretty
 from ai.backend.common.plugin.monitor import ErrorPluginContext, StatsPluginContext
@@ -60,11 +60,13 @@ from ai.backend.common.types import (
     current_resource_slots,
 )
 from ai.backend.common.utils import AsyncFileWriter, current_loop
+from .images import ImageIndex
 from .kernel import DockerKernel
 from .resources import detect_resources
 from .utils import PersistentServiceContainer
 from ..exception import UnsupportedResource, InitializationError
-from ..fs import create_scratch_filesystem, destroy_scratch_filesystem
+from ..fs import ScratchSkeleton, create_scratch_filesystem, destroy_scratch_filesystem
+from ..images import ImagePullProgress, PullProgressCallback
 from ..kernel import KernelFeatures
 from ..resources import (
     Mount,
@@ -84,6 +86,7 @@ from ..resources import (
 from ..server import (
     get_extra_volumes,
 )
+from ..timing import phase
 from ..types import (
     Container,
     Port,
@@ -92,6 +95,7 @@ from ..types import (
 )
 from ..utils import (
     update_nested_dict,
+    get_cgroup_version,
     get_kernel_id_from_container,
     host_pid_to_container_pid,
     container_pid_to_host_pid,
@@ -103,6 +107,29 @@ if TYPE_CHECKING:
 log = BraceStyleAdapter(logging.getLogger(__name__))
 eof_sentinel = Sentinel.TOKEN
 
+# The interval to fully re-list the containers to correct the container cache
+# in case we have missed some Docker events.
+container_cache_reconcile_interval = 60.0
+
+# The resource limits which can be changed for running containers when adopting warm kernels.
+_updatable_host_config_keys = frozenset([
+    'CpuPeriod', 'CpuQuota', 'CpusetCpus', 'CpusetMems',
+    'Memory', 'MemorySwap', 'MemoryReservation',
+])
+
+# The dotfiles placed in the work directories of new kernels,
+# as their relative paths mapped to the resource names in ai.backend.runner.
+scratch_skeleton_files = {
+    '.jupyter/custom/custom.css': 'jupyter-custom.css',
+    '.jupyter/custom/logo.svg': 'logo.svg',
+    '.jupyter/custom/roboto.ttf': 'roboto.ttf',
+    '.jupyter/custom/roboto-italic.ttf': 'roboto-italic.ttf',
+    '.bashrc': '.bashrc',
+    '.bash_profile': '.bash_profile',
+    '.vimrc': '.vimrc',
+    '.tmux.conf': '.tmux.conf',
+}
+
 
 def container_from_docker_container(src: DockerContainer) -> Container:
     ports = []
@@ -125,6 +152,29 @@ def container_from_docker_container(src: DockerContainer) -> Container:
     )
 
 
+async def _demux_log_stream(
+    reader: aiohttp.StreamReader,
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    """
+    Strip the 8-byte frame headers (the stream type, 3 zero bytes, and the big-endian
+    payload size) from the logs of containers without TTYs, which multiplex
+    stdout and stderr into a single stream.
+    """
+    while True:
+        try:
+            header = await reader.readexactly(8)
+        except asyncio.IncompleteReadError:
+            return
+        _, frame_size = struct.unpack('>BxxxL', header)
+        while frame_size > 0:
+            fragment = await reader.read(min(frame_size, chunk_size))
+            if not fragment:
+                return
+            frame_size -= len(fragment)
+            yield fragment
+
+
 def _DockerError_reduce(self):
     return (
         type(self),
@@ -153,7 +203,13 @@ class DockerKernelCreationContext(KernelCreationContext):
 class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
 
     docker: Docker
+    docker_info: Mapping[str, Any]
     monitor_docker_task: asyncio.Task
+    _container_cache: Dict[ContainerId, Tuple[KernelId, Container]]
+    _container_cache_lock: asyncio.Lock
+    _container_cache_reconciled_at: Optional[float]
+    image_index: ImageIndex
+    scratch_skeleton: ScratchSkeleton
     agent_sockpath: Path
     agent_sock_task: asyncio.Task
     scan_images_timer: asyncio.Task
@@ -180,12 +236,35 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
         DockerError.__reduce__ = _DockerError_reduce                     # type: ignore
         DockerContainerError.__reduce__ = _DockerContainerError_reduce   # type: ignore
 
+        if self.warm_pool.enabled and local_config['container']['scratch-type'] == 'memory':
+            # Mounted tmpfs scratch directories cannot be renamed upon adoption.
+            log.warning('the warm pool is disabled as it does not support the memory scratch type')
+            self.warm_pool.size = 0
+
     async def __ainit__(self) -> None:
         self.docker = Docker()
+        self.docker_info = {}
+        self._container_cache = {}
+        self._container_cache_lock = asyncio.Lock()
+        self._container_cache_reconciled_at = None
+        self.image_index = ImageIndex(self.docker)
+        # Keep the skeleton in the scratch root so that it can be reflinked into scratch dirs.
+        self.scratch_skeleton = ScratchSkeleton(
+            self.local_config['container']['scratch-root'] / '.skeleton',
+            {
+                relpath: Path(pkg_resources.resource_filename('ai.backend.runner', name))
+                for relpath, name in scratch_skeleton_files.items()
+            },
+        )
+        await current_loop().run_in_executor(None, self.scratch_skeleton.build)
         if not self._skip_initial_scan:
             docker_version = await self.docker.version()
             log.info('running with Docker {0} with API {1}',
                      docker_version['Version'], docker_version['ApiVersion'])
+            self.docker_info = await self.docker.system.info()
+            log.info('using the {0} cgroup driver with cgroup v{1}',
+                     self.docker_info.get('CgroupDriver', 'cgroupfs'), get_cgroup_version())
+            await self._remove_stale_warm_kernels()
         await super().__ainit__()
         await self.check_swarm_status()
         if self.heartbeat_extra_info['swarm_enabled']:
@@ -248,6 +327,53 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
         self,
         status_filter: FrozenSet[ContainerStatus] = ACTIVE_STATUS_SET,
     ) -> Sequence[Tuple[KernelId, Container]]:
+        """
+        Enumerate the containers from the container cache, which is kept up-to-date
+        by the Docker events and reconciled with the full container list periodically.
+        """
+        async with self._container_cache_lock:
+            now = time.monotonic()
+            if (self._container_cache_reconciled_at is None or
+                    now - self._container_cache_reconciled_at > container_cache_reconcile_interval):
+                self._container_cache = {
+                    container.id: (kernel_id, container)
+                    for kernel_id, container in (await self._list_containers())
+                }
+                self._container_cache_reconciled_at = now
+            return [
+                (kernel_id, container)
+                for kernel_id, container in self._container_cache.values()
+                if container.status in status_filter
+            ]
+
+    def invalidate_container_cache(self) -> None:
+        """
+        Let the next enumeration re-list the containers from the Docker daemon.
+        """
+        self._container_cache_reconciled_at = None
+
+    async def _update_container_cache(
+        self,
+        kernel_id: KernelId,
+        container_id: ContainerId,
+    ) -> None:
+        try:
+            container = await self.docker.containers.get(container_id)
+        except DockerError:
+            # already gone
+            await self._forget_container_cache(container_id)
+            return
+        async with self._container_cache_lock:
+            self._container_cache[container_id] = (
+                kernel_id,
+                container_from_docker_container(container),
+            )
+
+    async def _forget_container_cache(self, container_id: ContainerId) -> None:
+        async with self._container_cache_lock:
+            self._container_cache.pop(container_id, None)
+
+    async def _list_containers(self) -> Sequence[Tuple[KernelId, Container]]:
         result = []
         fetch_tasks = []
         for container in (await self.docker.containers.list()):
@@ -257,14 +383,13 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                     kernel_id = await get_kernel_id_from_container(container)
                     if kernel_id is None:
                         return
-                    if container['State']['Status'] in status_filter:
-                        await container.show()
-                        result.append(
-                            (
-                                kernel_id,
-                                container_from_docker_container(container),
-                            )
+                    await container.show()
+                    result.append(
+                        (
+                            kernel_id,
+                            container_from_docker_container(container),
                         )
+                    )
                 except asyncio.CancelledError:
                     raise
                 except Exception:
@@ -305,21 +430,9 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
             pass
 
     async def scan_images(self) -> Mapping[str, str]:
-        all_images = await self.docker.images.list()
-        updated_images = {}
-        for image in all_images:
-            if image['RepoTags'] is None:
-                continue
-            for repo_tag in image['RepoTags']:
-                if repo_tag.endswith('<none>'):
-                    continue
-                img_detail = await self.docker.images.inspect(repo_tag)
-                labels = img_detail['Config']['Labels']
-                if labels is None or 'ai.backend.kernelspec' not in labels:
-                    continue
-                kernelspec = int(labels['ai.backend.kernelspec'])
-                if MIN_KERNELSPEC <= kernelspec <= MAX_KERNELSPEC:
-                    updated_images[repo_tag] = img_detail['Id']
+        # The image index is kept up-to-date by the Docker events and re-synchronized rarely.
+        await self.image_index.ensure_synced()
+        updated_images = self.image_index.get_kernel_images()
         for added_image in (updated_images.keys() - self.images.keys()):
             log.debug('found kernel image: {0}', added_image)
         for removed_image in (self.images.keys() - updated_images.keys()):
@@ -399,7 +512,13 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                 if not terminating:
                     log.info("handle_agent_socket(): rebinding the socket")
 
-    async def pull_image(self, image_ref: ImageRef, registry_conf: ImageRegistry) -> None:
+    async def pull_image(
+        self,
+        image_ref: ImageRef,
+        registry_conf: ImageRegistry,
+        *,
+        progress_cb: Optional[PullProgressCallback] = None,
+    ) -> None:
         auth_config = None
         reg_user = registry_conf.get('username')
         reg_passwd = registry_conf.get('password')
@@ -411,28 +530,76 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                 'auth': encoded_creds,
             }
         log.info('pulling image {} from registry', image_ref.canonical)
-        await self.docker.images.pull(
+        progress = ImagePullProgress(image_ref.canonical)
+        async for status in self.docker.images.pull(
             image_ref.canonical,
-            auth=auth_config)
+            auth=auth_config,
+            stream=True,
+        ):
+            if 'error' in status:
+                raise DockerError(500, {'message': status['error']})
+            layer_id = status.get('id')
+            if layer_id is None or layer_id == image_ref.tag:
+                continue
+            if status.get('status') == 'Downloading':
+                detail = status.get('progressDetail') or {}
+                progress.update_layer(layer_id, detail.get('current', 0), detail.get('total', 0))
+            elif status.get('status') in ('Download complete', 'Pull complete', 'Already exists'):
+                progress.complete_layer(layer_id)
+            else:
+                continue
+            if progress_cb is not None:
+                await progress_cb(progress)
+        # Let the next check_image() see the pulled image without waiting for the event.
+        await self.image_index.refresh(image_ref.canonical)
 
     async def check_image(self, image_ref: ImageRef, image_id: str, auto_pull: AutoPullBehavior) -> bool:
+        local_image_id = self.image_index.get_image_id(image_ref.canonical)
+        if local_image_id is None:
+            # The image may have been added after the last index update.
+            image_info = await self.image_index.refresh(image_ref.canonical)
+            if image_info is not None:
+                local_image_id = image_info['Id']
+        if local_image_id is None:
+            if auto_pull == AutoPullBehavior.NONE:
+                raise ImageNotAvailable(image_ref)
+            return True
+        if auto_pull == AutoPullBehavior.DIGEST:
+            if local_image_id != image_id:
+                return True
+        log.info('found the local up-to-date image for {}', image_ref.canonical)
+        return False
+
+    async def _create_container(
+        self,
+        ctx: DockerKernelCreationContext,
+        container_config: Mapping[str, Any],
+        name: str,
+    ) -> DockerContainer:
         try:
-            image_info = await self.docker.images.inspect(image_ref.canonical)
-            if auto_pull == AutoPullBehavior.DIGEST:
-                if image_info['Id'] != image_id:
-                    return True
-            log.info('found the local up-to-date image for {}', image_ref.canonical)
+            return await self.docker.containers.create(config=container_config, name=name)
         except DockerError as e:
-            if e.status == 404:
-                if auto_pull == AutoPullBehavior.DIGEST:
-                    return True
-                elif auto_pull == AutoPullBehavior.TAG:
-                    return True
-                elif auto_pull == AutoPullBehavior.NONE:
-                    raise ImageNotAvailable(image_ref)
-            else:
+            if e.status != 404:
                 raise
-        return False
+        # The image index may still have the image removed after check_image()
+        # if we have missed its deletion event, so re-check the image once.
+        log.warning('the image {} is missing upon container creation; re-checking it',
+                    ctx.image_ref.canonical)
+        await self.image_index.refresh(ctx.image_ref.canonical)
+        image_config = ctx.kernel_config['image']
+        do_pull = await self.check_image(
+            ctx.image_ref,
+            image_config['digest'],
+            AutoPullBehavior(ctx.kernel_config.get('auto_pull', 'digest')),
+        )
+        if do_pull:
+            await self.image_pulls.pull(
+                ctx.image_ref,
+                lambda progress_cb: self.pull_image(
+                    ctx.image_ref, image_config['registry'], progress_cb=progress_cb,
+                ),
+            )
+        return await self.docker.containers.create(config=container_config, name=name)
 
     async def create_kernel__init_context(
         self,
@@ -440,8 +607,13 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
         kernel_config: KernelCreationConfig,
         *,
         restarting: bool = False,
+        warm: bool = False,
     ) -> DockerKernelCreationContext:
-        base_ctx = await super().create_kernel__init_context(kernel_id, kernel_config)
+        base_ctx = await super().create_kernel__init_context(
+            kernel_id, kernel_config,
+            restarting=restarting,
+            warm=warm,
+        )
         scratch_dir = (self.local_config['container']['scratch-root'] / str(kernel_id)).resolve()
         tmp_dir = (self.local_config['container']['scratch-root'] / f'{kernel_id}_tmp').resolve()
         return DockerKernelCreationContext(
@@ -502,6 +674,11 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
     ) -> None:
         loop = current_loop()
 
+        if not ctx.restarting:
+            # Remove the half-prepared scratch directories if the creation fails.
+            # (Restarted kernels keep their existing ones.)
+            ctx.cancellation_handlers.append(partial(self._destroy_scratch_dirs, ctx))
+
         # Create the scratch, config, and work directories.
         if (
             sys.platform.startswith('linux')
@@ -525,46 +702,28 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
             # as root in the host-side filesystem, which prevents deletion of scratch
             # directories when the agent is running as non-root.
             def _clone_dotfiles():
-                jupyter_custom_css_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', 'jupyter-custom.css'))
-                logo_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', 'logo.svg'))
-                font_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', 'roboto.ttf'))
-                font_italic_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', 'roboto-italic.ttf'))
-                bashrc_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', '.bashrc'))
-                bash_profile_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', '.bash_profile'))
-                vimrc_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', '.vimrc'))
-                tmux_conf_path = Path(pkg_resources.resource_filename(
-                    'ai.backend.runner', '.tmux.conf'))
-                jupyter_custom_dir = (ctx.work_dir / '.jupyter' / 'custom')
-                jupyter_custom_dir.mkdir(parents=True, exist_ok=True)
-                shutil.copy(jupyter_custom_css_path.resolve(), jupyter_custom_dir / 'custom.css')
-                shutil.copy(logo_path.resolve(), jupyter_custom_dir / 'logo.svg')
-                shutil.copy(font_path.resolve(), jupyter_custom_dir / 'roboto.ttf')
-                shutil.copy(font_italic_path.resolve(), jupyter_custom_dir / 'roboto-italic.ttf')
-                shutil.copy(bashrc_path.resolve(), ctx.work_dir / '.bashrc')
-                shutil.copy(bash_profile_path.resolve(), ctx.work_dir / '.bash_profile')
-                shutil.copy(vimrc_path.resolve(), ctx.work_dir / '.vimrc')
-                shutil.copy(tmux_conf_path.resolve(), ctx.work_dir / '.tmux.conf')
+                self.scratch_skeleton.instantiate(ctx.work_dir)
                 if KernelFeatures.UID_MATCH in ctx.kernel_features:
                     uid = self.local_config['container']['kernel-uid']
                     gid = self.local_config['container']['kernel-gid']
                     if os.geteuid() == 0:  # only possible when I am root.
                         os.chown(ctx.work_dir, uid, gid)
-                        os.chown(ctx.work_dir / '.jupyter', uid, gid)
-                        os.chown(ctx.work_dir / '.jupyter' / 'custom', uid, gid)
-                        os.chown(ctx.work_dir / '.bashrc', uid, gid)
-                        os.chown(ctx.work_dir / '.bash_profile', uid, gid)
-                        os.chown(ctx.work_dir / '.vimrc', uid, gid)
-                        os.chown(ctx.work_dir / '.tmux.conf', uid, gid)
+                        for relpath in self.scratch_skeleton.paths:
+                            os.chown(ctx.work_dir / relpath, uid, gid)
 
             await loop.run_in_executor(None, _clone_dotfiles)
 
+    async def _destroy_scratch_dirs(self, ctx: DockerKernelCreationContext) -> None:
+        loop = current_loop()
+        if (sys.platform.startswith('linux') and
+            self.local_config['container']['scratch-type'] == 'memory'):
+            await destroy_scratch_filesystem(ctx.scratch_dir)
+            await destroy_scratch_filesystem(ctx.tmp_dir)
+            await loop.run_in_executor(
+                None, partial(shutil.rmtree, ctx.tmp_dir, ignore_errors=True))
+        await loop.run_in_executor(
+            None, partial(shutil.rmtree, ctx.scratch_dir, ignore_errors=True))
+
     async def create_kernel__get_intrinsic_mounts(
         self,
         ctx: DockerKernelCreationContext,
@@ -679,7 +838,7 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
             except Exception:
                 log.exception('error while writing cluster keypair')
 
-        current_loop().run_in_executor(None, _write_keypair)
+        await current_loop().run_in_executor(None, _write_keypair)
 
     async def create_kernel__process_mounts(
         self,
@@ -912,47 +1071,38 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
         encoded_preopen_ports = ','.join(f'{port_no}:preopen:{port_no}' for port_no in preopen_ports)
         container_config['Labels']['ai.backend.service-ports'] = \
                 image_labels['ai.backend.service-ports'] + ',' + encoded_preopen_ports
+        if ctx.warm:
+            # Labels are immutable, so the kernel-id label of a warm kernel keeps its warm-up ID
+            # after adoption.  Use the container name (see get_kernel_id_from_container())
+            # or the agent's kernel registry to get the adopted kernel ID of such containers.
+            container_config['Labels']['ai.backend.warm-kernel'] = '1'
         update_nested_dict(container_config, ctx.computer_docker_args)
-        kernel_name = f"kernel.{ctx.image_ref.name.split('/')[-1]}.{ctx.kernel_id}"
+        # Warm kernels are not recognized as kernels until adopted.
+        kernel_name_prefix = 'warm' if ctx.warm else 'kernel'
+        kernel_name = f"{kernel_name_prefix}.{ctx.image_ref.name.split('/')[-1]}.{ctx.kernel_id}"
         log.debug('full container config: {!r}', pretty(container_config))
 
         # We are all set! Create and start the container.
         try:
-            container = await self.docker.containers.create(
-                config=container_config, name=kernel_name)
-            cid = container._id
-
-            resource_spec.container_id = cid
-            # Write resource.txt again to update the contaienr id.
-            with open(ctx.config_dir / 'resource.txt', 'w') as f:
-                await loop.run_in_executor(None, resource_spec.write_to_file, f)
-            async with AsyncFileWriter(
-                    loop=loop,
-                    target_filename=ctx.config_dir / 'resource.txt',
-                    access_mode='a') as writer:
-                for dev_name, device_alloc in resource_spec.allocations.items():
-                    computer_ctx = self.computers[dev_name]
-                    kvpairs = \
-                        await computer_ctx.instance.generate_resource_data(device_alloc)
-                    for k, v in kvpairs.items():
-                        await writer.write(f'{k}={v}\n')
+            with phase('container-create'):
+                container = await self._create_container(ctx, container_config, kernel_name)
+                cid = container._id
 
-            await container.start()
+                resource_spec.container_id = cid
+                # Write resource.txt again to update the contaienr id.
+                await self._write_resource_spec(ctx, resource_spec)
+
+            with phase('container-start'):
+                await container.start()
         except asyncio.CancelledError:
             raise
         except Exception:
-            # Oops, we have to restore the allocated resources!
-            if (sys.platform.startswith('linux') and
-                self.local_config['container']['scratch-type'] == 'memory'):
-                await destroy_scratch_filesystem(ctx.scratch_dir)
-                await destroy_scratch_filesystem(ctx.tmp_dir)
-                await loop.run_in_executor(None, shutil.rmtree, ctx.tmp_dir)
-            await loop.run_in_executor(None, shutil.rmtree, ctx.scratch_dir)
+            # Oops, we have to restore the ports!
+            # (The scratch directories and allocations are released by the caller.)
             self.port_pool.update(host_ports)
-            async with self.resource_lock:
-                for dev_name, device_alloc in resource_spec.allocations.items():
-                    self.computers[dev_name].alloc_map.free(device_alloc)
             raise
+        # Let the resource rescans see the new container without waiting for the start event.
+        await self._update_container_cache(ctx.kernel_id, ContainerId(cid))
 
         ctnr_host_port_map: MutableMapping[int, int] = {}
         stdin_port = 0
@@ -995,6 +1145,103 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
             })
         return kernel_obj
 
+    async def _write_resource_spec(
+        self,
+        ctx: DockerKernelCreationContext,
+        resource_spec: KernelResourceSpec,
+    ) -> None:
+        loop = current_loop()
+        with open(ctx.config_dir / 'resource.txt', 'w') as f:
+            await loop.run_in_executor(None, resource_spec.write_to_file, f)
+        async with AsyncFileWriter(
+                loop=loop,
+                target_filename=ctx.config_dir / 'resource.txt',
+                access_mode='a') as writer:
+            for dev_name, device_alloc in resource_spec.allocations.items():
+                computer_ctx = self.computers[dev_name]
+                kvpairs = \
+                    await computer_ctx.instance.generate_resource_data(device_alloc)
+                for k, v in kvpairs.items():
+                    await writer.write(f'{k}={v}\n')
+
+    async def create_kernel__adopt_warm_kernel(
+        self,
+        ctx: DockerKernelCreationContext,
+        warm_kernel: DockerKernel,
+        resource_spec: KernelResourceSpec,
+    ) -> DockerKernel:
+        loop = current_loop()
+        scratch_root = self.local_config['container']['scratch-root']
+        warm_scratch_dir = (scratch_root / str(warm_kernel.kernel_id)).resolve()
+        container = self.docker.containers.container(warm_kernel['container_id'])
+        cid = ContainerId(container._id)
+        try:
+            # Stopped containers can be updated and renamed as well, but cannot be used.
+            container_info = await container.show()
+            if not container_info['State']['Running']:
+                raise RuntimeError(f'the warm kernel container (c:{cid}) is not running')
+            update_config: Dict[str, Any] = {}
+            for dev_name, device_alloc in resource_spec.allocations.items():
+                computer_ctx = self.computers[dev_name]
+                docker_args = await computer_ctx.instance.generate_docker_args(
+                    self.docker, device_alloc)
+                update_config.update({
+                    k: v for k, v in docker_args.get('HostConfig', {}).items()
+                    if k in _updatable_host_config_keys
+                })
+            await self.docker._query_json(
+                f'containers/{cid}/update', method='POST', data=update_config)
+            # The bind mounts of the running container follow the renamed directory.
+            await loop.run_in_executor(None, warm_scratch_dir.rename, ctx.scratch_dir)
+            await container.rename(f"kernel.{ctx.image_ref.name.split('/')[-1]}.{ctx.kernel_id}")
+        except Exception:
+            await self.discard_warm_kernel(warm_kernel)
+            await loop.run_in_executor(
+                None, partial(shutil.rmtree, ctx.scratch_dir, ignore_errors=True))
+            raise
+        resource_spec.container_id = cid
+        await self._write_resource_spec(ctx, resource_spec)
+        await self._update_container_cache(ctx.kernel_id, cid)
+        warm_kernel.kernel_id = ctx.kernel_id  # type: ignore  # (annotated as str)
+        warm_kernel.resource_spec = resource_spec
+        if warm_kernel.runner is not None:
+            warm_kernel.runner.kernel_id = ctx.kernel_id
+        return warm_kernel
+
+    async def discard_warm_kernel(self, kernel_obj: DockerKernel) -> None:
+        loop = current_loop()
+        if kernel_obj.runner is not None:
+            await kernel_obj.runner.close()
+        await kernel_obj.close()
+        container = self.docker.containers.container(kernel_obj['container_id'])
+        try:
+            await container.delete(force=True, v=True)
+        except DockerError as e:
+            if e.status != 404:
+                log.warning('failed to delete a warm kernel container (c:{})',
+                            kernel_obj['container_id'], exc_info=e)
+        self.port_pool.update(kernel_obj['host_ports'])
+        scratch_dir = self.local_config['container']['scratch-root'] / str(kernel_obj.kernel_id)
+        await loop.run_in_executor(None, partial(shutil.rmtree, scratch_dir, ignore_errors=True))
+
+    async def _remove_stale_warm_kernels(self) -> None:
+        # Warm kernels are not restored after agent restarts or crashes.
+        loop = current_loop()
+        scratch_root = self.local_config['container']['scratch-root']
+        for container in (await self.docker.containers.list(all=True)):
+            name = container['Names'][0].lstrip('/') if container['Names'] else ''
+            if not name.startswith('warm.'):
+                continue
+            log.info('removing a stale warm kernel container ({})', name)
+            try:
+                await container.delete(force=True, v=True)
+            except DockerError as e:
+                if e.status != 404:
+                    raise
+            scratch_dir = scratch_root / name.rsplit('.', 1)[-1]
+            await loop.run_in_executor(
+                None, partial(shutil.rmtree, scratch_dir, ignore_errors=True))
+
     async def restart_kernel__load_config(
         self,
         kernel_id: KernelId,
@@ -1037,14 +1284,12 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
             await container.stop()
         except DockerError as e:
             if e.status == 409 and 'is not running' in e.message:
-                # already dead
+                # already dead (the allocations are released upon its CLEAN event)
                 log.warning('destroy_kernel(k:{0}) already dead', kernel_id)
-                await self.rescan_resource_usage()
             elif e.status == 404:
-                # missing
+                # missing (the lifecycle sync will inject its CLEAN event)
                 log.warning('destroy_kernel(k:{0}) kernel missing, '
                             'forgetting this kernel', kernel_id)
-                await self.rescan_resource_usage()
             else:
                 log.exception('destroy_kernel(k:{0}) kill error', kernel_id)
                 self.error_monitor.capture_exception()
@@ -1057,17 +1302,9 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
     ) -> None:
         loop = current_loop()
         if container_id is not None:
-            container = self.docker.containers.container(container_id)
-
-            async def log_iter():
-                async for line in container.log(
-                    stdout=True, stderr=True, follow=True,
-                ):
-                    yield line.encode('utf-8')
-
             try:
-                with timeout(60):
-                    await self.collect_logs(kernel_id, container_id, log_iter())
+                with timeout(60), phase('log-collection'):
+                    await self.collect_logs(kernel_id, container_id)
             except asyncio.TimeoutError:
                 log.warning('timeout for collecting container logs (cid:{})', container_id)
             except Exception as e:
@@ -1087,7 +1324,7 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
         if not self.local_config['debug']['skip-container-deletion'] and container_id is not None:
             container = self.docker.containers.container(container_id)
             try:
-                with timeout(90):
+                with timeout(90), phase('container-deletion'):
                     await container.delete(force=True, v=True)
             except DockerError as e:
                 if e.status == 409 and 'already in progress' in e.message:
@@ -1107,15 +1344,39 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
             scratch_dir = scratch_root / str(kernel_id)
             tmp_dir = scratch_root / f'{kernel_id}_tmp'
             try:
-                if (sys.platform.startswith('linux') and
-                    self.local_config['container']['scratch-type'] == 'memory'):
-                    await destroy_scratch_filesystem(scratch_dir)
-                    await destroy_scratch_filesystem(tmp_dir)
-                    await loop.run_in_executor(None, shutil.rmtree, tmp_dir)
-                await loop.run_in_executor(None, shutil.rmtree, scratch_dir)
+                with phase('scratch-deletion'):
+                    if (sys.platform.startswith('linux') and
+                        self.local_config['container']['scratch-type'] == 'memory'):
+                        await destroy_scratch_filesystem(scratch_dir)
+                        await destroy_scratch_filesystem(tmp_dir)
+                        await loop.run_in_executor(None, shutil.rmtree, tmp_dir)
+                    await loop.run_in_executor(None, shutil.rmtree, scratch_dir)
             except FileNotFoundError:
                 pass
 
+    async def iter_container_logs(
+        self,
+        container_id: ContainerId,
+        *,
+        follow: bool,
+    ) -> AsyncIterator[bytes]:
+        chunk_size = self.local_config['agent']['container-logs']['chunk-size']
+        container_info = await self.docker.containers.container(container_id).show()
+        # DockerContainer.log() only yields the decoded lines,
+        # so we read the raw response stream instead.
+        async with self.docker._query(
+            f'containers/{container_id}/logs',
+            method='GET',
+            params={'stdout': True, 'stderr': True, 'follow': follow},
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=None),
+        ) as response:
+            if container_info['Config'].get('Tty', False):
+                async for fragment in response.content.iter_chunked(chunk_size):
+                    yield fragment
+            else:
+                async for fragment in _demux_log_stream(response.content, chunk_size):
+                    yield fragment
+
     async def create_overlay_network(self, network_name: str) -> None:
         if not self.heartbeat_extra_info['swarm_enabled']:
             raise RuntimeError("This agent has not joined to a swarm cluster.")
@@ -1148,6 +1409,7 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
     async def monitor_docker_events(self):
 
         async def handle_action_start(kernel_id: KernelId, evdata: Mapping[str, Any]) -> None:
+            await self._update_container_cache(kernel_id, ContainerId(evdata['Actor']['ID']))
             await self.inject_container_lifecycle_event(
                 kernel_id,
                 LifecycleEvent.START,
@@ -1157,6 +1419,8 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
 
         async def handle_action_die(kernel_id: KernelId, evdata: Mapping[str, Any]) -> None:
             # When containers die, we immediately clean up them.
+            self.stat_ctx.cgroup_files.invalidate(evdata['Actor']['ID'])
+            await self._forget_container_cache(ContainerId(evdata['Actor']['ID']))
             reason = None
             kernel_obj = self.kernel_registry.get(kernel_id)
             if kernel_obj is not None:
@@ -1173,6 +1437,15 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                 exit_code=exit_code,
             )
 
+        async def handle_warm_action_die(container_name: str, evdata: Mapping[str, Any]) -> None:
+            # Warm kernels are not registered, so release them directly.
+            try:
+                kernel_id = KernelId(uuid.UUID(container_name.rsplit('.', 1)[-1]))
+            except ValueError:
+                return
+            self.stat_ctx.cgroup_files.invalidate(evdata['Actor']['ID'])
+            await self.handle_warm_kernel_exit(kernel_id)
+
         while True:
             subscriber = self.docker.events.subscribe(create_task=True)
             try:
@@ -1183,7 +1456,13 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                         if evdata is None:
                             # Break out to the outermost loop when the connection is closed
                             log.info("monitor_docker_events(): restarting aiodocker event subscriber")
+                            # We may miss some events until resubscribing.
+                            self.invalidate_container_cache()
+                            self.image_index.invalidate()
                             break
+                        if evdata['Type'] == 'image':
+                            await asyncio.shield(self.image_index.handle_event(evdata))
+                            continue
                         if evdata['Type'] != 'container':
                             # Our interest is the container-related events
                             continue
@@ -1191,6 +1470,10 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                             log.debug('docker-event: action={}, actor={}',
                                       evdata['Action'], evdata['Actor'])
                         container_name = evdata['Actor']['Attributes']['name']
+                        if container_name.startswith('warm.'):
+                            if evdata['Action'] == 'die':
+                                await asyncio.shield(handle_warm_action_die(container_name, evdata))
+                            continue
                         kernel_id = await get_kernel_id_from_container(container_name)
                         if kernel_id is None:
                             continue
@@ -1198,11 +1481,19 @@ class DockerAgent(AbstractAgent[DockerKernel, DockerKernelCreationContext]):
                             await asyncio.shield(handle_action_start(kernel_id, evdata))
                         elif evdata['Action'] == 'die':
                             await asyncio.shield(handle_action_die(kernel_id, evdata))
+                        elif evdata['Action'] == 'destroy':
+                            await asyncio.shield(self._forget_container_cache(
+                                ContainerId(evdata['Actor']['ID'])))
+                        elif evdata['Action'] in ('pause', 'unpause'):
+                            await asyncio.shield(self._update_container_cache(
+                                kernel_id, ContainerId(evdata['Actor']['ID'])))
                     except asyncio.CancelledError:
                         # We are shutting down...
                         return
                     except Exception:
                         log.exception("monitor_docker_events(): unexpected error")
+                        self.invalidate_container_cache()
+                        self.image_index.invalidate()
             finally:
                 await asyncio.shield(self.docker.events.stop())
 
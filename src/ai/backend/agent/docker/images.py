@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import (
+    Any,
+    Dict,
+    Mapping,
+    Optional,
+    Set,
+)
+
+from aiodocker.docker import Docker
+from aiodocker.exceptions import DockerError
+import attr
+
+from ai.backend.common.docker import (
+    MIN_KERNELSPEC,
+    MAX_KERNELSPEC,
+)
+from ai.backend.common.logging import BraceStyleAdapter
+
+log = BraceStyleAdapter(logging.getLogger(__name__))
+
+__all__ = (
+    'ImageIndex',
+    'normalize_image_ref',
+)
+
+# The interval to fully re-list the images in case we have missed some Docker events.
+image_index_resync_interval = 600.0
+
+
+def normalize_image_ref(ref: str) -> str:
+    """
+    Convert the given image reference into the form used in the ``RepoTags`` of local images.
+    """
+    for prefix in ('index.docker.io/', 'docker.io/'):
+        if ref.startswith(prefix):
+            ref = ref[len(prefix):]
+            if ref.startswith('library/'):
+                ref = ref[len('library/'):]
+            break
+    if '@' not in ref and ':' not in ref.rsplit('/', maxsplit=1)[-1]:
+        ref += ':latest'
+    return ref
+
+
+@attr.s(auto_attribs=True, slots=True)
+class _IndexedImage:
+    repo_tags: Set[str]
+    labels: Mapping[str, str]
+
+
+class ImageIndex:
+    """
+    Keeps the tags and labels of the local images keyed by the image IDs.
+
+    The index is updated from the Docker image events and fully re-synchronized
+    with the image list only rarely, so that the image scans and checks upon
+    kernel creation do not need to inspect the images one by one.
+    """
+
+    docker: Docker
+
+    _images: Dict[str, _IndexedImage]
+    _tags: Dict[str, str]
+    _synced_at: Optional[float]
+    _lock: asyncio.Lock
+
+    def __init__(self, docker: Docker) -> None:
+        self.docker = docker
+        self._images = {}
+        self._tags = {}
+        self._synced_at = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """
+        Let the next access re-synchronize the index with the Docker daemon.
+        """
+        self._synced_at = None
+
+    async def ensure_synced(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            if self._synced_at is not None and now - self._synced_at < image_index_resync_interval:
+                return
+            # The image list already carries the labels, so no per-tag inspection is required.
+            all_images = await self.docker.images.list()
+            self._images.clear()
+            self._tags.clear()
+            for image in all_images:
+                self._set_image(image['Id'], image.get('RepoTags'), image.get('Labels'))
+            self._synced_at = now
+
+    def get_image_id(self, ref: str) -> Optional[str]:
+        return self._tags.get(normalize_image_ref(ref))
+
+    def get_kernel_images(self) -> Mapping[str, str]:
+        """
+        Return the image IDs of the kernel images with supported kernelspec versions
+        keyed by their repository tags.
+        """
+        kernel_images = {}
+        for image_id, image in self._images.items():
+            try:
+                kernelspec = int(image.labels['ai.backend.kernelspec'])
+            except (KeyError, ValueError):
+                continue
+            if MIN_KERNELSPEC <= kernelspec <= MAX_KERNELSPEC:
+                for repo_tag in image.repo_tags:
+                    kernel_images[repo_tag] = image_id
+        return kernel_images
+
+    async def refresh(self, ref: str) -> Optional[Mapping[str, Any]]:
+        """
+        Inspect the given image (by an ID or a reference) and update the index.
+        Returns the inspected image information, or None if the image does not exist.
+        """
+        try:
+            image_info = await self.docker.images.inspect(ref)
+        except DockerError as e:
+            if e.status != 404:
+                raise
+            self._forget_ref(ref)
+            return None
+        self._set_image(
+            image_info['Id'],
+            image_info.get('RepoTags'),
+            (image_info.get('Config') or {}).get('Labels'),
+        )
+        return image_info
+
+    async def handle_event(self, evdata: Mapping[str, Any]) -> None:
+        # ref: https://docs.docker.com/engine/reference/commandline/events/#image-events
+        action = evdata['Action']
+        if action == 'delete':
+            self._forget_image(evdata['Actor']['ID'])
+        elif action in ('pull', 'tag', 'untag', 'import', 'load'):
+            await self.refresh(evdata['Actor']['ID'])
+
+    def _set_image(
+        self,
+        image_id: str,
+        repo_tags: Optional[Any],
+        labels: Optional[Mapping[str, str]],
+    ) -> None:
+        tags = {tag for tag in (repo_tags or []) if not tag.endswith('<none>')}
+        previous = self._images.get(image_id)
+        if previous is not None:
+            for tag in previous.repo_tags - tags:
+                self._tags.pop(tag, None)
+        for tag in tags:
+            # A tag moved from another image (e.g., by pulling a newer version).
+            old_image_id = self._tags.get(tag)
+            if old_image_id is not None and old_image_id != image_id:
+                self._images[old_image_id].repo_tags.discard(tag)
+            self._tags[tag] = image_id
+        self._images[image_id] = _IndexedImage(tags, labels or {})
+
+    def _forget_image(self, image_id: str) -> None:
+        image = self._images.pop(image_id, None)
+        if image is not None:
+            for tag in image.repo_tags:
+                if self._tags.get(tag) == image_id:
+                    del self._tags[tag]
+
+    def _forget_ref(self, ref: str) -> None:
+        if ref in self._images:
+            self._forget_image(ref)
+            return
+        image_id = self._tags.pop(normalize_image_ref(ref), None)
+        if image_id is not None:
+            self._images[image_id].repo_tags.discard(normalize_image_ref(ref))
@@ -1,3 +1,4 @@
+from array import array
 import asyncio
 from decimal import Decimal
 import logging
@@ -5,17 +6,19 @@ import os
 from pathlib import Path
 import platform
 from typing import (
-    cast,
     Any,
+    Awaitable,
     Collection,
     Dict,
     List,
     Mapping,
     Optional,
     Sequence,
+    Tuple,
 )
 
 import aiohttp
+import attr
 from aiodocker.docker import Docker, DockerContainer
 from aiodocker.exceptions import DockerError
 import psutil
@@ -25,6 +28,7 @@ from ai.backend.common.utils import current_loop, nmget
 from ai.backend.common.types import (
     DeviceName, DeviceId,
     DeviceModelInfo,
+    KernelId,
     SlotName, SlotTypes,
     MetricKey,
 )
@@ -33,6 +37,7 @@ from .resources import (
     get_resource_spec_from_container,
 )
 from .. import __version__
+from ..fs import ScratchSizeTracker
 from ..resources import (
     AbstractAllocMap, DeviceSlotInfo,
     DiscretePropertyAllocMap,
@@ -41,18 +46,39 @@ from ..resources import (
 )
 from ..stats import (
     StatContext, NodeMeasurement, ContainerMeasurement,
-    StatModes, MetricTypes, Measurement,
+    StatModes, MetricTypes, Measurement, BatchMeasurement,
+    current_diff, current_rate,
+)
+from ..utils import (
+    get_cgroup_path,
+    get_cgroup_version,
+    parse_cgroup_io_stat,
+    parse_cgroup_stat,
+    parse_pressure,
+    parse_proc_net_dev,
+    read_pressure,
+    read_proc_stat_cpu_usage,
+    PressureStat,
 )
-from ..utils import read_sysfs
 from ..vendor.linux import libnuma
 
 log = BraceStyleAdapter(logging.getLogger(__name__))
 
 
+@attr.s(auto_attribs=True, slots=True)
+class ContainerMemoryStat:
+    mem_cur_bytes: int
+    io_read_bytes: int
+    io_write_bytes: int
+    net_stat: Optional[Tuple[int, int]] = None  # (rx bytes, tx bytes)
+    mem_pressure: Optional[PressureStat] = None
+    io_pressure: Optional[PressureStat] = None
+
+
 async def fetch_api_stats(container: DockerContainer) -> Optional[Dict[str, Any]]:
     short_cid = container._id[:7]
     try:
-        ret = await container.stats(stream=False)  # TODO: cache
+        ret = await container.stats(stream=False)
     except RuntimeError as e:
         msg = str(e.args[0]).lower()
         if 'event loop is closed' in msg or 'session is closed' in msg:
@@ -86,6 +112,106 @@ async def fetch_api_stats(container: DockerContainer) -> Optional[Dict[str, Any]
         return ret
 
 
+async def get_api_stats(ctx: StatContext, container_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the Docker stats API result of the given container, which is shared by
+    all intrinsic plugins within the same collection tick.
+    """
+    return await ctx.get_container_sample(
+        'docker-api', container_id,
+        lambda: fetch_api_stats(DockerContainer(ctx.agent.docker, id=container_id)),  # type: ignore
+    )
+
+
+def read_cgroup_pressure(ctx: StatContext, container_id: str, path: Path) -> Optional[PressureStat]:
+    """
+    Read a PSI file of the container's cgroup, returning None if the kernel does not provide it.
+    """
+    try:
+        return parse_pressure(ctx.cgroup_files.read_text(container_id, path))
+    except (IOError, ValueError):
+        return None
+
+
+def build_node_pressure_measures(
+    resource: str,
+    pressure: Optional[PressureStat],
+) -> List[NodeMeasurement]:
+    """
+    Build the PSI metrics of the node for the given resource ("cpu", "mem", or "io").
+    It returns an empty list if the kernel does not support PSI.
+    """
+    if pressure is None:
+        return []
+    return [
+        NodeMeasurement(
+            MetricKey(f'{resource}_pressure'),
+            MetricTypes.UTILIZATION,
+            unit_hint='percent',
+            stats_filter=frozenset({'avg', 'max'}),
+            per_node=Measurement(Decimal(str(pressure.some_avg10)), Decimal(100)),
+        ),
+        NodeMeasurement(
+            MetricKey(f'{resource}_pressure_full'),
+            MetricTypes.UTILIZATION,
+            unit_hint='percent',
+            stats_filter=frozenset({'avg', 'max'}),
+            per_node=Measurement(Decimal(str(pressure.full_avg10)), Decimal(100)),
+        ),
+        NodeMeasurement(
+            MetricKey(f'{resource}_stall'),
+            MetricTypes.ACCUMULATED,
+            unit_hint='usec',
+            stats_filter=frozenset({'rate'}),
+            per_node=Measurement(Decimal(pressure.some_total)),
+        ),
+    ]
+
+
+def build_container_pressure_measures(
+    resource: str,
+    per_container: Mapping[str, PressureStat],
+) -> List[ContainerMeasurement]:
+    """
+    Build the PSI metrics of containers for the given resource ("cpu", "mem", or "io").
+    It returns an empty list if no container has PSI available.
+    """
+    if not per_container:
+        return []
+    return [
+        ContainerMeasurement(
+            MetricKey(f'{resource}_pressure'),
+            MetricTypes.UTILIZATION,
+            unit_hint='percent',
+            stats_filter=frozenset({'avg', 'max'}),
+            per_container={
+                cid: Measurement(Decimal(str(pressure.some_avg10)), Decimal(100))
+                for cid, pressure in per_container.items()
+            },
+        ),
+        ContainerMeasurement(
+            MetricKey(f'{resource}_pressure_full'),
+            MetricTypes.UTILIZATION,
+            unit_hint='percent',
+            stats_filter=frozenset({'avg', 'max'}),
+            per_container={
+                cid: Measurement(Decimal(str(pressure.full_avg10)), Decimal(100))
+                for cid, pressure in per_container.items()
+            },
+        ),
+        ContainerMeasurement(
+            MetricKey(f'{resource}_stall'),
+            MetricTypes.ACCUMULATED,
+            unit_hint='usec',
+            stats_filter=frozenset({'rate'}),
+            per_container={
+                cid: Measurement(Decimal(pressure.some_total))
+                for cid, pressure in per_container.items()
+            },
+        ),
+    ]
+
+
 # Pseudo-plugins for intrinsic devices (CPU and the main memory)
 
 class CPUDevice(AbstractComputeDevice):
@@ -104,6 +230,14 @@ class CPUPlugin(AbstractComputePlugin):
         (SlotName('cpu'), SlotTypes.COUNT)
     ]
 
+    _core_ids: List[int]
+    _core_device_ids: List[DeviceId]
+
+    def __init__(self, plugin_config: Mapping[str, Any], local_config: Mapping[str, Any]) -> None:
+        super().__init__(plugin_config, local_config)
+        self._core_ids = []
+        self._core_device_ids = []
+
     async def init(self, context: Any = None) -> None:
         pass
 
@@ -145,28 +279,35 @@ class CPUPlugin(AbstractComputePlugin):
         }
 
     async def gather_node_measures(self, ctx: StatContext) -> Sequence[NodeMeasurement]:
-        _cstat = psutil.cpu_times(True)
+        try:
+            core_ids, core_usage = read_proc_stat_cpu_usage()
+        except IOError:
+            # non-Linux hosts
+            _cstat = psutil.cpu_times(True)
+            core_ids = [*range(len(_cstat))]
+            core_usage = array('d', ((c.user + c.system) * 1000 for c in _cstat))
+        if core_ids != self._core_ids:
+            self._core_ids = core_ids
+            self._core_device_ids = [DeviceId(str(core_id)) for core_id in core_ids]
         q = Decimal('0.000')
-        total_cpu_used = cast(Decimal,
-                              sum((Decimal(c.user + c.system) * 1000).quantize(q) for c in _cstat))
+        total_cpu_used = Decimal(sum(core_usage)).quantize(q)
         now, raw_interval = ctx.update_timestamp('cpu-node')
         interval = Decimal(raw_interval * 1000).quantize(q)
+        pressure = read_pressure('/proc/pressure/cpu')
 
         return [
+            *build_node_pressure_measures('cpu', pressure),
             NodeMeasurement(
                 MetricKey('cpu_util'),
                 MetricTypes.UTILIZATION,
                 unit_hint='msec',
-                current_hook=lambda metric: metric.stats.diff,
+                current_hook=current_diff,
                 per_node=Measurement(total_cpu_used, interval),
-                per_device={
-                    DeviceId(str(idx)):
-                    Measurement(
-                        (Decimal(c.user + c.system) * 1000).quantize(q),
-                        interval,
-                    )
-                    for idx, c in enumerate(_cstat)
-                },
+                per_device_batch=BatchMeasurement(
+                    self._core_device_ids,
+                    core_usage,
+                    capacity=raw_interval * 1000,
+                ),
             ),
         ]
 
@@ -176,47 +317,64 @@ class CPUPlugin(AbstractComputePlugin):
         container_ids: Sequence[str],
     ) -> Sequence[ContainerMeasurement]:
 
-        async def sysfs_impl(container_id):
-            cpu_prefix = f'/sys/fs/cgroup/cpuacct/docker/{container_id}/'
-            try:
-                cpu_used = read_sysfs(cpu_prefix + 'cpuacct.usage', int) / 1e6
-            except IOError as e:
-                log.warning('cannot read stats: sysfs unreadable for container {0}\n{1!r}',
-                            container_id[:7], e)
-                return None
-            return cpu_used
+        def sysfs_impl(container_ids: Sequence[str]) \
+                -> List[Tuple[Optional[float], Optional[PressureStat]]]:
+            # Read all containers in a single executor call.
+            cgroup_driver = ctx.agent.docker_info.get('CgroupDriver', 'cgroupfs')  # type: ignore
+            cgroup_version = get_cgroup_version()
+            results: List[Tuple[Optional[float], Optional[PressureStat]]] = []
+            for container_id in container_ids:
+                cpu_path = get_cgroup_path('cpuacct', container_id, driver=cgroup_driver)
+                pressure = None
+                try:
+                    if cgroup_version == '2':
+                        cpu_stat = parse_cgroup_stat(
+                            ctx.cgroup_files.read_text(container_id, cpu_path / 'cpu.stat'))
+                        cpu_used = cpu_stat['usage_usec'] / 1e3
+                        pressure = read_cgroup_pressure(ctx, container_id, cpu_path / 'cpu.pressure')
+                    else:
+                        cpu_used = int(
+                            ctx.cgroup_files.read_text(container_id, cpu_path / 'cpuacct.usage')
+                        ) / 1e6
+                except (IOError, KeyError, ValueError) as e:
+                    log.warning('cannot read stats: sysfs unreadable for container {0}\n{1!r}',
+                                container_id[:7], e)
+                    results.append((None, None))
+                    continue
+                results.append((cpu_used, pressure))
+            return results
 
         async def api_impl(container_id):
-            container = DockerContainer(ctx.agent.docker, id=container_id)
-            ret = await fetch_api_stats(container)
+            ret = await get_api_stats(ctx, container_id)
             if ret is None:
-                return None
+                return None, None
             cpu_used = nmget(ret, 'cpu_stats.cpu_usage.total_usage', 0) / 1e6
-            return cpu_used
+            return cpu_used, None
 
         if ctx.mode == StatModes.CGROUP:
-            impl = sysfs_impl
+            loop = current_loop()
+            results = await loop.run_in_executor(None, sysfs_impl, container_ids)
         elif ctx.mode == StatModes.DOCKER:
-            impl = api_impl
+            results = await asyncio.gather(*[api_impl(cid) for cid in container_ids])
         else:
             raise RuntimeError("should not reach here")
 
         q = Decimal('0.000')
         per_container_cpu_used = {}
-        tasks = []
-        for cid in container_ids:
-            tasks.append(asyncio.ensure_future(impl(cid)))
-        results = await asyncio.gather(*tasks)
-        for cid, cpu_used in zip(container_ids, results):
+        per_container_cpu_pressure = {}
+        for cid, (cpu_used, pressure) in zip(container_ids, results):
             if cpu_used is None:
                 continue
             per_container_cpu_used[cid] = Measurement(Decimal(cpu_used).quantize(q))
+            if pressure is not None:
+                per_container_cpu_pressure[cid] = pressure
         return [
+            *build_container_pressure_measures('cpu', per_container_cpu_pressure),
             ContainerMeasurement(
                 MetricKey('cpu_util'),
                 MetricTypes.UTILIZATION,
                 unit_hint='percent',
-                current_hook=lambda metric: metric.stats.diff,
+                current_hook=current_diff,
                 stats_filter=frozenset({'avg', 'max'}),
                 per_container=per_container_cpu_used,
             ),
@@ -312,6 +470,12 @@ class MemoryPlugin(AbstractComputePlugin):
         (SlotName('mem'), SlotTypes.BYTES)
     ]
 
+    _scratch_trackers: Dict[KernelId, ScratchSizeTracker]
+
+    def __init__(self, plugin_config: Mapping[str, Any], local_config: Mapping[str, Any]) -> None:
+        super().__init__(plugin_config, local_config)
+        self._scratch_trackers = {}
+
     async def init(self, context: Any = None) -> None:
         pass
 
@@ -392,7 +556,7 @@ class MemoryPlugin(AbstractComputePlugin):
                 MetricKey('net_rx'),
                 MetricTypes.RATE,
                 unit_hint='bps',
-                current_hook=lambda metric: metric.stats.rate,
+                current_hook=current_rate,
                 per_node=Measurement(Decimal(net_rx_bytes)),
                 per_device={DeviceId('node'): Measurement(Decimal(net_rx_bytes))},
             ),
@@ -400,65 +564,117 @@ class MemoryPlugin(AbstractComputePlugin):
                 MetricKey('net_tx'),
                 MetricTypes.RATE,
                 unit_hint='bps',
-                current_hook=lambda metric: metric.stats.rate,
+                current_hook=current_rate,
                 per_node=Measurement(Decimal(net_tx_bytes)),
                 per_device={DeviceId('node'): Measurement(Decimal(net_tx_bytes))},
             ),
+            *build_node_pressure_measures('mem', read_pressure('/proc/pressure/memory')),
+            *build_node_pressure_measures('io', read_pressure('/proc/pressure/io')),
         ]
 
     async def gather_container_measures(self, ctx: StatContext, container_ids: Sequence[str]) \
             -> Sequence[ContainerMeasurement]:
 
-        def get_scratch_size(container_id: str) -> int:
-            for kernel_id, info in ctx.agent.kernel_registry.items():
-                if info['container_id'] == container_id:
-                    break
-            else:
-                return 0
-            work_dir = ctx.agent.local_config['container']['scratch-root'] / str(kernel_id) / 'work'
-            total_size = 0
-            for path in work_dir.rglob('*'):
-                if path.is_symlink():
-                    total_size += path.lstat().st_size
-                elif path.is_file():
-                    total_size += path.stat().st_size
-            return total_size
-
-        async def sysfs_impl(container_id):
-            mem_prefix = f'/sys/fs/cgroup/memory/docker/{container_id}/'
-            io_prefix = f'/sys/fs/cgroup/blkio/docker/{container_id}/'
+        kernel_id_map: Dict[str, KernelId] = {
+            info['container_id']: kernel_id
+            for kernel_id, info in ctx.agent.kernel_registry.items()
+        }
+        for kernel_id in self._scratch_trackers.keys() - set(kernel_id_map.values()):
+            del self._scratch_trackers[kernel_id]
+
+        def get_scratch_sizes(container_ids: Sequence[str]) -> List[int]:
+            scratch_sizes = []
+            for container_id in container_ids:
+                try:
+                    kernel_id = kernel_id_map[container_id]
+                except KeyError:
+                    scratch_sizes.append(0)
+                    continue
+                tracker = self._scratch_trackers.get(kernel_id)
+                if tracker is None:
+                    scratch_root = ctx.agent.local_config['container']['scratch-root']
+                    tracker = ScratchSizeTracker(
+                        scratch_root / str(kernel_id) / 'work',
+                        stat_budget=self.local_config['container']['scratch-size-refresh-budget'],
+                    )
+                    self._scratch_trackers[kernel_id] = tracker
+                scratch_sizes.append(tracker.refresh())
+            return scratch_sizes
+
+        def read_net_dev(container_id: str, procs_path: Path) -> Optional[Tuple[int, int]]:
+            # All processes of a container share the same network namespace,
+            # so we read the network statistics via its init process.
             try:
-                mem_cur_bytes = read_sysfs(mem_prefix + 'memory.usage_in_bytes', int)
-                io_stats = Path(io_prefix + 'blkio.throttle.io_service_bytes').read_text()
-                # example data:
-                #   8:0 Read 13918208
-                #   8:0 Write 0
-                #   8:0 Sync 0
-                #   8:0 Async 13918208
-                #   8:0 Total 13918208
-                #   Total 13918208
-                io_read_bytes = 0
-                io_write_bytes = 0
-                for line in io_stats.splitlines():
-                    if line.startswith('Total '):
-                        continue
-                    dev, op, nbytes = line.strip().split()
-                    if op == 'Read':
-                        io_read_bytes += int(nbytes)
-                    elif op == 'Write':
-                        io_write_bytes += int(nbytes)
-            except IOError as e:
-                log.warning('cannot read stats: sysfs unreadable for container {0}\n{1!r}',
-                            container_id[:7], e)
+                pids = ctx.cgroup_files.read_text(container_id, procs_path).split(maxsplit=1)
+                if not pids:
+                    return None
+                net_dev = ctx.cgroup_files.read_text(
+                    container_id, Path('/proc') / pids[0] / 'net' / 'dev')
+                return parse_proc_net_dev(net_dev)
+            except (IOError, IndexError, ValueError):
                 return None
-            loop = current_loop()
-            scratch_sz = await loop.run_in_executor(
-                None, get_scratch_size, container_id)
-            return mem_cur_bytes, io_read_bytes, io_write_bytes, scratch_sz
+
+        def read_cgroup_v1(container_id: str, cgroup_driver: str) -> ContainerMemoryStat:
+            mem_path = get_cgroup_path('memory', container_id, driver=cgroup_driver)
+            io_path = get_cgroup_path('blkio', container_id, driver=cgroup_driver)
+            mem_cur_bytes = int(
+                ctx.cgroup_files.read_text(container_id, mem_path / 'memory.usage_in_bytes'))
+            io_stats = ctx.cgroup_files.read_text(
+                container_id, io_path / 'blkio.throttle.io_service_bytes')
+            # example data:
+            #   8:0 Read 13918208
+            #   8:0 Write 0
+            #   8:0 Sync 0
+            #   8:0 Async 13918208
+            #   8:0 Total 13918208
+            #   Total 13918208
+            io_read_bytes = 0
+            io_write_bytes = 0
+            for line in io_stats.splitlines():
+                if line.startswith('Total '):
+                    continue
+                dev, op, nbytes = line.strip().split()
+                if op == 'Read':
+                    io_read_bytes += int(nbytes)
+                elif op == 'Write':
+                    io_write_bytes += int(nbytes)
+            net_stat = read_net_dev(container_id, mem_path / 'cgroup.procs')
+            return ContainerMemoryStat(mem_cur_bytes, io_read_bytes, io_write_bytes, net_stat)
+
+        def read_cgroup_v2(container_id: str, cgroup_driver: str) -> ContainerMemoryStat:
+            cgroup_path = get_cgroup_path('', container_id, driver=cgroup_driver)
+            mem_cur_bytes = int(
+                ctx.cgroup_files.read_text(container_id, cgroup_path / 'memory.current'))
+            io_read_bytes, io_write_bytes = parse_cgroup_io_stat(
+                ctx.cgroup_files.read_text(container_id, cgroup_path / 'io.stat'))
+            net_stat = read_net_dev(container_id, cgroup_path / 'cgroup.procs')
+            return ContainerMemoryStat(
+                mem_cur_bytes, io_read_bytes, io_write_bytes, net_stat,
+                mem_pressure=read_cgroup_pressure(
+                    ctx, container_id, cgroup_path / 'memory.pressure'),
+                io_pressure=read_cgroup_pressure(
+                    ctx, container_id, cgroup_path / 'io.pressure'),
+            )
+
+        def sysfs_impl(container_ids: Sequence[str]) -> List[Optional[ContainerMemoryStat]]:
+            # Read all containers in a single executor call.
+            cgroup_driver = ctx.agent.docker_info.get('CgroupDriver', 'cgroupfs')  # type: ignore
+            if get_cgroup_version() == '2':
+                read_cgroup = read_cgroup_v2
+            else:
+                read_cgroup = read_cgroup_v1
+            results: List[Optional[ContainerMemoryStat]] = []
+            for container_id in container_ids:
+                try:
+                    results.append(read_cgroup(container_id, cgroup_driver))
+                except (IOError, ValueError) as e:
+                    log.warning('cannot read stats: sysfs unreadable for container {0}\n{1!r}',
+                                container_id[:7], e)
+                    results.append(None)
+            return results
 
         async def api_impl(container_id):
-            container = DockerContainer(ctx.agent.docker, id=container_id)
-            ret = await fetch_api_stats(container)
+            ret = await get_api_stats(ctx, container_id)
             if ret is None:
                 return None
             mem_cur_bytes = nmget(ret, 'memory_stats.usage', 0)
@@ -469,37 +685,59 @@ class MemoryPlugin(AbstractComputePlugin):
                     io_read_bytes += item['value']
                 elif item['op'] == 'Write':
                     io_write_bytes += item['value']
-            loop = current_loop()
-            scratch_sz = await loop.run_in_executor(
-                None, get_scratch_size, container_id)
-            return mem_cur_bytes, io_read_bytes, io_write_bytes, scratch_sz
+            net_stat = None
+            if 'networks' in ret:
+                net_stat = (
+                    sum(item['rx_bytes'] for item in ret['networks'].values()),
+                    sum(item['tx_bytes'] for item in ret['networks'].values()),
+                )
+            return ContainerMemoryStat(mem_cur_bytes, io_read_bytes, io_write_bytes, net_stat)
+
+        async def api_impl_all(container_ids: Sequence[str]) \
+                -> List[Optional[ContainerMemoryStat]]:
+            return await asyncio.gather(*[api_impl(cid) for cid in container_ids])
 
+        loop = current_loop()
+        stats_coro: Awaitable[List[Optional[ContainerMemoryStat]]]
         if ctx.mode == StatModes.CGROUP:
-            impl = sysfs_impl
+            stats_coro = loop.run_in_executor(None, sysfs_impl, container_ids)
         elif ctx.mode == StatModes.DOCKER:
-            impl = api_impl
+            stats_coro = api_impl_all(container_ids)
         else:
             raise RuntimeError("should not reach here")
+        results, scratch_sizes = await asyncio.gather(
+            stats_coro,
+            loop.run_in_executor(None, get_scratch_sizes, container_ids),
+        )
 
         per_container_mem_used_bytes = {}
         per_container_io_read_bytes = {}
         per_container_io_write_bytes = {}
         per_container_io_scratch_size = {}
-        tasks = []
-        for cid in container_ids:
-            tasks.append(asyncio.ensure_future(impl(cid)))
-        results = await asyncio.gather(*tasks)
-        for cid, result in zip(container_ids, results):
+        per_container_net_rx_bytes = {}
+        per_container_net_tx_bytes = {}
+        per_container_mem_pressure: Dict[str, PressureStat] = {}
+        per_container_io_pressure: Dict[str, PressureStat] = {}
+        for cid, result, scratch_size in zip(container_ids, results, scratch_sizes):
             if result is None:
                 continue
             per_container_mem_used_bytes[cid] = Measurement(
-                Decimal(result[0]))
+                Decimal(result.mem_cur_bytes))
             per_container_io_read_bytes[cid] = Measurement(
-                Decimal(result[1]))
+                Decimal(result.io_read_bytes))
             per_container_io_write_bytes[cid] = Measurement(
-                Decimal(result[2]))
+                Decimal(result.io_write_bytes))
             per_container_io_scratch_size[cid] = Measurement(
-                Decimal(result[3]))
+                Decimal(scratch_size))
+            if result.net_stat is not None:
+                per_container_net_rx_bytes[cid] = Measurement(
+                    Decimal(result.net_stat[0]))
+                per_container_net_tx_bytes[cid] = Measurement(
+                    Decimal(result.net_stat[1]))
+            if result.mem_pressure is not None:
+                per_container_mem_pressure[cid] = result.mem_pressure
+            if result.io_pressure is not None:
+                per_container_io_pressure[cid] = result.io_pressure
         return [
             ContainerMeasurement(
                 MetricKey('mem'),
@@ -529,6 +767,22 @@ class MemoryPlugin(AbstractComputePlugin):
                 stats_filter=frozenset({'max'}),
                 per_container=per_container_io_scratch_size,
             ),
+            ContainerMeasurement(
+                MetricKey('net_rx'),
+                MetricTypes.RATE,
+                unit_hint='bps',
+                current_hook=current_rate,
+                per_container=per_container_net_rx_bytes,
+            ),
+            ContainerMeasurement(
+                MetricKey('net_tx'),
+                MetricTypes.RATE,
+                unit_hint='bps',
+                current_hook=current_rate,
+                per_container=per_container_net_tx_bytes,
+            ),
+            *build_container_pressure_measures('mem', per_container_mem_pressure),
+            *build_container_pressure_measures('io', per_container_io_pressure),
         ]
 
     async def create_alloc_map(self) -> AbstractAllocMap:
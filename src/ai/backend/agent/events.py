@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import (
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from ai.backend.common.logging import BraceStyleAdapter
+
+log = BraceStyleAdapter(logging.getLogger(__name__))
+
+__all__ = (
+    'EventBatchProducer',
+    'EventFlushFunction',
+)
+
+EventFlushFunction = Callable[[Sequence[bytes], bool], Awaitable[None]]
+
+
+class EventBatchProducer:
+    """
+    Collects the encoded events produced within *max_delay* seconds
+    (or up to *max_batch_size* events) and sends them at once using *flush_func*.
+
+    A single flusher task sends the batches one by one,
+    so the events are delivered in the order they are produced.
+    The events produced with different *spool* flags are not mixed in a batch,
+    and the flag of each batch is passed to *flush_func* as the second argument.
+    """
+
+    flush_func: EventFlushFunction
+    max_batch_size: int
+    max_delay: float
+
+    _buffer: List[Tuple[bytes, Optional[asyncio.Future], bool]]
+    _pending: asyncio.Event
+    _batch_full: asyncio.Event
+    _closing: bool
+    _flusher: Optional[asyncio.Task]
+
+    def __init__(
+        self,
+        flush_func: EventFlushFunction,
+        *,
+        max_batch_size: int = 64,
+        max_delay: float = 0.005,
+    ) -> None:
+        self.flush_func = flush_func
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._buffer = []
+        self._pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._closing = False
+        self._flusher = None
+
+    def start(self) -> None:
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """
+        Send all remaining events and stop the flusher task.
+        """
+        self._closing = True
+        self._pending.set()
+        self._batch_full.set()
+        if self._flusher is not None:
+            await self._flusher
+            self._flusher = None
+
+    async def produce(
+        self,
+        encoded_event: bytes,
+        *,
+        wait: bool = True,
+        spool: bool = True,
+    ) -> None:
+        """
+        Add the event to the next batch.
+        If *wait* is true, wait until the batch including the event is sent
+        and propagate the error if the sending has failed.
+        Otherwise, the errors are only logged.
+        """
+        if self._closing:
+            raise RuntimeError('The event producer is closed.')
+        fut: Optional[asyncio.Future] = None
+        if wait:
+            fut = asyncio.get_running_loop().create_future()
+        self._buffer.append((encoded_event, fut, spool))
+        self._pending.set()
+        if len(self._buffer) >= self.max_batch_size:
+            self._batch_full.set()
+        if fut is not None:
+            await fut
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._pending.wait()
+            if not self._batch_full.is_set():
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch_size = 0
+            while (
+                batch_size < min(len(self._buffer), self.max_batch_size)
+                and self._buffer[batch_size][2] == self._buffer[0][2]
+            ):
+                batch_size += 1
+            batch = self._buffer[:batch_size]
+            del self._buffer[:batch_size]
+            if len(self._buffer) < self.max_batch_size and not self._closing:
+                self._batch_full.clear()
+            if not self._buffer:
+                if self._closing and not batch:
+                    break
+                self._pending.clear()
+            if batch:
+                await self._flush(batch)
+            if self._closing and not self._buffer:
+                break
+
+    async def _flush(self, batch: Sequence[Tuple[bytes, Optional[asyncio.Future], bool]]) -> None:
+        try:
+            await self.flush_func([encoded_event for encoded_event, _, _ in batch], batch[0][2])
+        except Exception as e:
+            log.exception('failed to send a batch of {} events', len(batch))
+            for _, fut, _ in batch:
+                if fut is not None and not fut.done():
+                    fut.set_exception(e)
+        else:
+            for _, fut, _ in batch:
+                if fut is not None and not fut.done():
+                    fut.set_result(None)
@@ -1,5 +1,23 @@
 from subprocess import CalledProcessError
 import asyncio
+import errno
+import fcntl
+import os
+from pathlib import Path
+import shutil
+import stat
+import sys
+import time
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import attr
 
 
 async def create_scratch_filesystem(scratch_dir, size):
@@ -40,3 +58,231 @@ async def destroy_scratch_filesystem(scratch_dir):
     if exit_code < 0:
         raise CalledProcessError(proc.returncode, proc.args,
                                  output=proc.stdout, stderr=proc.stderr)
+
+
+# The ioctl request number of FICLONE in linux/fs.h
+_FICLONE = 0x40049409
+
+# The errors which mean that the filesystem (or the pair of filesystems) cannot make reflinks.
+_reflink_unsupported_errnos = frozenset([
+    errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS,
+])
+
+
+class ScratchSkeleton:
+    '''
+    A directory tree prepared once and instantiated into every new scratch directory.
+
+    The files are instantiated as reflinks (copy-on-write clones sharing the data blocks of
+    the skeleton) when the filesystem supports them, e.g., btrfs and XFS.
+    Otherwise, they are written from the contents kept in memory, which takes only
+    a few syscalls per file without reading the sources again.
+    Hardlinks are not used because the instantiated files live in user-writable
+    directories and an in-place edit would change the skeleton and all other instances.
+
+    *files* maps the relative paths in the skeleton to their source files.
+    :meth:`build` and :meth:`instantiate` perform blocking filesystem operations
+    and should be run in an executor.
+    '''
+
+    root: Path
+    files: Mapping[str, Path]
+
+    _dirs: List[str]
+    _contents: Dict[str, bytes]
+    _modes: Dict[str, int]
+    _reflink_supported: Optional[bool]
+
+    def __init__(self, root: Path, files: Mapping[str, Path]) -> None:
+        self.root = root
+        self.files = files
+        self._dirs = []
+        self._contents = {}
+        self._modes = {}
+        self._reflink_supported = None if sys.platform.startswith('linux') else False
+
+    def build(self) -> None:
+        '''
+        (Re)create the skeleton directory from the source files.
+        '''
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        dirs = set()
+        for relpath, src_path in self.files.items():
+            parent = os.path.dirname(relpath)
+            while parent:
+                dirs.add(parent)
+                parent = os.path.dirname(parent)
+            dst_path = self.root / relpath
+            dst_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(src_path.resolve(), dst_path)
+            self._contents[relpath] = dst_path.read_bytes()
+            self._modes[relpath] = stat.S_IMODE(dst_path.stat().st_mode)
+        self._dirs = sorted(dirs)
+
+    @property
+    def paths(self) -> List[str]:
+        '''
+        The relative paths of the directories and files instantiated by :meth:`instantiate`.
+        '''
+        return [*self._dirs, *self.files]
+
+    def instantiate(self, dest: Path) -> None:
+        '''
+        Populate the existing directory *dest* with the skeleton.
+        '''
+        for relpath in self._dirs:
+            try:
+                os.mkdir(dest / relpath)
+            except FileExistsError:
+                pass
+        for relpath in self.files:
+            self._clone_file(relpath, dest / relpath)
+
+    def _clone_file(self, relpath: str, dst_path: Path) -> None:
+        dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self._modes[relpath])
+        try:
+            # Apply the exact mode regardless of the umask, as shutil.copy() does.
+            os.fchmod(dst_fd, self._modes[relpath])
+            if self._reflink_supported is not False and self._reflink(relpath, dst_fd):
+                return
+            data = memoryview(self._contents[relpath])
+            while data:
+                data = data[os.write(dst_fd, data):]
+        finally:
+            os.close(dst_fd)
+
+    def _reflink(self, relpath: str, dst_fd: int) -> bool:
+        src_fd = os.open(self.root / relpath, os.O_RDONLY)
+        try:
+            fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        except OSError as e:
+            if e.errno not in _reflink_unsupported_errnos:
+                raise
+            # Assume that all scratch directories are on the same filesystem.
+            self._reflink_supported = False
+            return False
+        finally:
+            os.close(src_fd)
+        self._reflink_supported = True
+        return True
+
+
+_racy_mtime_threshold_ns = 2_000_000_000
+
+
+@attr.s(auto_attribs=True, slots=True)
+class _DirectoryUsage:
+    mtime_ns: int
+    file_size: int       # the total size of non-directory entries directly inside
+    subdirs: List[str]
+    scanned_at: float
+    racy: bool           # modified too recently to trust the mtime
+
+
+class ScratchSizeTracker:
+    '''
+    Incrementally tracks the total size of files inside a scratch directory tree.
+
+    It caches per-directory totals and re-lists a directory only when its mtime has changed
+    (i.e., entries are added, removed, or renamed) or its cached total is older than
+    *rescan_interval* seconds, which is required to catch in-place changes of existing files.
+    Directories modified within the filesystem timestamp granularity before a scan are always
+    re-listed in the next refresh, since their subsequent changes may not update the mtime.
+    The number of directories and entries stat-ed in a single :meth:`refresh` call is limited
+    by *stat_budget*, so a walk over a large tree continues across multiple refreshes.
+    Until a walk completes, the total size of the previous complete walk is reported
+    unless the partial total of the ongoing walk already exceeds it.
+
+    :meth:`refresh` performs blocking filesystem operations and should be run in an executor.
+    '''
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        stat_budget: int = 10_000,
+        rescan_interval: float = 60.0,
+    ) -> None:
+        self.root = root
+        self.stat_budget = stat_budget
+        self.rescan_interval = rescan_interval
+        self._dirs: Dict[str, _DirectoryUsage] = {}
+        self._last_total_size = 0
+        # the state of the ongoing walk
+        self._pending: List[str] = []
+        self._visited: Set[str] = set()
+        self._walk_total_size = 0
+
+    def refresh(self) -> int:
+        '''
+        Continue the walk within the budget and return the total size.
+        '''
+        now = time.monotonic()
+        budget = self.stat_budget
+        if not self._pending:
+            # Start a new walk.
+            self._pending.append(os.fspath(self.root))
+            self._visited = set()
+            self._walk_total_size = 0
+        pending = self._pending
+        while pending and budget > 0:
+            path = pending.pop()
+            budget -= 1
+            try:
+                mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                continue
+            usage: Optional[_DirectoryUsage] = self._dirs.get(path)
+            up_to_date = (
+                usage is not None and
+                not usage.racy and
+                usage.mtime_ns == mtime_ns and
+                now - usage.scanned_at < self.rescan_interval
+            )
+            if not up_to_date:
+                if budget <= 0:
+                    # Scan it in the next refresh.
+                    pending.append(path)
+                    break
+                scanned = self._scan(path, mtime_ns, now)
+                if scanned is not None:
+                    usage, num_entries = scanned
+                    self._dirs[path] = usage
+                    budget -= num_entries
+            self._visited.add(path)
+            if usage is None:
+                continue
+            self._walk_total_size += usage.file_size
+            pending.extend(os.path.join(path, name) for name in usage.subdirs)
+        if not pending:
+            # The walk is complete.
+            for path in self._dirs.keys() - self._visited:
+                del self._dirs[path]
+            self._visited = set()
+            self._last_total_size = self._walk_total_size
+            return self._last_total_size
+        return max(self._last_total_size, self._walk_total_size)
+
+    @staticmethod
+    def _scan(path: str, mtime_ns: int, now: float) -> Optional[Tuple[_DirectoryUsage, int]]:
+        file_size = 0
+        num_entries = 0
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    num_entries += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        else:
+                            # symlinks are counted by their own sizes.
+                            file_size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        # removed while scanning
+                        continue
+        except OSError:
+            return None
+        racy = time.time_ns() - mtime_ns < _racy_mtime_threshold_ns
+        return _DirectoryUsage(mtime_ns, file_size, subdirs, now, racy), num_entries
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Set,
+)
+
+import attr
+
+from ai.backend.common.docker import ImageRef
+from ai.backend.common.logging import BraceStyleAdapter
+
+log = BraceStyleAdapter(logging.getLogger(__name__))
+
+__all__ = (
+    'ImagePullProgress',
+    'ImagePullCoordinator',
+    'PullProgressCallback',
+)
+
+
+@attr.s(auto_attribs=True, slots=True)
+class ImagePullProgress:
+    """
+    The download progress of an image pull aggregated over its layers.
+    """
+    image: str
+    layer_current: Dict[str, int] = attr.Factory(dict)
+    layer_total: Dict[str, int] = attr.Factory(dict)
+    completed_layers: Set[str] = attr.Factory(set)
+
+    def update_layer(self, layer_id: str, current: int, total: int) -> None:
+        self.layer_current[layer_id] = current
+        if total > 0:
+            self.layer_total[layer_id] = total
+
+    def complete_layer(self, layer_id: str) -> None:
+        self.completed_layers.add(layer_id)
+        if layer_id in self.layer_total:
+            self.layer_current[layer_id] = self.layer_total[layer_id]
+
+    def to_serializable_dict(self) -> Dict[str, int]:
+        layers = self.layer_current.keys() | self.layer_total.keys() | self.completed_layers
+        return {
+            'current': sum(self.layer_current.values()),
+            'total': sum(self.layer_total.values()),
+            'layers': len(layers),
+            'completed_layers': len(self.completed_layers),
+        }
+
+
+PullProgressCallback = Callable[[ImagePullProgress], Awaitable[None]]
+PullFunction = Callable[[PullProgressCallback], Awaitable[None]]
+
+
+class _InflightPull:
+
+    __slots__ = ('task', 'subscribers', 'progress_interval', '_last_reported_at')
+
+    task: asyncio.Task
+    subscribers: Set[PullProgressCallback]
+    progress_interval: float
+
+    _last_reported_at: float
+
+    def __init__(self, progress_interval: float) -> None:
+        self.subscribers = set()
+        self.progress_interval = progress_interval
+        self._last_reported_at = 0.0
+
+    async def report(self, progress: ImagePullProgress) -> None:
+        now = time.monotonic()
+        if now - self._last_reported_at < self.progress_interval:
+            return
+        self._last_reported_at = now
+        results = await asyncio.gather(
+            *[callback(progress) for callback in [*self.subscribers]],
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                log.warning('error while reporting the pull progress of {}',
+                            progress.image, exc_info=result)
+
+
+class ImagePullCoordinator:
+    """
+    Coalesces concurrent pulls of the same image into a single pull
+    and limits the number of images pulled simultaneously.
+
+    All requesters of an image await the same in-flight pull and receive its progress
+    at most once per *progress_interval* seconds.
+    The in-flight pull continues even when its requesters are cancelled,
+    as the image is likely to be requested again.
+    """
+
+    max_concurrency: int
+    progress_interval: float
+
+    _pulls: Dict[str, _InflightPull]
+    _semaphore: asyncio.Semaphore
+
+    def __init__(self, *, max_concurrency: int, progress_interval: float = 1.0) -> None:
+        self.max_concurrency = max_concurrency
+        self.progress_interval = progress_interval
+        self._pulls = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def pull(
+        self,
+        image_ref: ImageRef,
+        pull_func: PullFunction,
+        *,
+        progress_cb: Optional[PullProgressCallback] = None,
+    ) -> None:
+        """
+        Pull the image using *pull_func* unless there is an in-flight pull of the same image,
+        and wait until the pull finishes.
+        *pull_func* is called with the progress reporting callback.
+        """
+        key = image_ref.canonical
+        inflight = self._pulls.get(key)
+        if inflight is None:
+            inflight = _InflightPull(self.progress_interval)
+            inflight.task = asyncio.create_task(self._pull(key, inflight, pull_func))
+            inflight.task.add_done_callback(_consume_error)
+            self._pulls[key] = inflight
+        else:
+            log.info('joining the in-flight pull of {}', key)
+        if progress_cb is not None:
+            inflight.subscribers.add(progress_cb)
+        try:
+            await asyncio.shield(inflight.task)
+        finally:
+            if progress_cb is not None:
+                inflight.subscribers.discard(progress_cb)
+
+    async def _pull(self, key: str, inflight: _InflightPull, pull_func: PullFunction) -> None:
+        try:
+            async with self._semaphore:
+                await pull_func(inflight.report)
+        finally:
+            del self._pulls[key]
+
+
+def _consume_error(task: asyncio.Task) -> None:
+    # The requesters receive the error; this only prevents warnings when all of them are gone.
+    if not task.cancelled():
+        task.exception()
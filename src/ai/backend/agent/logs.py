@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import aioredis
+import attr
+import snappy
+
+from ai.backend.common import msgpack
+from ai.backend.common.logging import BraceStyleAdapter
+from .spool import RedisCommand
+
+log = BraceStyleAdapter(logging.getLogger(__name__))
+
+__all__ = (
+    'ContainerLogReader',
+    'LogChunkIndexEntry',
+    'LogChunkWriter',
+    'LogChunker',
+    'LogFollower',
+)
+
+LogStreamFactory = Callable[[], AsyncIterator[bytes]]
+LogStoreFunction = Callable[[Sequence[bytes]], Awaitable[None]]
+LogResetFunction = Callable[[], Awaitable[None]]
+
+
+class LogChunker:
+    """
+    Splits a stream of log fragments into chunks of *chunk_size* bytes.
+
+    The fragments are accumulated in a single preallocated buffer, and the parts of
+    a fragment spanning whole chunks are sliced out of it without being buffered,
+    so that each log byte is copied at most once regardless of the log size.
+    """
+
+    chunk_size: int
+
+    _buffer: bytearray
+    _view: memoryview
+    _length: int
+
+    def __init__(self, chunk_size: int) -> None:
+        self.chunk_size = chunk_size
+        self._buffer = bytearray(chunk_size)
+        self._view = memoryview(self._buffer)
+        self._length = 0
+
+    def feed(self, fragment: bytes) -> List[bytes]:
+        """
+        Add the fragment and return the chunks completed by it.
+        """
+        chunks: List[bytes] = []
+        chunk_size = self.chunk_size
+        fragment_view = memoryview(fragment)
+        fragment_length = len(fragment_view)
+        offset = 0
+        if self._length > 0:
+            num_bytes = min(chunk_size - self._length, fragment_length)
+            self._view[self._length:self._length + num_bytes] = fragment_view[:num_bytes]
+            self._length += num_bytes
+            offset = num_bytes
+            if self._length < chunk_size:
+                return chunks
+            chunks.append(bytes(self._view))
+            self._length = 0
+        if offset == 0 and fragment_length == chunk_size and isinstance(fragment, bytes):
+            chunks.append(fragment)
+            return chunks
+        while fragment_length - offset >= chunk_size:
+            chunks.append(bytes(fragment_view[offset:offset + chunk_size]))
+            offset += chunk_size
+        remaining = fragment_length - offset
+        if remaining > 0:
+            self._view[:remaining] = fragment_view[offset:]
+            self._length = remaining
+        return chunks
+
+    def flush(self) -> Optional[bytes]:
+        """
+        Return the buffered bytes which do not fill a whole chunk, if any.
+        """
+        if self._length == 0:
+            return None
+        tail = bytes(self._view[:self._length])
+        self._length = 0
+        return tail
+
+
+class LogFollower:
+    """
+    Ships the chunks of a log stream while it is being produced, e.g., the console
+    outputs of a running container, with the byte rate limited to *rate_limit*
+    bytes per second (unlimited if zero).
+
+    Only full chunks are shipped; the remaining partial chunk is taken via
+    :meth:`flush()` after the stream has ended.
+    When the stream is interrupted, the follower discards the shipped chunks using
+    *reset_func* and ships the re-opened stream from the beginning, because
+    the log files may have been rotated in the meantime and the byte offsets
+    of the re-opened stream do not match with the previous ones.
+    """
+
+    open_stream: LogStreamFactory
+    store_func: LogStoreFunction
+    reset_func: LogResetFunction
+    rate_limit: int
+    max_retries: int
+    retry_delay: float
+
+    offset: int
+    completed: bool
+
+    _chunker: LogChunker
+    _allowance: float
+    _last_checked_at: float
+    _task: Optional[asyncio.Task]
+
+    def __init__(
+        self,
+        open_stream: LogStreamFactory,
+        store_func: LogStoreFunction,
+        reset_func: LogResetFunction,
+        *,
+        chunk_size: int,
+        rate_limit: int = 0,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.open_stream = open_stream
+        self.store_func = store_func
+        self.reset_func = reset_func
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.offset = 0  # the number of shipped bytes
+        self.completed = False
+        self._chunker = LogChunker(chunk_size)
+        self._allowance = float(rate_limit)
+        self._last_checked_at = time.monotonic()
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._follow())
+
+    async def stop(self, grace_period: float) -> bool:
+        """
+        Wait until the stream ends for at most *grace_period* seconds and then stop following.
+        Returns whether the whole stream has been consumed.
+        """
+        if self._task is None:
+            return self.completed
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), grace_period)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        return self.completed
+
+    def flush(self) -> Optional[bytes]:
+        """
+        Return the consumed bytes which have not been shipped, if any.
+        """
+        return self._chunker.flush()
+
+    async def _follow(self) -> None:
+        num_retries = 0
+        while True:
+            try:
+                await self._ship(self.open_stream())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if num_retries >= self.max_retries:
+                    log.warning('stopped following the log stream at offset {}', self.offset,
+                                exc_info=e)
+                    return
+                num_retries += 1
+                log.info('restarting the interrupted log stream at offset {} ({!r})',
+                         self.offset, e)
+                await asyncio.sleep(self.retry_delay)
+                try:
+                    await self.reset_func()
+                except Exception as reset_error:
+                    log.warning('stopped following the log stream as it could not be reset',
+                                exc_info=reset_error)
+                    return
+                self._chunker = LogChunker(self._chunker.chunk_size)
+                self.offset = 0
+            else:
+                self.completed = True
+                return
+
+    async def _ship(self, stream: AsyncIterator[bytes]) -> None:
+        async for fragment in stream:
+            chunks = self._chunker.feed(fragment)
+            if chunks:
+                await self.store_func(chunks)
+                shipped_size = sum(len(chunk) for chunk in chunks)
+                self.offset += shipped_size
+                await self._throttle(shipped_size)
+
+    async def _throttle(self, size: int) -> None:
+        if self.rate_limit <= 0:
+            return
+        now = time.monotonic()
+        # Allow bursts of up to one second worth of bytes.
+        self._allowance = min(
+            float(self.rate_limit),
+            self._allowance + (now - self._last_checked_at) * self.rate_limit,
+        )
+        self._last_checked_at = now
+        self._allowance -= size
+        if self._allowance < 0:
+            await asyncio.sleep(-self._allowance / self.rate_limit)
+
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class LogChunkIndexEntry:
+    """
+    The position of a stored log chunk in the whole log and the time when it is stored.
+    """
+    offset: int
+    size: int
+    timestamp: float
+    compressed: bool
+
+    def pack(self) -> bytes:
+        return msgpack.packb((self.offset, self.size, self.timestamp, self.compressed))
+
+    @classmethod
+    def unpack(cls, packed: bytes) -> LogChunkIndexEntry:
+        return cls(*msgpack.unpackb(packed))
+
+
+def get_log_keys(container_id: str) -> Sequence[str]:
+    return f'containerlog.{container_id}', f'containerlog.{container_id}.index'
+
+
+class LogChunkWriter:
+    """
+    Builds the Redis commands to store the chunks of a container log
+    (optionally compressed with snappy) along with an index entry per chunk,
+    which are kept in two lists at the same positions.
+    """
+
+    log_key: str
+    index_key: str
+    compress: bool
+    max_chunks: Optional[int]
+    offset: int
+
+    def __init__(
+        self,
+        container_id: str,
+        *,
+        compress: bool,
+        max_chunks: Optional[int] = None,
+        offset: int = 0,
+    ) -> None:
+        self.log_key, self.index_key = get_log_keys(container_id)
+        self.compress = compress
+        self.max_chunks = max_chunks
+        self.offset = offset
+
+    def reset(self) -> List[RedisCommand]:
+        self.offset = 0
+        return [('delete', (self.log_key, self.index_key))]
+
+    def store(self, chunks: Sequence[bytes]) -> List[RedisCommand]:
+        now = time.time()
+        stored_chunks = []
+        index_entries = []
+        for chunk in chunks:
+            index_entries.append(LogChunkIndexEntry(
+                self.offset, len(chunk), now, self.compress,
+            ).pack())
+            stored_chunks.append(snappy.compress(chunk) if self.compress else chunk)
+            self.offset += len(chunk)
+        commands: List[RedisCommand] = [
+            ('rpush', (self.log_key, *stored_chunks)),
+            ('rpush', (self.index_key, *index_entries)),
+        ]
+        if self.max_chunks is not None:
+            commands.append(('ltrim', (self.log_key, -self.max_chunks, -1)))
+            commands.append(('ltrim', (self.index_key, -self.max_chunks, -1)))
+        return commands
+
+    def expire(self, seconds: float) -> List[RedisCommand]:
+        return [
+            ('expire', (self.log_key, seconds)),
+            ('expire', (self.index_key, seconds)),
+        ]
+
+
+class ContainerLogReader:
+    """
+    Reads parts of a container log stored by :class:`LogChunkWriter`,
+    fetching and decompressing only the chunks covering the requested part.
+    """
+
+    redis_conn: aioredis.Redis
+    log_key: str
+    index_key: str
+
+    def __init__(self, redis_conn: aioredis.Redis, container_id: str) -> None:
+        self.redis_conn = redis_conn
+        self.log_key, self.index_key = get_log_keys(container_id)
+
+    async def read_range(self, start: int, end: Optional[int] = None) -> bytes:
+        """
+        Read the bytes from *start* to *end* (exclusive) of the whole log.
+        The trimmed parts of the log are omitted.
+        """
+        index = await self._load_index()
+        positions = [
+            pos for pos, entry in enumerate(index)
+            if entry.offset + entry.size > start and (end is None or entry.offset < end)
+        ]
+        if not positions:
+            return b''
+        fetched = [
+            (entry, data) for entry, data in (await self._fetch(positions[0], positions[-1]))
+            if entry.offset + entry.size > start and (end is None or entry.offset < end)
+        ]
+        if not fetched:
+            return b''
+        base = fetched[0][0].offset
+        data = b''.join(data for _, data in fetched)
+        return data[max(start - base, 0):(None if end is None else end - base)]
+
+    async def read_period(self, since: float, until: Optional[float] = None) -> bytes:
+        """
+        Read the chunks stored during the given period (in UNIX timestamps).
+        """
+        def _select(entries: Iterable[LogChunkIndexEntry]) -> List[int]:
+            positions = []
+            prev_timestamp = float('-inf')
+            for pos, entry in enumerate(entries):
+                if entry.timestamp >= since and (until is None or prev_timestamp <= until):
+                    positions.append(pos)
+                prev_timestamp = entry.timestamp
+            return positions
+
+        positions = _select(await self._load_index())
+        if not positions:
+            return b''
+        fetched = await self._fetch(positions[0], positions[-1])
+        return b''.join(
+            fetched[pos][1] for pos in _select(entry for entry, _ in fetched)
+        )
+
+    async def read_tail_lines(self, num_lines: int, *, batch_size: int = 4) -> bytes:
+        """
+        Read the last *num_lines* lines, fetching the chunks backwards from the end.
+        """
+        index = await self._load_index()
+        data = b''
+        data_offset: Optional[int] = None
+        last = len(index) - 1
+        while last >= 0:
+            first = max(last - batch_size + 1, 0)
+            # Skip the chunks already read if the positions are shifted by trimming.
+            fetched = [
+                (entry, chunk) for entry, chunk in (await self._fetch(first, last))
+                if data_offset is None or entry.offset < data_offset
+            ]
+            if fetched:
+                data = b''.join(chunk for _, chunk in fetched) + data
+                data_offset = fetched[0][0].offset
+            last = first - 1
+            # Stop when there is a complete line before the last lines.
+            if data.count(b'\n', 0, len(data) - 1) >= num_lines:
+                break
+        return b''.join(data.splitlines(keepends=True)[-num_lines:]) if num_lines > 0 else b''
+
+    async def _load_index(self) -> List[LogChunkIndexEntry]:
+        return [
+            LogChunkIndexEntry.unpack(packed)
+            for packed in (await self.redis_conn.lrange(self.index_key, 0, -1))
+        ]
+
+    async def _fetch(self, first: int, last: int) -> List[Tuple[LogChunkIndexEntry, bytes]]:
+        """
+        Fetch the chunks at the positions from *first* to *last* with their index entries.
+        """
+        # The writer may trim the log after the index is loaded, shifting the positions.
+        # Read the index entries again along with the chunks in a transaction
+        # so that the callers can check which chunks are actually fetched.
+        tr = self.redis_conn.multi_exec()
+        tr.lrange(self.index_key, first, last)
+        tr.lrange(self.log_key, first, last)
+        packed_entries, chunks = await tr.execute()
+        fetched = []
+        for packed, chunk in zip(packed_entries, chunks):
+            entry = LogChunkIndexEntry.unpack(packed)
+            fetched.append((entry, snappy.decompress(chunk) if entry.compressed else chunk))
+        return fetched
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import enum
+import logging
+import os
+from pathlib import Path
+import pickle
+import struct
+import threading
+from typing import (
+    Any,
+    Dict,
+    Mapping,
+    Optional,
+)
+
+from ai.backend.common.logging import BraceStyleAdapter
+from ai.backend.common.types import KernelId
+from ai.backend.common.utils import current_loop
+
+log = BraceStyleAdapter(logging.getLogger(__name__))
+
+__all__ = (
+    'JournalOps',
+    'KernelRegistryJournal',
+)
+
+_record_header = struct.Struct('!I')
+
+
+class JournalOps(str, enum.Enum):
+    REGISTER = 'register'
+    FORGET = 'forget'
+
+
+class KernelRegistryJournal:
+    """
+    An append-only journal of the kernel registry.
+
+    Each record is a length-prefixed pickle of ``(op, kernel_id, payload)``
+    where the payload is the separately pickled kernel object, so that replaying
+    the journal unpickles only the latest state of the live kernels.
+    The kernel objects carry their host ports and resource allocations,
+    so replaying the journal restores them without inspecting the containers.
+    The journal is compacted into a snapshot of the live kernels when
+    the number of records grows beyond the threshold.
+    A truncated record at the tail, caused by a crash in the middle of writes,
+    is discarded upon loading.
+    """
+
+    path: Path
+    compaction_threshold: int
+
+    _fd: Optional[int]
+    _records: Dict[KernelId, bytes]
+    _num_records: int
+    _lock: threading.Lock
+
+    def __init__(self, path: Path, *, compaction_threshold: int = 256) -> None:
+        self.path = path
+        self.compaction_threshold = compaction_threshold
+        self._fd = None
+        self._records = {}
+        self._num_records = 0
+        self._lock = threading.Lock()
+
+    async def load(self) -> Dict[KernelId, Any]:
+        """
+        Replay the journal and return the registered kernel objects.
+        The journal is rewritten as a compacted snapshot afterwards.
+        """
+        records = await current_loop().run_in_executor(None, self._load_records)
+        # Unpickle in the event loop thread as kernel objects create asyncio primitives.
+        return {
+            kernel_id: pickle.loads(pickle.loads(record)[2])
+            for kernel_id, record in records.items()
+        }
+
+    async def record_kernel(self, kernel_id: KernelId, kernel_obj: Any) -> None:
+        # Pickle in the event loop thread as the kernel object may be modified there.
+        record = _make_record(JournalOps.REGISTER, kernel_id, kernel_obj)
+        await current_loop().run_in_executor(
+            None, self._append, JournalOps.REGISTER, kernel_id, record)
+
+    async def forget_kernel(self, kernel_id: KernelId) -> None:
+        record = _make_record(JournalOps.FORGET, kernel_id, None)
+        await current_loop().run_in_executor(
+            None, self._append, JournalOps.FORGET, kernel_id, record)
+
+    def snapshot(self, registry: Mapping[KernelId, Any]) -> None:
+        """
+        Rewrite the journal with the current states of the given kernel objects.
+        """
+        records = {
+            kernel_id: _make_record(JournalOps.REGISTER, kernel_id, kernel_obj)
+            for kernel_id, kernel_obj in registry.items()
+        }
+        with self._lock:
+            self._records = records
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _load_records(self) -> Dict[KernelId, bytes]:
+        with self._lock:
+            self._replay()
+            self._compact()
+            return dict(self._records)
+
+    def _append(self, op: JournalOps, kernel_id: KernelId, record: bytes) -> None:
+        with self._lock:
+            if self._fd is None:
+                self._replay()
+                self._compact()
+            assert self._fd is not None
+            os.write(self._fd, _record_header.pack(len(record)) + record)
+            os.fsync(self._fd)
+            if op == JournalOps.FORGET:
+                self._records.pop(kernel_id, None)
+            else:
+                self._records[kernel_id] = record
+            self._num_records += 1
+            if self._num_records > max(self.compaction_threshold, 2 * len(self._records)):
+                self._compact()
+
+    def _replay(self) -> None:
+        self._records = {}
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return
+        offset = 0
+        while offset < len(data):
+            if offset + _record_header.size > len(data):
+                break
+            length, = _record_header.unpack_from(data, offset)
+            record = data[offset + _record_header.size:offset + _record_header.size + length]
+            if len(record) < length:
+                break
+            try:
+                op, kernel_id, _ = pickle.loads(record)
+            except Exception:
+                log.exception('skipping a corrupted record in the kernel registry journal')
+                break
+            if op == JournalOps.FORGET:
+                self._records.pop(kernel_id, None)
+            else:
+                self._records[kernel_id] = record
+            offset += _record_header.size + length
+        if offset < len(data):
+            log.warning('discarding {} trailing bytes of the kernel registry journal',
+                        len(data) - offset)
+
+    def _compact(self) -> None:
+        # Write the live records to a temporary file and atomically replace the journal.
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            for record in self._records.values():
+                f.write(_record_header.pack(len(record)))
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._num_records = len(self._records)
+
+
+def _make_record(op: JournalOps, kernel_id: KernelId, kernel_obj: Any) -> bytes:
+    payload = pickle.dumps(kernel_obj) if kernel_obj is not None else b''
+    return pickle.dumps((op.value, kernel_id, payload))
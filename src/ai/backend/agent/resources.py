@@ -497,6 +497,27 @@ class AbstractAllocMap(metaclass=ABCMeta):
         pass
 
 
+def diff_allocations(
+    tracked: Mapping[SlotName, Mapping[DeviceId, Decimal]],
+    actual: Mapping[SlotName, Mapping[DeviceId, Decimal]],
+) -> List[Tuple[SlotName, DeviceId, Decimal, Decimal]]:
+    """
+    Compare two per-slot, per-device allocation tables and return the mismatching
+    entries as (slot name, device ID, tracked amount, actual amount) tuples.
+    Missing entries are regarded as zero.
+    """
+    mismatches = []
+    for slot_name in sorted({*tracked.keys(), *actual.keys()}):
+        tracked_alloc = tracked.get(slot_name, {})
+        actual_alloc = actual.get(slot_name, {})
+        for device_id in sorted({*tracked_alloc.keys(), *actual_alloc.keys()}):
+            tracked_amount = tracked_alloc.get(device_id, Decimal(0))
+            actual_amount = actual_alloc.get(device_id, Decimal(0))
+            if tracked_amount != actual_amount:
+                mismatches.append((slot_name, device_id, tracked_amount, actual_amount))
+    return mismatches
+
+
 def bitmask2set(mask: int) -> FrozenSet[int]:
     bpos = 0
     bset = []
@@ -43,6 +43,7 @@ from ai.backend.common.plugin.monitor import ErrorPluginContext, StatsPluginCont
 from ai.backend.common.types import (
     HardwareMetadata, aobject,
     ClusterInfo,
+    ContainerId,
     HostPortPair,
     KernelId,
     KernelCreationConfig,
@@ -302,6 +303,24 @@ class AgentRPCServer(aobject):
         log.debug('rpc::gather_hwinfo()')
         return await self.agent.gather_hwinfo()
 
+    @rpc_function
+    @collect_error
+    async def gather_phase_latencies(self) -> Mapping[str, Mapping[str, Any]]:
+        log.debug('rpc::gather_phase_latencies()')
+        return self.agent.phase_latencies.to_serializable_dict()
+
+    @rpc_function
+    @collect_error
+    async def gather_spool_stats(self) -> Mapping[str, Any]:
+        log.debug('rpc::gather_spool_stats()')
+        return self.agent.redis_spool.to_serializable_dict()
+
+    @rpc_function
+    @collect_error
+    async def request_full_heartbeat(self) -> None:
+        log.debug('rpc::request_full_heartbeat()')
+        await self.agent.request_full_heartbeat()
+
     @rpc_function
     @collect_error
     async def ping_kernel(self, kernel_id: str):
@@ -394,6 +413,19 @@ class AgentRPCServer(aobject):
         log.info('rpc::get_logs(k:{0})', kernel_id)
         return await self.agent.get_logs(KernelId(UUID(kernel_id)))
 
+    @rpc_function
+    @collect_error
+    async def read_container_logs(self, container_id: str, opts: Mapping[str, Any]) -> bytes:
+        log.debug('rpc::read_container_logs(c:{0}, {1!r})', container_id, opts)
+        return await self.agent.read_container_logs(
+            ContainerId(container_id),
+            start=opts.get('start'),
+            end=opts.get('end'),
+            since=opts.get('since'),
+            until=opts.get('until'),
+            tail_lines=opts.get('tail_lines'),
+        )
+
     @rpc_function
     @collect_error
     async def restart_kernel(
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+import logging
+import os
+from pathlib import Path
+import struct
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import aioredis
+
+from ai.backend.common import msgpack
+from ai.backend.common.logging import BraceStyleAdapter
+from ai.backend.common.utils import current_loop
+
+log = BraceStyleAdapter(logging.getLogger(__name__))
+
+__all__ = (
+    'RedisCommand',
+    'RedisSpool',
+    'redis_unavailable_errors',
+)
+
+# The errors which mean that Redis is unavailable or too slow at the moment.
+redis_unavailable_errors = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    aioredis.errors.ConnectionClosedError,
+)
+
+# A Redis write command as its name and arguments, e.g., ('rpush', ('key', b'value')).
+RedisCommand = Tuple[str, Sequence[Any]]
+RedisCommandExecutor = Callable[[Sequence[RedisCommand]], Awaitable[None]]
+
+_record_header = struct.Struct('>I')
+
+
+def _write_segment(path: Path, data: bytes, *, new_segment: bool) -> None:
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if new_segment:
+        # Make the directory entry of the new segment durable as well.
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _read_segment(path: Path) -> List[RedisCommand]:
+    commands = []
+    data = path.read_bytes()
+    offset = 0
+    while offset + _record_header.size <= len(data):
+        length, = _record_header.unpack_from(data, offset)
+        offset += _record_header.size
+        if offset + length > len(data):
+            # The last record has been partially written due to a crash.
+            log.warning('ignoring a truncated record at the end of {}', path)
+            break
+        command, args = msgpack.unpackb(data[offset:offset + length])
+        commands.append((command, args))
+        offset += length
+    return commands
+
+
+class RedisSpool:
+    """
+    A bounded on-disk spool of Redis write commands which could not be executed
+    in time, stored as a series of append-only segment files.
+    Each append is synced to the disk before it returns.
+
+    The spooled commands are replayed in the order they are appended,
+    including those left by the previous run of the agent.
+    A command may be executed more than once if the agent stops during a replay
+    or if a timed-out command has actually reached the Redis server.
+    """
+
+    path: Path
+    segment_size: int
+    max_size: int
+
+    _segments: List[Path]
+    _segment_sizes: Dict[Path, int]
+    _next_seq: int
+    _active: Optional[Path]
+    _replay_offset: int
+    _lock: asyncio.Lock
+    _replay_lock: asyncio.Lock
+
+    # metrics
+    _spooled_commands: int
+    _replayed_commands: int
+    _dropped_commands: int
+    _spooling_since: Optional[float]
+
+    def __init__(self, path: Path, *, segment_size: int, max_size: int) -> None:
+        self.path = path
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self._segments = []
+        self._segment_sizes = {}
+        self._next_seq = 0
+        self._active = None
+        self._replay_offset = 0
+        self._lock = asyncio.Lock()
+        self._replay_lock = asyncio.Lock()
+        self._spooled_commands = 0
+        self._replayed_commands = 0
+        self._dropped_commands = 0
+        self._spooling_since = None
+
+    def open(self) -> None:
+        """
+        Load the segments left by the previous run.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        for segment in sorted(self.path.glob('*.seg')):
+            self._segments.append(segment)
+            self._segment_sizes[segment] = segment.stat().st_size
+            self._next_seq = int(segment.stem) + 1
+        if self._segments:
+            log.info('found {} spooled segment(s) to replay in {}', len(self._segments), self.path)
+            self._spooling_since = time.monotonic()
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._segments
+
+    @property
+    def size(self) -> int:
+        return sum(self._segment_sizes.values())
+
+    async def append(self, commands: Sequence[RedisCommand]) -> bool:
+        """
+        Append the commands to the spool.
+        Returns False if they are dropped because the spool is full.
+        """
+        data = b''.join(
+            _record_header.pack(len(packed)) + packed
+            for packed in (msgpack.packb([command, args]) for command, args in commands)
+        )
+        async with self._lock:
+            if self.size + len(data) > self.max_size:
+                self._dropped_commands += len(commands)
+                log.error('the spool is full; dropped {} Redis command(s)', len(commands))
+                return False
+            active = self._active
+            new_segment = active is None or self._segment_sizes[active] >= self.segment_size
+            if active is None or new_segment:
+                active = self.path / f'{self._next_seq:012d}.seg'
+                self._active = active
+                self._next_seq += 1
+                self._segments.append(active)
+                self._segment_sizes[active] = 0
+            if self._spooling_since is None:
+                log.warning('started spooling Redis commands to {}', self.path)
+                self._spooling_since = time.monotonic()
+            await current_loop().run_in_executor(
+                None, partial(_write_segment, active, data, new_segment=new_segment))
+            self._segment_sizes[active] += len(data)
+            self._spooled_commands += len(commands)
+        return True
+
+    async def replay(self, execute: RedisCommandExecutor, *, batch_size: int = 256) -> None:
+        """
+        Execute the spooled commands in order using *execute* until the spool becomes empty.
+        If *execute* fails, the remaining commands are kept for the next replay.
+        It returns immediately if another replay is in progress.
+        """
+        if self._replay_lock.locked():
+            return
+        async with self._replay_lock:
+            await self._replay(execute, batch_size)
+
+    async def _replay(self, execute: RedisCommandExecutor, batch_size: int) -> None:
+        loop = current_loop()
+        while self._segments:
+            async with self._lock:
+                segment = self._segments[0]
+                if segment == self._active:
+                    # Let the subsequent commands go to a new segment.
+                    self._active = None
+            commands = await loop.run_in_executor(None, _read_segment, segment)
+            while self._replay_offset < len(commands):
+                batch = commands[self._replay_offset:self._replay_offset + batch_size]
+                await execute(batch)
+                self._replay_offset += len(batch)
+                self._replayed_commands += len(batch)
+            async with self._lock:
+                await loop.run_in_executor(None, segment.unlink)
+                self._segments.pop(0)
+                del self._segment_sizes[segment]
+                self._replay_offset = 0
+                if not self._segments and self._spooling_since is not None:
+                    log.info('replayed all spooled Redis commands (spooled for {:.1f} sec)',
+                             time.monotonic() - self._spooling_since)
+                    self._spooling_since = None
+
+    def to_serializable_dict(self) -> Dict[str, Any]:
+        return {
+            'segments': len(self._segments),
+            'size': self.size,
+            'max_size': self.max_size,
+            'spooled_commands': self._spooled_commands,
+            'replayed_commands': self._replayed_commands,
+            'dropped_commands': self._dropped_commands,
+            'spooling_duration': (
+                time.monotonic() - self._spooling_since
+                if self._spooling_since is not None else 0.0
+            ),
+        }
@@ -4,13 +4,17 @@ A module to collect various performance metrics of Docker containers.
 Reference: https://www.datadoghq.com/blog/how-to-collect-docker-metrics/
 """
 
+from array import array
 import asyncio
 from decimal import Decimal
 import enum
 import logging
+import math
+import os
 import sys
 import time
 from typing import (
+    Awaitable,
     Callable,
     Dict,
     FrozenSet,
@@ -20,10 +24,13 @@ from typing import (
     Optional,
     Sequence,
     Tuple,
+    TypeVar,
     TYPE_CHECKING,
+    cast,
 )
 
 import attr
+from typing_extensions import Final
 
 from ai.backend.common import redis
 from ai.backend.common.identity import is_containerized
@@ -33,9 +40,8 @@ from ai.backend.common.types import (
     ContainerId, DeviceId, KernelId,
     MetricKey, MetricValue, MovingStatValue,
 )
-from .utils import (
-    remove_exponent,
-)
+from .spool import redis_unavailable_errors
+from .utils import CgroupFileCache
 if TYPE_CHECKING:
     from .agent import AbstractAgent
 
@@ -43,13 +49,21 @@ __all__ = (
     'StatContext',
     'StatModes',
     'MetricTypes',
+    'BatchMeasurement',
     'NodeMeasurement',
     'ContainerMeasurement',
     'Measurement',
+    'Metric',
+    'MetricStore',
+    'MovingStatistics',
+    'current_diff',
+    'current_rate',
 )
 
 log = BraceStyleAdapter(logging.getLogger('ai.backend.agent.stats'))
 
+T = TypeVar('T')
+
 
 def check_cgroup_available():
     """
@@ -66,8 +80,10 @@ class StatModes(enum.Enum):
     def get_preferred_mode():
         """
         Returns the most preferred statistics collector type for the host OS.
+        The cgroup mode works with both the legacy (v1) and unified (v2) hierarchies
+        but requires the root privilege.
         """
-        if check_cgroup_available():
+        if check_cgroup_available() and os.geteuid() == 0:
             return StatModes.CGROUP
         return StatModes.DOCKER
 
@@ -85,6 +101,18 @@ class Measurement:
     capacity: Optional[Decimal] = None
 
 
+@attr.s(auto_attribs=True, slots=True)
+class BatchMeasurement:
+    """
+    Per-device values of a metric given as parallel sequences of floats
+    (e.g., ``array('d')``), so that plugins reporting many devices such as CPU cores
+    do not need to allocate a :class:`Measurement` per device.
+    """
+    device_ids: Sequence[DeviceId]
+    values: Sequence[float]
+    capacity: Optional[float] = None  # shared by all devices
+
+
 @attr.s(auto_attribs=True, slots=True)
 class NodeMeasurement:
     """
@@ -99,6 +127,8 @@ class NodeMeasurement:
     unit_hint: Optional[str] = None
     stats_filter: FrozenSet[str] = attr.Factory(frozenset)
     current_hook: Optional[Callable[['Metric'], Decimal]] = None
+    # An alternative to per_device; if set, per_device is ignored.
+    per_device_batch: Optional[BatchMeasurement] = None
 
 
 @attr.s(auto_attribs=True, slots=True)
@@ -114,145 +144,353 @@ class ContainerMeasurement:
     current_hook: Optional[Callable[['Metric'], Decimal]] = None
 
 
-class MovingStatistics:
+_nan: Final = float('nan')
+_inf: Final = float('inf')
+_stat_names: Final = ('min', 'max', 'sum', 'avg', 'diff', 'rate')
+
+
+def _to_decimal(value: float) -> Decimal:
+    # Use the shortest round-trip representation instead of the exact binary expansion.
+    return Decimal(repr(value))
+
+
+def _format_fixed(value: float, digits: int = 3) -> str:
+    """
+    Format the given value like ``str(remove_exponent(Decimal(value).quantize(...)))``
+    without going through Decimal.
+    """
+    text = f'{value:.{digits}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text == '-0':
+        return '0'
+    return text
+
+
+class MetricStore:
+    """
+    A compact columnar storage for the current values and the moving statistics of metrics.
+
+    Each metric owns a slot, which is an index to the preallocated float64 columns,
+    so that the per-tick updates are plain float arithmetic without allocating new objects.
+    Decimal values appear only at the boundaries: the plugin-reported measurements and
+    the accessors of :class:`Metric` and :class:`MovingStatistics`.
+    """
+
     __slots__ = (
-        '_sum', '_count',
-        '_min', '_max', '_last',
+        '_size', '_free',
+        'current', 'capacity',
+        'min_value', 'max_value', 'sum_value', 'count',
+        'last_value', 'last_time', 'prev_value', 'prev_time',
+    )
+    _float_columns = (
+        'current', 'capacity',
+        'min_value', 'max_value', 'sum_value',
+        'last_value', 'last_time', 'prev_value', 'prev_time',
     )
-    _sum: Decimal
-    _count: int
-    _min: Decimal
-    _max: Decimal
-    _last: List[Tuple[Decimal, float]]
-
-    def __init__(self, initial_value: Decimal = None):
-        self._last = []
-        if initial_value is None:
-            self._sum = Decimal(0)
-            self._min = Decimal('inf')
-            self._max = Decimal('-inf')
-            self._count = 0
+
+    current: array
+    capacity: array  # NaN means no capacity
+    min_value: array
+    max_value: array
+    sum_value: array
+    count: array
+    last_value: array
+    last_time: array
+    prev_value: array
+    prev_time: array
+
+    def __init__(self, initial_slots: int = 64) -> None:
+        self._size = 0
+        self._free: List[int] = []
+        for name in self._float_columns:
+            setattr(self, name, array('d', bytes(8 * initial_slots)))
+        self.count = array('q', bytes(8 * initial_slots))
+
+    def __len__(self) -> int:
+        return self._size - len(self._free)
+
+    def _grow(self) -> None:
+        extra = max(len(self.count), 1)
+        for name in self._float_columns:
+            getattr(self, name).frombytes(bytes(8 * extra))
+        self.count.frombytes(bytes(8 * extra))
+
+    def allocate(self) -> int:
+        """
+        Reserve a slot with empty statistics and return its index.
+        """
+        if self._free:
+            slot = self._free.pop()
         else:
-            self._sum = initial_value
-            self._min = initial_value
-            self._max = initial_value
-            self._count = 1
-            point = (initial_value, time.perf_counter())
-            self._last.append(point)
+            if self._size == len(self.count):
+                self._grow()
+            slot = self._size
+            self._size += 1
+        self.current[slot] = 0.0
+        self.capacity[slot] = _nan
+        self.min_value[slot] = _inf
+        self.max_value[slot] = -_inf
+        self.sum_value[slot] = 0.0
+        self.count[slot] = 0
+        self.last_value[slot] = 0.0
+        self.last_time[slot] = _nan
+        self.prev_value[slot] = 0.0
+        self.prev_time[slot] = _nan
+        return slot
+
+    def release(self, slot: int) -> None:
+        """
+        Return the slot to the store so that it could be reused by a new metric.
+        """
+        self._free.append(slot)
+
+    def update(self, slot: int, value: float, now: float) -> None:
+        self.current[slot] = value
+        self.sum_value[slot] += value
+        if value < self.min_value[slot]:
+            self.min_value[slot] = value
+        if value > self.max_value[slot]:
+            self.max_value[slot] = value
+        self.count[slot] += 1
+        # keep only the latest two data points
+        self.prev_value[slot] = self.last_value[slot]
+        self.prev_time[slot] = self.last_time[slot]
+        self.last_value[slot] = value
+        self.last_time[slot] = now
+
+    def get_stat(self, slot: int, name: str) -> float:
+        if name == 'min':
+            return self.min_value[slot]
+        if name == 'max':
+            return self.max_value[slot]
+        if name == 'sum':
+            return self.sum_value[slot]
+        if name == 'avg':
+            return self.sum_value[slot] / self.count[slot]
+        if name == 'diff':
+            if self.count[slot] >= 2:
+                return self.last_value[slot] - self.prev_value[slot]
+            return 0.0
+        if name == 'rate':
+            if self.count[slot] >= 2:
+                return ((self.last_value[slot] - self.prev_value[slot]) /
+                        (self.last_time[slot] - self.prev_time[slot]))
+            return 0.0
+        raise KeyError(name)
+
+
+def current_diff(metric: 'Metric') -> Decimal:
+    """
+    A ``current_hook`` to report the difference from the previous value as the current value.
+    Metric updates recognize it and compute the value without Decimal conversions.
+    """
+    return metric.stats.diff
+
+
+def current_rate(metric: 'Metric') -> Decimal:
+    """
+    A ``current_hook`` to report the rate of change per second as the current value.
+    Metric updates recognize it and compute the value without Decimal conversions.
+    """
+    return metric.stats.rate
+
+
+class MovingStatistics:
+    """
+    A view to the moving statistics of a metric stored in a :class:`MetricStore` slot.
+
+    If no store is given, it allocates a private single-slot store.
+    """
+
+    __slots__ = ('_store', '_slot')
+
+    def __init__(
+        self,
+        initial_value: Optional[Decimal] = None,
+        *,
+        store: Optional[MetricStore] = None,
+        slot: Optional[int] = None,
+    ) -> None:
+        if store is None:
+            store = MetricStore(1)
+        if slot is None:
+            slot = store.allocate()
+        self._store = store
+        self._slot = slot
+        if initial_value is not None:
+            store.update(slot, float(initial_value), time.perf_counter())
 
     def update(self, value: Decimal):
-        self._sum += value
-        self._min = min(self._min, value)
-        self._max = max(self._max, value)
-        self._count += 1
-        point = (value, time.perf_counter())
-        self._last.append(point)
-        # keep only the latest two data points
-        if len(self._last) > 2:
-            self._last.pop(0)
+        self._store.update(self._slot, float(value), time.perf_counter())
 
     @property
     def min(self) -> Decimal:
-        return self._min
+        return _to_decimal(self._store.get_stat(self._slot, 'min'))
 
     @property
     def max(self) -> Decimal:
-        return self._max
+        return _to_decimal(self._store.get_stat(self._slot, 'max'))
 
     @property
     def sum(self) -> Decimal:
-        return self._sum
+        return _to_decimal(self._store.get_stat(self._slot, 'sum'))
 
     @property
     def avg(self) -> Decimal:
-        return self._sum / self._count
+        return _to_decimal(self._store.get_stat(self._slot, 'avg'))
 
     @property
     def diff(self) -> Decimal:
-        if len(self._last) == 2:
-            return self._last[-1][0] - self._last[-2][0]
-        return Decimal(0)
+        return _to_decimal(self._store.get_stat(self._slot, 'diff'))
 
     @property
     def rate(self) -> Decimal:
-        if len(self._last) == 2:
-            return ((self._last[-1][0] - self._last[-2][0]) /
-                    Decimal(self._last[-1][1] - self._last[-2][1]))
-        return Decimal(0)
+        return _to_decimal(self._store.get_stat(self._slot, 'rate'))
 
     def to_serializable_dict(self) -> MovingStatValue:
-        q = Decimal('0.000')
+        store, slot = self._store, self._slot
         return {
-            'min': str(remove_exponent(self.min.quantize(q))),
-            'max': str(remove_exponent(self.max.quantize(q))),
-            'sum': str(remove_exponent(self.sum.quantize(q))),
-            'avg': str(remove_exponent(self.avg.quantize(q))),
-            'diff': str(remove_exponent(self.diff.quantize(q))),
-            'rate': str(remove_exponent(self.rate.quantize(q))),
+            'min': _format_fixed(store.get_stat(slot, 'min')),
+            'max': _format_fixed(store.get_stat(slot, 'max')),
+            'sum': _format_fixed(store.get_stat(slot, 'sum')),
+            'avg': _format_fixed(store.get_stat(slot, 'avg')),
+            'diff': _format_fixed(store.get_stat(slot, 'diff')),
+            'rate': _format_fixed(store.get_stat(slot, 'rate')),
             'version': 2,
         }
 
 
-@attr.s(auto_attribs=True, slots=True)
 class Metric:
+    """
+    A metric whose values and moving statistics are kept in a :class:`MetricStore` slot.
+
+    Call :meth:`release` when discarding it to recycle the slot.
+    """
+
+    __slots__ = (
+        'key', 'type', 'stats', 'stats_filter',
+        'unit_hint', 'current_hook',
+        '_store', '_slot',
+    )
+
     key: str
     type: MetricTypes
     stats: MovingStatistics
     stats_filter: FrozenSet[str]
-    current: Decimal
-    capacity: Optional[Decimal] = None
-    unit_hint: Optional[str] = None
-    current_hook: Optional[Callable[['Metric'], Decimal]] = None
+    unit_hint: Optional[str]
+    current_hook: Optional[Callable[['Metric'], Decimal]]
+
+    def __init__(
+        self,
+        key: str,
+        type: MetricTypes,
+        *,
+        store: MetricStore,
+        current: Decimal,
+        capacity: Optional[Decimal] = None,
+        unit_hint: Optional[str] = None,
+        stats_filter: FrozenSet[str] = frozenset(),
+        current_hook: Optional[Callable[['Metric'], Decimal]] = None,
+    ) -> None:
+        self.key = key
+        self.type = type
+        self.stats_filter = stats_filter
+        self.unit_hint = unit_hint
+        self.current_hook = current_hook
+        self._store = store
+        self._slot = store.allocate()
+        self.stats = MovingStatistics(current, store=store, slot=self._slot)
+        if capacity is not None:
+            store.capacity[self._slot] = float(capacity)
+
+    @property
+    def current(self) -> Decimal:
+        return _to_decimal(self._store.current[self._slot])
+
+    @property
+    def capacity(self) -> Optional[Decimal]:
+        capacity = self._store.capacity[self._slot]
+        if math.isnan(capacity):
+            return None
+        return _to_decimal(capacity)
 
     def update(self, value: Measurement):
-        if value.capacity is not None:
-            self.capacity = value.capacity
-        self.stats.update(value.value)
-        self.current = value.value
-        if self.current_hook is not None:
-            self.current = self.current_hook(self)
+        self.update_raw(
+            float(value.value),
+            float(value.capacity) if value.capacity is not None else None,
+            time.perf_counter(),
+        )
+
+    def update_raw(self, value: float, capacity: Optional[float], now: float) -> None:
+        """
+        Update the metric with plain float values, skipping the Decimal conversions.
+        """
+        store, slot = self._store, self._slot
+        if capacity is not None:
+            store.capacity[slot] = capacity
+        store.update(slot, value, now)
+        hook = self.current_hook
+        if hook is not None:
+            if hook is current_diff:
+                store.current[slot] = store.get_stat(slot, 'diff')
+            elif hook is current_rate:
+                store.current[slot] = store.get_stat(slot, 'rate')
+            else:
+                store.current[slot] = float(hook(self))
+
+    def release(self) -> None:
+        self._store.release(self._slot)
 
     def to_serializable_dict(self) -> MetricValue:
-        q = Decimal('0.000')
-        q_pct = Decimal('0.00')
-        return {
-            'current': str(remove_exponent(self.current.quantize(q))),
-            'capacity': (str(remove_exponent(self.capacity.quantize(q)))
-                         if self.capacity is not None else None),
+        store, slot = self._store, self._slot
+        current = store.current[slot]
+        capacity = store.capacity[slot]
+        has_capacity = not math.isnan(capacity)
+        result: MetricValue = {
+            'current': _format_fixed(current),
+            'capacity': _format_fixed(capacity) if has_capacity else None,
             'pct': (
-                str(remove_exponent(
-                    (Decimal(self.current) / Decimal(self.capacity) * 100).quantize(q_pct)))
-                if (self.capacity is not None and
-                    self.capacity.is_normal() and
-                    self.capacity > 0)
+                _format_fixed(current / capacity * 100, 2)
+                if (has_capacity and
+                    math.isfinite(capacity) and
+                    capacity > 0)
                 else None),
-            'unit_hint': self.unit_hint,
-            **{f'stats.{k}': v  # type: ignore
-               for k, v in self.stats.to_serializable_dict().items()
-               if k in self.stats_filter},
+            'unit_hint': self.unit_hint,  # type: ignore
         }
+        for stat_name in _stat_names:
+            if stat_name in self.stats_filter:
+                result[f'stats.{stat_name}'] = _format_fixed(  # type: ignore
+                    store.get_stat(slot, stat_name))
+        if 'version' in self.stats_filter:
+            result['stats.version'] = 2  # type: ignore
+        return result
 
 
 class StatContext:
 
     agent: 'AbstractAgent'
     mode: StatModes
-    node_metrics: Mapping[MetricKey, Metric]
-    device_metrics: Mapping[MetricKey, MutableMapping[DeviceId, Metric]]
+    node_metrics: MutableMapping[MetricKey, Metric]
+    device_metrics: MutableMapping[MetricKey, MutableMapping[DeviceId, Metric]]
     kernel_metrics: MutableMapping[KernelId, MutableMapping[MetricKey, Metric]]
 
-    def __init__(self, agent: 'AbstractAgent', mode: StatModes = None, *,
+    def __init__(self, agent: 'AbstractAgent', mode: Optional[StatModes] = None, *,
                  cache_lifespan: float = 120.0) -> None:
         self.agent = agent
         self.mode = mode if mode is not None else StatModes.get_preferred_mode()
         self.cache_lifespan = cache_lifespan
 
+        self._store = MetricStore()
         self.node_metrics = {}
         self.device_metrics = {}
         self.kernel_metrics = {}
 
         self._lock = asyncio.Lock()
         self._timestamps: MutableMapping[str, float] = {}
+        self._samples: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._serialized_kernel_stats: Dict[KernelId, bytes] = {}
+        self.cgroup_files = CgroupFileCache()
 
     def update_timestamp(self, timestamp_key: str) -> Tuple[float, float]:
         """
@@ -270,99 +508,51 @@ class StatContext:
             return now, float('NaN')
         return now, now - last
 
-    async def collect_node_stat(self):
+    async def get_container_sample(
+        self,
+        sample_key: str,
+        container_id: str,
+        fetcher: Callable[[], Awaitable[T]],
+    ) -> T:
         """
-        Collect the per-node, per-device, and per-container statistics.
+        Return the raw sample of the given container identified by ``sample_key``
+        (e.g., the Docker stats API result), calling ``fetcher`` only once per
+        collection tick.  Concurrent requests for the same sample share a single
+        in-flight fetch.
+
+        Intended to be used by compute plugins.
+        """
+        key = (sample_key, container_id)
+        fut = self._samples.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fetcher())
+            self._samples[key] = fut
+        return cast(T, await asyncio.shield(fut))
+
+    def _reset_samples(self) -> None:
+        for fut in self._samples.values():
+            if not fut.done():
+                fut.cancel()
+        self._samples.clear()
+
+    async def collect_stat(self) -> Sequence[KernelId]:
+        """
+        Collect the per-node, per-device, and per-container statistics in a single pass
+        and publish them to the Redis server using a single pipeline.
+
+        The serialized statistics of each kernel are cached so that the unchanged ones
+        (e.g., idle sessions) only get their TTLs refreshed instead of being re-published.
+        Returns the list of kernel IDs whose published statistics have changed in this pass.
 
         Intended to be used by the agent.
         """
         async with self._lock:
-            # Here we use asyncio.gather() instead of aiotools.TaskGroup
-            # to keep methods of other plugins running when a plugin raises an error
-            # instead of cancelling them.
-            _tasks = []
-            for computer in self.agent.computers.values():
-                _tasks.append(computer.instance.gather_node_measures(self))
-            results = await asyncio.gather(*_tasks, return_exceptions=True)
-            for result in results:
-                if isinstance(result, Exception):
-                    log.error('collect_node_stat(): gather_node_measures() error',
-                              exc_info=result)
-                    continue
-                for node_measure in result:
-                    metric_key = node_measure.key
-                    # update node metric
-                    if metric_key not in self.node_metrics:
-                        self.node_metrics[metric_key] = Metric(
-                            metric_key, node_measure.type,
-                            current=node_measure.per_node.value,
-                            capacity=node_measure.per_node.capacity,
-                            unit_hint=node_measure.unit_hint,
-                            stats=MovingStatistics(node_measure.per_node.value),
-                            stats_filter=frozenset(node_measure.stats_filter),
-                            current_hook=node_measure.current_hook,
-                        )
-                    else:
-                        self.node_metrics[metric_key].update(node_measure.per_node)
-                    # update per-device metric
-                    # NOTE: device IDs are defined by each metric keys.
-                    for dev_id, measure in node_measure.per_device.items():
-                        dev_id = str(dev_id)
-                        if metric_key not in self.device_metrics:
-                            self.device_metrics[metric_key] = {}
-                        if dev_id not in self.device_metrics[metric_key]:
-                            self.device_metrics[metric_key][dev_id] = Metric(
-                                metric_key, node_measure.type,
-                                current=measure.value,
-                                capacity=measure.capacity,
-                                unit_hint=node_measure.unit_hint,
-                                stats=MovingStatistics(measure.value),
-                                stats_filter=frozenset(node_measure.stats_filter),
-                                current_hook=node_measure.current_hook,
-                            )
-                        else:
-                            self.device_metrics[metric_key][dev_id].update(measure)
-
-            # gather container metrics from compute plugins
-            container_ids = []
-            kernel_id_map = {}
-            used_kernel_ids = set()
-            for kid, kobj in self.agent.kernel_registry.items():
-                cid = kobj['container_id']
-                container_ids.append(cid)
-                kernel_id_map[cid] = kid
-                used_kernel_ids.add(kid)
-            unused_kernel_ids = set(self.kernel_metrics.keys()) - used_kernel_ids
-            for unused_kernel_id in unused_kernel_ids:
-                log.debug('removing kernel_metric for {}', unused_kernel_id)
-                self.kernel_metrics.pop(unused_kernel_id, None)
-            _tasks = []
-            for computer in self.agent.computers.values():
-                _tasks.append(computer.instance.gather_container_measures(self, container_ids))
-            for ctnr_measures in (await asyncio.gather(*_tasks, return_exceptions=True)):
-                if isinstance(ctnr_measures, Exception):
-                    log.error('gather_container_measures error',
-                              exc_info=ctnr_measures)
-                    continue
-                for ctnr_measure in ctnr_measures:
-                    metric_key = ctnr_measure.key
-                    # update per-container metric
-                    for cid, measure in ctnr_measure.per_container.items():
-                        kernel_id = kernel_id_map[cid]
-                        if kernel_id not in self.kernel_metrics:
-                            self.kernel_metrics[kernel_id] = {}
-                        if metric_key not in self.kernel_metrics[kernel_id]:
-                            self.kernel_metrics[kernel_id][metric_key] = Metric(
-                                metric_key, ctnr_measure.type,
-                                current=measure.value,
-                                capacity=measure.value,
-                                unit_hint=ctnr_measure.unit_hint,
-                                stats=MovingStatistics(measure.value),
-                                stats_filter=frozenset(ctnr_measure.stats_filter),
-                                current_hook=ctnr_measure.current_hook,
-                            )
-                        else:
-                            self.kernel_metrics[kernel_id][metric_key].update(measure)
+            self._reset_samples()
+            try:
+                await self._update_node_metrics()
+                updated_kernel_ids = await self._update_kernel_metrics()
+            finally:
+                self._reset_samples()
 
         # push to the Redis server
         redis_agent_updates = {
@@ -380,89 +570,183 @@ class StatContext:
             log.debug('stats: node_updates: {0}: {1}',
                       self.agent.local_config['agent']['id'], redis_agent_updates['node'])
         serialized_agent_updates = msgpack.packb(redis_agent_updates)
-
-        def _pipe_builder():
-            pipe = self.agent.redis_stat_pool.pipeline()
-            pipe.set(self.agent.local_config['agent']['id'], serialized_agent_updates)
-            pipe.expire(self.agent.local_config['agent']['id'], self.cache_lifespan)
-            for kernel_id, metrics in self.kernel_metrics.items():
-                serialized_metrics = {
-                    key: obj.to_serializable_dict()
-                    for key, obj in metrics.items()
-                }
-                pipe.set(str(kernel_id), msgpack.packb(serialized_metrics))
-                pipe.expire(str(kernel_id), self.cache_lifespan)
-            return pipe
-        await redis.execute_with_retries(_pipe_builder)
-
-    async def collect_container_stat(
-        self,
-        container_ids: Sequence[ContainerId],
-    ) -> Mapping[MetricKey, Metric]:
-        """
-        Collect the per-container statistics only,
-
-        Intended to be used by the agent and triggered by container cgroup synchronization processes.
-        """
-        async with self._lock:
-            kernel_id_map: Dict[ContainerId, KernelId] = {}
-            for kid, info in self.agent.kernel_registry.items():
-                cid = info['container_id']
-                kernel_id_map[ContainerId(cid)] = kid
-            # Here we use asyncio.gather() instead of aiotools.TaskGroup
-            # to keep methods of other plugins running when a plugin raises an error
-            # instead of cancelling them.
-            _tasks = []
-            kernel_id = None
-            for computer in self.agent.computers.values():
-                _tasks.append(asyncio.create_task(
-                    computer.instance.gather_container_measures(self, container_ids)
-                ))
-            results = await asyncio.gather(*_tasks, return_exceptions=True)
-            for result in results:
-                if isinstance(result, Exception):
-                    log.error('collect_container_stat(): gather_container_measures() error',
-                              exc_info=result)
-                    continue
-                for ctnr_measure in result:
-                    metric_key = ctnr_measure.key
-                    # update per-container metric
-                    for cid, measure in ctnr_measure.per_container.items():
-                        try:
-                            kernel_id = kernel_id_map[cid]
-                        except KeyError:
-                            continue
-                        if kernel_id not in self.kernel_metrics:
-                            self.kernel_metrics[kernel_id] = {}
-                        if metric_key not in self.kernel_metrics[kernel_id]:
-                            self.kernel_metrics[kernel_id][metric_key] = Metric(
-                                metric_key, ctnr_measure.type,
-                                current=measure.value,
-                                capacity=measure.value,
-                                unit_hint=ctnr_measure.unit_hint,
-                                stats=MovingStatistics(measure.value),
-                                stats_filter=frozenset(ctnr_measure.stats_filter),
-                                current_hook=ctnr_measure.current_hook,
-                            )
-                        else:
-                            self.kernel_metrics[kernel_id][metric_key].update(measure)
-
-        if kernel_id is not None:
-            metrics = self.kernel_metrics[kernel_id]
+        for kernel_id in self._serialized_kernel_stats.keys() - self.kernel_metrics.keys():
+            del self._serialized_kernel_stats[kernel_id]
+        # Only the kernels updated in this pass (or not published yet) may have different
+        # values, and among them we re-publish only those whose serialized values have changed.
+        # For the others, we just refresh the TTL of the last published values.
+        publish_candidates: Dict[KernelId, None] = {  # use dict as an ordered set
+            kernel_id: None for kernel_id in updated_kernel_ids
+        }
+        for kernel_id in self.kernel_metrics.keys() - self._serialized_kernel_stats.keys():
+            publish_candidates[kernel_id] = None
+        changed_kernel_updates: Dict[KernelId, bytes] = {}
+        for kernel_id in publish_candidates:
             serializable_metrics = {
                 key: obj.to_serializable_dict()
-                for key, obj in metrics.items()
+                for key, obj in self.kernel_metrics[kernel_id].items()
             }
+            serialized_metrics = msgpack.packb(serializable_metrics)
+            if serialized_metrics == self._serialized_kernel_stats.get(kernel_id):
+                continue
             if self.agent.local_config['debug']['log-stats']:
-                log.debug('kernel_updates: {0}: {1}',
+                log.debug('stats: kernel_updates: {0}: {1}',
                           kernel_id, serializable_metrics)
-            serialized_metrics = msgpack.packb(serializable_metrics)
+            changed_kernel_updates[kernel_id] = serialized_metrics
+        unchanged_kernel_ids = [
+            kernel_id for kernel_id in self._serialized_kernel_stats.keys()
+            if kernel_id not in changed_kernel_updates
+        ]
+        cache_lifespan_msec = int(self.cache_lifespan * 1000)
+
+        def _pipe_builder():
+            pipe = self.agent.redis_stat_pool.pipeline()
+            pipe.set(self.agent.local_config['agent']['id'], serialized_agent_updates,
+                     pexpire=cache_lifespan_msec)
+            for kernel_id, serialized_metrics in changed_kernel_updates.items():
+                pipe.set(str(kernel_id), serialized_metrics, pexpire=cache_lifespan_msec)
+            for kernel_id in unchanged_kernel_ids:
+                pipe.pexpire(str(kernel_id), cache_lifespan_msec)
+            return pipe
+        try:
+            # The statistics are refreshed in the next pass anyway, so we skip this pass
+            # instead of blocking or spooling when Redis is unavailable or too slow.
+            results = await asyncio.wait_for(
+                redis.execute_with_retries(_pipe_builder),
+                self.agent.local_config['agent']['spool']['latency-budget'],
+            )
+        except redis_unavailable_errors as e:
+            log.warning('skipped publishing the statistics as Redis is unavailable ({!r})', e)
+            # Let the next pass publish the whole values again.
+            self._serialized_kernel_stats.clear()
+            return []
+        self._serialized_kernel_stats.update(changed_kernel_updates)
+        expire_results = results[1 + len(changed_kernel_updates):]
+        for kernel_id, expired in zip(unchanged_kernel_ids, expire_results):
+            if not expired:
+                # The key has disappeared from the Redis server (e.g., restarted),
+                # so let the next pass publish the whole value again.
+                del self._serialized_kernel_stats[kernel_id]
+        return [*changed_kernel_updates.keys()]
+
+    async def _update_node_metrics(self) -> None:
+        # Here we use asyncio.gather() instead of aiotools.TaskGroup
+        # to keep methods of other plugins running when a plugin raises an error
+        # instead of cancelling them.
+        _tasks = []
+        for computer in self.agent.computers.values():
+            _tasks.append(computer.instance.gather_node_measures(self))
+        results = await asyncio.gather(*_tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                log.error('collect_stat(): gather_node_measures() error',
+                          exc_info=result)
+                continue
+            for node_measure in result:
+                metric_key = MetricKey(node_measure.key)
+                # update node metric
+                if metric_key not in self.node_metrics:
+                    self.node_metrics[metric_key] = Metric(
+                        metric_key, node_measure.type,
+                        current=node_measure.per_node.value,
+                        capacity=node_measure.per_node.capacity,
+                        unit_hint=node_measure.unit_hint,
+                        store=self._store,
+                        stats_filter=frozenset(node_measure.stats_filter),
+                        current_hook=node_measure.current_hook,
+                    )
+                else:
+                    self.node_metrics[metric_key].update(node_measure.per_node)
+                # update per-device metric
+                # NOTE: device IDs are defined by each metric keys.
+                if node_measure.per_device_batch is not None:
+                    self._update_device_metrics_batch(node_measure)
+                    continue
+                for raw_dev_id, measure in node_measure.per_device.items():
+                    dev_id = DeviceId(str(raw_dev_id))
+                    if metric_key not in self.device_metrics:
+                        self.device_metrics[metric_key] = {}
+                    if dev_id not in self.device_metrics[metric_key]:
+                        self.device_metrics[metric_key][dev_id] = Metric(
+                            metric_key, node_measure.type,
+                            current=measure.value,
+                            capacity=measure.capacity,
+                            unit_hint=node_measure.unit_hint,
+                            store=self._store,
+                            stats_filter=frozenset(node_measure.stats_filter),
+                            current_hook=node_measure.current_hook,
+                        )
+                    else:
+                        self.device_metrics[metric_key][dev_id].update(measure)
 
-            def _pipe_builder():
-                pipe = self.agent.redis_stat_pool.pipeline()
-                pipe.set(str(kernel_id), serialized_metrics)
-                pipe.expire(str(kernel_id), self.cache_lifespan)
-                return pipe
-            await redis.execute_with_retries(_pipe_builder)
-            return metrics
-        return {}
+    def _update_device_metrics_batch(self, node_measure: NodeMeasurement) -> None:
+        batch = node_measure.per_device_batch
+        assert batch is not None
+        metric_key = MetricKey(node_measure.key)
+        per_device = self.device_metrics.setdefault(metric_key, {})
+        now = time.perf_counter()
+        for dev_id, value in zip(batch.device_ids, batch.values):
+            metric = per_device.get(dev_id)
+            if metric is None:
+                per_device[dev_id] = Metric(
+                    metric_key, node_measure.type,
+                    current=_to_decimal(value),
+                    capacity=_to_decimal(batch.capacity) if batch.capacity is not None else None,
+                    unit_hint=node_measure.unit_hint,
+                    store=self._store,
+                    stats_filter=frozenset(node_measure.stats_filter),
+                    current_hook=node_measure.current_hook,
+                )
+            else:
+                metric.update_raw(value, batch.capacity, now)
+
+    async def _update_kernel_metrics(self) -> Sequence[KernelId]:
+        container_ids: List[ContainerId] = []
+        kernel_id_map: Dict[ContainerId, KernelId] = {}
+        for kid, kobj in [*self.agent.kernel_registry.items()]:
+            cid = ContainerId(kobj['container_id'])
+            container_ids.append(cid)
+            kernel_id_map[cid] = kid
+        self.cgroup_files.retain(container_ids)
+        unused_kernel_ids = self.kernel_metrics.keys() - kernel_id_map.values()
+        for unused_kernel_id in unused_kernel_ids:
+            log.debug('removing kernel_metric for {}', unused_kernel_id)
+            for metric in self.kernel_metrics.pop(unused_kernel_id, {}).values():
+                metric.release()
+        # Here we use asyncio.gather() instead of aiotools.TaskGroup
+        # to keep methods of other plugins running when a plugin raises an error
+        # instead of cancelling them.
+        _tasks = []
+        for computer in self.agent.computers.values():
+            _tasks.append(computer.instance.gather_container_measures(self, container_ids))
+        updated_kernel_ids: Dict[KernelId, None] = {}  # use dict as an ordered set
+        results = await asyncio.gather(*_tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                log.error('collect_stat(): gather_container_measures() error',
+                          exc_info=result)
+                continue
+            for ctnr_measure in result:
+                metric_key = MetricKey(ctnr_measure.key)
+                # update per-container metric
+                for raw_cid, measure in ctnr_measure.per_container.items():
+                    try:
+                        kernel_id = kernel_id_map[ContainerId(raw_cid)]
+                    except KeyError:
+                        continue
+                    if kernel_id not in self.kernel_metrics:
+                        self.kernel_metrics[kernel_id] = {}
+                    if metric_key not in self.kernel_metrics[kernel_id]:
+                        self.kernel_metrics[kernel_id][metric_key] = Metric(
+                            metric_key, ctnr_measure.type,
+                            current=measure.value,
+                            capacity=measure.value,
+                            unit_hint=ctnr_measure.unit_hint,
+                            store=self._store,
+                            stats_filter=frozenset(ctnr_measure.stats_filter),
+                            current_hook=ctnr_measure.current_hook,
+                        )
+                    else:
+                        self.kernel_metrics[kernel_id][metric_key].update(measure)
+                    updated_kernel_ids[kernel_id] = None
+        return [*updated_kernel_ids.keys()]
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import bisect
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import math
+import time
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+__all__ = (
+    'PhaseTimer',
+    'PhaseLatencyHistogram',
+    'phase',
+)
+
+# The upper bounds (in seconds) of the latency histogram buckets.
+_bucket_bounds: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0, 120.0, 300.0, math.inf,
+)
+
+_current_timer: ContextVar[Optional[PhaseTimer]] = ContextVar('_current_timer', default=None)
+
+
+class PhaseTimer:
+    """
+    Records the elapsed time of each phase of a kernel lifecycle operation,
+    such as creation, destruction and cleanup.
+
+    Activating a timer makes the module-level :func:`phase` spans in the current
+    asyncio task (and the tasks spawned from it) record into the timer,
+    so that the agent backends may time their own phases without passing it around.
+    """
+
+    operation: str
+    spans: Dict[str, float]
+
+    _started_at: float
+    _finished_at: Optional[float]
+
+    def __init__(self, operation: str) -> None:
+        self.operation = operation
+        self.spans = {}
+        self._started_at = time.perf_counter()
+        self._finished_at = None
+
+    @contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Repeated phases (e.g., retries) are accumulated.
+            self.spans[phase] = self.spans.get(phase, 0.0) + (time.perf_counter() - begin)
+
+    @contextmanager
+    def activate(self) -> Iterator[PhaseTimer]:
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    def finish(self) -> None:
+        if self._finished_at is None:
+            self._finished_at = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        finished_at = self._finished_at if self._finished_at is not None else time.perf_counter()
+        return finished_at - self._started_at
+
+    def to_serializable_dict(self) -> Dict[str, float]:
+        """
+        Return the elapsed seconds of the recorded phases and the whole operation.
+        """
+        return {
+            **{phase: round(elapsed, 6) for phase, elapsed in self.spans.items()},
+            'total': round(self.total, 6),
+        }
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a phase of the currently active :class:`PhaseTimer`.
+    It is a no-op if there is no active timer.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.span(name):
+        yield
+
+
+class _PhaseWindow:
+
+    __slots__ = ('samples', 'counts')
+
+    samples: Deque[float]
+    counts: List[int]
+
+    def __init__(self, window_size: int) -> None:
+        self.samples = deque(maxlen=window_size)
+        self.counts = [0] * len(_bucket_bounds)
+
+    def observe(self, elapsed: float) -> None:
+        if len(self.samples) == self.samples.maxlen:
+            evicted = self.samples[0]
+            self.counts[bisect.bisect_left(_bucket_bounds, evicted)] -= 1
+        self.samples.append(elapsed)
+        self.counts[bisect.bisect_left(_bucket_bounds, elapsed)] += 1
+
+    def to_serializable_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        count = len(ordered)
+        return {
+            'count': count,
+            'mean': round(sum(ordered) / count, 6) if count else None,
+            'p50': round(ordered[(count - 1) // 2], 6) if count else None,
+            'p95': round(ordered[math.ceil(count * 0.95) - 1], 6) if count else None,
+            'max': round(ordered[-1], 6) if count else None,
+            'buckets': {
+                ('+Inf' if math.isinf(bound) else str(bound)): bucket_count
+                for bound, bucket_count in zip(_bucket_bounds, self.counts)
+            },
+        }
+
+
+class PhaseLatencyHistogram:
+    """
+    Keeps the latency distribution of each phase of kernel lifecycle operations
+    over the most recent *window_size* operations.
+    """
+
+    window_size: int
+
+    _windows: Dict[str, Dict[str, _PhaseWindow]]
+
+    def __init__(self, *, window_size: int = 512) -> None:
+        self.window_size = window_size
+        self._windows = {}
+
+    @contextmanager
+    def track(self, operation: str) -> Iterator[PhaseTimer]:
+        """
+        Time the enclosed block as the given operation using an activated :class:`PhaseTimer`
+        and observe it when the block exits.
+        The failed operations are observed separately as ``<operation>_failed``.
+        """
+        timer = PhaseTimer(operation)
+        try:
+            with timer.activate():
+                yield timer
+        except BaseException:
+            timer.operation = f'{operation}_failed'
+            raise
+        finally:
+            self.observe(timer)
+
+    def observe(self, timer: PhaseTimer) -> None:
+        timer.finish()
+        windows = self._windows.setdefault(timer.operation, {})
+        for phase_name, elapsed in (*timer.spans.items(), ('total', timer.total)):
+            window = windows.get(phase_name)
+            if window is None:
+                window = windows[phase_name] = _PhaseWindow(self.window_size)
+            window.observe(elapsed)
+
+    def to_serializable_dict(self) -> Mapping[str, Mapping[str, Any]]:
+        return {
+            operation: {
+                phase_name: window.to_serializable_dict()
+                for phase_name, window in windows.items()
+            }
+            for operation, windows in self._windows.items()
+        }
@@ -1,17 +1,21 @@
+from array import array
 import asyncio
 from decimal import Decimal
+import functools
 import hashlib
 import io
 import ipaddress
 import json
 import logging
+import os
 from pathlib import Path
 import re
+import threading
 from typing import (
     Any, Optional,
-    Iterable,
+    Dict, Iterable,
     Mapping, MutableMapping,
-    List, Sequence, Tuple, Union,
+    List, Sequence, Set, Tuple, Union,
     Type, overload,
 )
 from typing_extensions import Final
@@ -19,6 +23,7 @@ from uuid import UUID
 
 import aiodocker
 from aiodocker.docker import DockerContainer
+import attr
 import netifaces
 import trafaret as t
 
@@ -39,6 +44,8 @@ InOtherContainerPID: Final = ContainerPID(PID(-2))
 NotContainerPID: Final = ContainerPID(PID(-1))
 NotHostPID: Final = HostPID(PID(-1))
 
+cgroup_root: Final = Path('/sys/fs/cgroup')
+
 
 def generate_agent_id(hint: str) -> str:
     return hashlib.md5(hint.encode('utf-8')).hexdigest()[:12]
@@ -68,22 +75,22 @@ def remove_exponent(num: Decimal) -> Decimal:
 
 
 @overload
-def read_sysfs(path: Union[str, Path], type_: Type[bool], default: bool) -> bool:
+def read_sysfs(path: Union[str, Path], type_: Type[bool], default: bool = ...) -> bool:
     ...
 
 
 @overload
-def read_sysfs(path: Union[str, Path], type_: Type[int], default: int) -> int:
+def read_sysfs(path: Union[str, Path], type_: Type[int], default: int = ...) -> int:
     ...
 
 
 @overload
-def read_sysfs(path: Union[str, Path], type_: Type[float], default: float) -> float:
+def read_sysfs(path: Union[str, Path], type_: Type[float], default: float = ...) -> float:
     ...
 
 
 @overload
-def read_sysfs(path: Union[str, Path], type_: Type[str], default: str) -> str:
+def read_sysfs(path: Union[str, Path], type_: Type[str], default: str = ...) -> str:
     ...
 
 
@@ -108,6 +115,258 @@ def read_sysfs(path: Union[str, Path], type_: Type[Any], default: Any = None) ->
         return default
 
 
+@functools.lru_cache(maxsize=1)
+def get_cgroup_version() -> str:
+    """
+    Return "2" if the host uses the unified cgroup hierarchy, otherwise "1".
+    """
+    if (cgroup_root / 'cgroup.controllers').exists():
+        return '2'
+    return '1'
+
+
+def get_cgroup_path(controller: str, container_id: str, *, driver: str = 'cgroupfs') -> Path:
+    """
+    Return the cgroup directory of the given container.
+
+    :param controller: The cgroup v1 controller name (e.g., "cpuacct", "memory", "blkio").
+                       It is ignored for the unified (v2) hierarchy.
+    :param driver: The cgroup driver used by the Docker daemon ("cgroupfs" or "systemd").
+    """
+    if get_cgroup_version() == '2':
+        base = cgroup_root
+    else:
+        base = cgroup_root / controller
+    if driver == 'systemd':
+        return base / 'system.slice' / f'docker-{container_id}.scope'
+    return base / 'docker' / container_id
+
+
+def parse_cgroup_stat(content: str) -> Dict[str, int]:
+    """
+    Parse a flat-keyed cgroup stat file such as ``cpu.stat`` and ``memory.stat``.
+    """
+    result = {}
+    for line in content.splitlines():
+        key, _, value = line.partition(' ')
+        if value:
+            result[key] = int(value)
+    return result
+
+
+def parse_cgroup_io_stat(content: str) -> Tuple[int, int]:
+    """
+    Parse a nested-keyed cgroup v2 ``io.stat`` file and return the total
+    number of read and written bytes across all devices.
+    """
+    # example data:
+    #   8:0 rbytes=13918208 wbytes=0 rios=340 wios=0 dbytes=0 dios=0
+    #   253:0 rbytes=4096 wbytes=8192 rios=1 wios=2 dbytes=0 dios=0
+    io_read_bytes = 0
+    io_write_bytes = 0
+    for line in content.splitlines():
+        _, *fields = line.split()
+        for field in fields:
+            key, _, value = field.partition('=')
+            if key == 'rbytes':
+                io_read_bytes += int(value)
+            elif key == 'wbytes':
+                io_write_bytes += int(value)
+    return io_read_bytes, io_write_bytes
+
+
+def read_proc_stat_cpu_usage(path: Union[str, Path] = '/proc/stat') -> Tuple[List[int], array]:
+    """
+    Parse the per-core CPU times from ``/proc/stat`` in a single pass and return
+    the list of core IDs and the array of their accumulated user+system time in msec.
+    It raises :exc:`IOError` if the file is not readable.
+    """
+    # example data:
+    #   cpu  3357 0 4313 1362393 0 0 0 0 0 0
+    #   cpu0 1679 0 2150 681160 0 0 0 0 0 0
+    #   cpu1 1678 0 2163 681233 0 0 0 0 0 0
+    #   intr 114930548 113199788 3 0 5 263 0 4 [...]
+    msec_per_tick = 1000 / os.sysconf('SC_CLK_TCK')
+    core_ids: List[int] = []
+    usage = array('d')
+    with open(path, 'rb') as f:
+        content = f.read()
+    for line in content.splitlines():
+        if not line.startswith(b'cpu'):
+            # cpu lines come first.
+            break
+        name, user, _nice, system, *_ = line.split()
+        if name == b'cpu':
+            continue
+        core_ids.append(int(name[3:]))
+        usage.append((int(user) + int(system)) * msec_per_tick)
+    return core_ids, usage
+
+
+def parse_proc_net_dev(content: str) -> Tuple[int, int]:
+    """
+    Parse ``/proc/<pid>/net/dev`` and return the total number of received and transmitted
+    bytes across all network interfaces of the network namespace except the loopback.
+    """
+    # example data:
+    #   Inter-|   Receive                                                |  Transmit
+    #    face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets ...
+    #       lo:     620       8    0    0    0     0          0         0      620       8 ...
+    #     eth0:   18733     144    0    0    0     0          0         0    11382     103 ...
+    net_rx_bytes = 0
+    net_tx_bytes = 0
+    for line in content.splitlines()[2:]:
+        iface, _, stats = line.partition(':')
+        if iface.strip() == 'lo':
+            continue
+        fields = stats.split()
+        net_rx_bytes += int(fields[0])
+        net_tx_bytes += int(fields[8])
+    return net_rx_bytes, net_tx_bytes
+
+
+@attr.s(auto_attribs=True, slots=True, frozen=True)
+class PressureStat:
+    """
+    The Pressure Stall Information (PSI) of a resource.
+    """
+    some_avg10: float  # percent
+    some_total: int    # microseconds
+    full_avg10: float  # percent
+    full_total: int    # microseconds
+
+
+def parse_pressure(content: str) -> PressureStat:
+    """
+    Parse a PSI file such as ``/proc/pressure/cpu`` and ``memory.pressure`` of cgroup v2.
+    The "full" line may be missing (e.g., the node-level CPU pressure in old kernels).
+    """
+    # example data:
+    #   some avg10=0.00 avg60=0.00 avg300=0.00 total=12345
+    #   full avg10=0.00 avg60=0.00 avg300=0.00 total=0
+    values: Dict[str, Tuple[float, int]] = {}
+    for line in content.splitlines():
+        kind, *fields = line.split()
+        avg10 = 0.0
+        total = 0
+        for field in fields:
+            key, _, value = field.partition('=')
+            if key == 'avg10':
+                avg10 = float(value)
+            elif key == 'total':
+                total = int(value)
+        values[kind] = (avg10, total)
+    some_avg10, some_total = values.get('some', (0.0, 0))
+    full_avg10, full_total = values.get('full', (0.0, 0))
+    return PressureStat(some_avg10, some_total, full_avg10, full_total)
+
+
+def read_pressure(path: Union[str, Path]) -> Optional[PressureStat]:
+    """
+    Read a PSI file, returning None if the kernel does not provide it.
+    """
+    try:
+        return parse_pressure(Path(path).read_text())
+    except (IOError, ValueError):
+        return None
+
+
+class CgroupFileCache:
+    """
+    Keeps the cgroup files of containers open and reads them using ``os.pread()`` at offset 0,
+    which makes the kernel regenerate the content without reopening the files on every sampling.
+
+    :meth:`read_text` performs blocking I/O and should be called in an executor thread,
+    while :meth:`invalidate` and :meth:`retain` may be called from the event loop.
+    The lock only guards the bookkeeping of the file descriptors, so the reads run in parallel,
+    and the files being read are closed after the reads finish.
+    """
+
+    read_size: Final = 65536
+
+    def __init__(self) -> None:
+        self._fds: Dict[str, Dict[Path, int]] = {}
+        self._num_readers: Dict[int, int] = {}
+        self._closing: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def read_text(self, container_id: str, path: Path) -> str:
+        """
+        Read the whole content of the given cgroup file of the container.
+        It raises :exc:`IOError` if the file is not readable.
+        """
+        fd = self._acquire(container_id, path)
+        failed = False
+        try:
+            chunks = []
+            offset = 0
+            while True:
+                chunk = os.pread(fd, self.read_size, offset)
+                chunks.append(chunk)
+                if len(chunk) < self.read_size:
+                    break
+                offset += len(chunk)
+        except OSError:
+            # The cgroup may have been removed. Reopen it in the next read.
+            failed = True
+            raise
+        finally:
+            self._release(container_id, path, fd, failed)
+        return b''.join(chunks).decode('ascii')
+
+    def invalidate(self, container_id: str) -> None:
+        """
+        Close the cached files of the given container (e.g., when it dies).
+        """
+        with self._lock:
+            for fd in self._fds.pop(container_id, {}).values():
+                self._close(fd)
+
+    def retain(self, container_ids: Iterable[str]) -> None:
+        """
+        Close the cached files of all containers except the given ones.
+        """
+        with self._lock:
+            for container_id in self._fds.keys() - set(container_ids):
+                for fd in self._fds.pop(container_id).values():
+                    self._close(fd)
+
+    def _acquire(self, container_id: str, path: Path) -> int:
+        with self._lock:
+            fd = self._fds.get(container_id, {}).get(path)
+            if fd is not None:
+                self._num_readers[fd] += 1
+                return fd
+        new_fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        with self._lock:
+            fd = self._fds.setdefault(container_id, {}).setdefault(path, new_fd)
+            self._num_readers[fd] = self._num_readers.get(fd, 0) + 1
+        if fd != new_fd:
+            # Another thread has opened the same file meanwhile.
+            os.close(new_fd)
+        return fd
+
+    def _release(self, container_id: str, path: Path, fd: int, discard: bool) -> None:
+        with self._lock:
+            fds = self._fds.get(container_id, {})
+            if discard and fds.get(path) == fd:
+                del fds[path]
+                self._closing.add(fd)
+            self._num_readers[fd] -= 1
+            if self._num_readers[fd] == 0 and fd in self._closing:
+                del self._num_readers[fd]
+                self._closing.discard(fd)
+                os.close(fd)
+
+    def _close(self, fd: int) -> None:
+        # Defer closing the files being read to avoid reading another file reusing the fd.
+        if self._num_readers[fd] > 0:
+            self._closing.add(fd)
+        else:
+            del self._num_readers[fd]
+            os.close(fd)
+
+
 async def read_tail(path: Path, nbytes: int) -> bytes:
     file_size = path.stat().st_size
 
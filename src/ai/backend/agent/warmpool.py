@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from collections import Counter
+from decimal import Decimal
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+)
+
+import attr
+
+from ai.backend.common.types import (
+    ClusterInfo,
+    KernelCreationConfig,
+    KernelId,
+)
+
+__all__ = (
+    'WarmPool',
+    'WarmPoolKey',
+    'get_warm_pool_key',
+)
+
+# Warm kernels are adopted by adjusting the limits of these slots only.
+_adjustable_slots = frozenset(['cpu', 'mem'])
+
+# The number of tracked keys per the number of keys to keep warm.
+_usage_history_ratio = 16
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class WarmPoolKey:
+    """
+    Identifies the kernels interchangeable with each other except their IDs and resource limits.
+    """
+    image: str
+    digest: str
+    cluster_hostname: str
+    environ: FrozenSet[Tuple[str, str]]
+    cpu_count: Optional[str]  # only when the image has core-count dependent env-vars
+
+
+def get_warm_pool_key(
+    kernel_config: KernelCreationConfig,
+    cluster_info: ClusterInfo,
+) -> Optional[WarmPoolKey]:
+    """
+    Return the warm pool key of the given kernel creation request, or None if the request
+    requires per-kernel setup which cannot be applied to already running containers,
+    such as vfolder mounts, bootstrap scripts, dotfiles, accelerators and cluster networking.
+    """
+    if cluster_info['size'] != 1 or cluster_info['network_name'] is not None:
+        return None
+    if cluster_info['ssh_keypair'] is not None:
+        return None
+    if kernel_config['mounts'] or kernel_config.get('bootstrap_script'):
+        return None
+    if kernel_config.get('preopen_ports') or kernel_config.get('resource_opts'):
+        return None
+    if any((kernel_config.get('internal_data') or {}).values()):
+        return None
+    for slot_name, amount in kernel_config['resource_slots'].items():
+        if slot_name not in _adjustable_slots and Decimal(amount) != 0:
+            return None
+    image_labels = kernel_config['image']['labels']
+    if image_labels.get('ai.backend.envs.corecount', ''):
+        cpu_count: Optional[str] = str(Decimal(kernel_config['resource_slots']['cpu']).normalize())
+    else:
+        cpu_count = None
+    return WarmPoolKey(
+        image=kernel_config['image']['canonical'],
+        digest=kernel_config['image']['digest'],
+        cluster_hostname=kernel_config['cluster_hostname'],
+        environ=frozenset(kernel_config['environ'].items()),
+        cpu_count=cpu_count,
+    )
+
+
+class WarmPool:
+    """
+    Keeps track of the pre-created and already booted kernels per warm pool key.
+
+    The keys of the most frequently requested kernels are kept filled with *size*
+    warm kernels each, using the latest creation request of each key as the template.
+    The agent implementation is responsible for creating, adopting and discarding
+    the actual containers.
+    """
+
+    size: int
+    max_keys: int
+
+    _usage: Counter[WarmPoolKey]
+    _templates: Dict[WarmPoolKey, Tuple[KernelCreationConfig, ClusterInfo]]
+    _ready: Dict[WarmPoolKey, List[Any]]
+    _warming: Dict[KernelId, WarmPoolKey]
+    _spawned: Dict[KernelId, Any]
+
+    def __init__(self, *, size: int = 0, max_keys: int = 1) -> None:
+        self.size = size
+        self.max_keys = max_keys
+        self._usage = Counter()
+        self._templates = {}
+        self._ready = {}
+        self._warming = {}
+        self._spawned = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def note_usage(
+        self,
+        key: WarmPoolKey,
+        kernel_config: KernelCreationConfig,
+        cluster_info: ClusterInfo,
+    ) -> None:
+        self._usage[key] += 1
+        self._templates[key] = (kernel_config, cluster_info)
+        if len(self._usage) > self.max_keys * _usage_history_ratio:
+            # Forget the rarely requested keys to bound the memory usage.
+            for stale_key, _ in self._usage.most_common()[len(self._usage) // 2:]:
+                if stale_key not in self._ready:
+                    del self._usage[stale_key]
+                    del self._templates[stale_key]
+
+    def claim(self, key: WarmPoolKey) -> Optional[Any]:
+        kernels = self._ready.get(key)
+        if not kernels:
+            return None
+        return kernels.pop()
+
+    def evict(self) -> Optional[Any]:
+        """
+        Take out a warm kernel of the least frequently used key.
+        """
+        for key in sorted(self._ready.keys(), key=lambda k: self._usage[k]):
+            if self._ready[key]:
+                return self._ready[key].pop()
+        return None
+
+    def remove(self, kernel_id: KernelId) -> Optional[Any]:
+        """
+        Take out the ready warm kernel with the given ID, if any.
+        """
+        for kernels in self._ready.values():
+            for idx, kernel_obj in enumerate(kernels):
+                if kernel_obj.kernel_id == kernel_id:
+                    return kernels.pop(idx)
+        return None
+
+    def drain(self) -> List[Any]:
+        kernels = [k for kernels in self._ready.values() for k in kernels]
+        self._ready.clear()
+        return kernels
+
+    def get_shortages(self) -> List[Tuple[WarmPoolKey, KernelCreationConfig, ClusterInfo]]:
+        """
+        Return the templates of the warm kernels to create to fill up the pool.
+        """
+        wanted_keys = [key for key, _ in self._usage.most_common(self.max_keys)]
+        shortages = []
+        for key in wanted_keys:
+            num_warming = sum(1 for k in self._warming.values() if k == key)
+            num_missing = self.size - len(self._ready.get(key, [])) - num_warming
+            kernel_config, cluster_info = self._templates[key]
+            shortages.extend([(key, kernel_config, cluster_info)] * max(num_missing, 0))
+        return shortages
+
+    def take_unwanted(self) -> List[Any]:
+        """
+        Take out the warm kernels of the keys which are no longer frequently used.
+        """
+        wanted_keys = {key for key, _ in self._usage.most_common(self.max_keys)}
+        kernels = []
+        for key in [*self._ready.keys()]:
+            if key not in wanted_keys:
+                kernels.extend(self._ready.pop(key))
+        return kernels
+
+    def begin_warming(self, kernel_id: KernelId, key: WarmPoolKey) -> None:
+        self._warming[kernel_id] = key
+
+    def set_spawned(self, kernel_id: KernelId, kernel_obj: Any) -> None:
+        # Keep track of the kernel before it finishes booting so that it could be discarded.
+        self._spawned[kernel_id] = kernel_obj
+
+    def finish_warming(self, kernel_id: KernelId, *, success: bool) -> Optional[Any]:
+        """
+        Make the warm kernel available for claims if *success* is set.
+        Returns the kernel object if it has been spawned.
+        """
+        key = self._warming.pop(kernel_id)
+        kernel_obj = self._spawned.pop(kernel_id, None)
+        if success and kernel_obj is not None:
+            self._ready.setdefault(key, []).append(kernel_obj)
+        return kernel_obj
+
+    def kernels(self) -> List[Any]:
+        """
+        Return all warm kernels holding resources, including those still booting.
+        """
+        return [
+            *(k for kernels in self._ready.values() for k in kernels),
+            *self._spawned.values(),
+        ]
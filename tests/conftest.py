@@ -24,19 +24,24 @@ def test_id():
 
 @pytest.fixture(scope='session', autouse=True)
 def test_agent_id(session_mocker, test_id):
-    registry_state_path = ipc_base_path / f'last_registry.{test_id}.dat'
-    try:
-        os.unlink(registry_state_path)
-    except FileNotFoundError:
-        pass
+    registry_state_paths = [
+        ipc_base_path / f'last_registry.{test_id}.dat',
+        ipc_base_path / f'registry.{test_id}.journal',
+    ]
+    for path in registry_state_paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
     mock_generate_agent_id = session_mocker.patch(
         'ai.backend.agent.agent.generate_agent_id')
     mock_generate_agent_id.return_value = test_id
     yield
-    try:
-        os.unlink(registry_state_path)
-    except FileNotFoundError:
-        pass
+    for path in registry_state_paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
 
 
 @pytest.fixture(scope='session')
@@ -0,0 +1,208 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+import uuid
+
+from aiodocker.containers import DockerContainer
+from aiodocker.exceptions import DockerError
+import pytest
+
+from ai.backend.agent.docker.agent import DockerAgent
+from ai.backend.agent.types import ContainerStatus, LifecycleEvent
+
+
+class FakeEventSubscriber:
+
+    def __init__(self, events):
+        self.events = list(events)
+
+    async def get(self):
+        if not self.events:
+            # Stop the monitoring loop after the connection is closed once.
+            raise asyncio.CancelledError
+        return self.events.pop(0)
+
+
+class FakeDockerEvents:
+
+    def __init__(self):
+        self.events = None
+
+    def subscribe(self, create_task=False):
+        # Deliver the queued events and then close the connection once.
+        if self.events is None:
+            return FakeEventSubscriber([])
+        subscriber = FakeEventSubscriber([*self.events, None])
+        self.events = None
+        return subscriber
+
+    async def stop(self):
+        pass
+
+
+class FakeDockerContainers:
+
+    def __init__(self, docker):
+        self.docker = docker
+        self.num_list_calls = 0
+
+    async def list(self):
+        self.num_list_calls += 1
+        return [
+            DockerContainer(self.docker, Id=cid, Names=['/' + info['Name']])
+            for cid, info in self.docker.daemon.items()
+        ]
+
+    async def get(self, cid):
+        return DockerContainer(self.docker, **(await self.docker._query_json(
+            f'containers/{cid}/json', method='GET')))
+
+
+class FakeDocker:
+    """
+    Serves the container list and inspection results from the *daemon* mapping
+    of container IDs to their names and states.
+    """
+
+    def __init__(self):
+        self.daemon = {}
+        self.containers = FakeDockerContainers(self)
+        self.events = FakeDockerEvents()
+
+    def add_container(self, name, status='running'):
+        cid = uuid.uuid4().hex
+        self.daemon[cid] = {'Name': name, 'Status': status}
+        return cid
+
+    async def _query_json(self, path, method='GET', params=None):
+        cid = path.split('/')[1]
+        if cid not in self.daemon:
+            raise DockerError(404, {'message': 'no such container'})
+        info = self.daemon[cid]
+        return {
+            'Id': cid,
+            'Name': '/' + info['Name'],
+            'State': {'Status': info['Status']},
+            'Config': {'Image': 'lablup/python:3.8', 'Labels': {}},
+            'NetworkSettings': {'Ports': {}},
+        }
+
+
+def make_event(action, cid, name):
+    return {
+        'Type': 'container',
+        'Action': action,
+        'Actor': {'ID': cid, 'Attributes': {'name': name, 'exitCode': '0'}},
+    }
+
+
+@pytest.fixture
+def cache_agent():
+    agent = DockerAgent.__new__(DockerAgent)
+    agent.docker = FakeDocker()
+    agent.local_config = {'debug': {'log-docker-events': False}}
+    agent.kernel_registry = {}
+    agent.image_index = MagicMock()
+    agent.stat_ctx = MagicMock()
+    agent.inject_container_lifecycle_event = AsyncMock()
+    agent.handle_warm_kernel_exit = AsyncMock()
+    agent._container_cache = {}
+    agent._container_cache_lock = asyncio.Lock()
+    agent._container_cache_reconciled_at = None
+    return agent
+
+
+def cached_statuses(agent):
+    return {
+        cid: (kernel_id, container.status)
+        for cid, (kernel_id, container) in agent._container_cache.items()
+    }
+
+
+@pytest.mark.asyncio
+async def test_container_cache_rebuilds(cache_agent):
+    docker = cache_agent.docker
+    kid1, kid2, kid3 = (uuid.uuid4() for _ in range(3))
+    cid1 = docker.add_container(f'kernel.python.{kid1}')
+    cid2 = docker.add_container(f'kernel.python.{kid2}', status='exited')
+    docker.add_container(f'warm.python.{uuid.uuid4()}')
+    docker.add_container('redis')
+
+    # the cache is built upon the first use.
+    assert [
+        (kernel_id, container.id) for kernel_id, container
+        in (await cache_agent.enumerate_containers())
+    ] == [(kid1, cid1)]
+    exited = await cache_agent.enumerate_containers(frozenset([ContainerStatus.EXITED]))
+    assert [(kernel_id, container.id) for kernel_id, container in exited] == [(kid2, cid2)]
+    assert docker.containers.num_list_calls == 1
+
+    # the containers created without events are found by the periodic rebuild.
+    cid3 = docker.add_container(f'kernel.python.{kid3}')
+    assert len(await cache_agent.enumerate_containers()) == 1
+    assert docker.containers.num_list_calls == 1
+    cache_agent._container_cache_reconciled_at = time.monotonic() - 61.0
+    containers = await cache_agent.enumerate_containers()
+    assert {container.id for _, container in containers} == {cid1, cid3}
+    assert docker.containers.num_list_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_container_cache_follows_events(cache_agent):
+    docker = cache_agent.docker
+    kid1, kid2 = uuid.uuid4(), uuid.uuid4()
+    name1, name2 = f'kernel.python.{kid1}', f'kernel.python.{kid2}'
+    cid1 = docker.add_container(name1)
+    await cache_agent.enumerate_containers()
+    assert docker.containers.num_list_calls == 1
+
+    # start, pause and unpause events update the cached containers.
+    cid2 = docker.add_container(name2)
+    docker.daemon[cid1]['Status'] = 'paused'
+    docker.events.events = [
+        make_event('start', cid2, name2),
+        make_event('pause', cid1, name1),
+    ]
+    await cache_agent.monitor_docker_events()
+    assert cached_statuses(cache_agent) == {
+        cid1: (kid1, 'paused'),
+        cid2: (kid2, 'running'),
+    }
+    docker.daemon[cid1]['Status'] = 'running'
+    docker.events.events = [make_event('unpause', cid1, name1)]
+    await cache_agent.monitor_docker_events()
+    assert cached_statuses(cache_agent)[cid1] == (kid1, 'running')
+
+    # die and destroy events remove the containers.
+    docker.daemon[cid2]['Status'] = 'exited'
+    docker.events.events = [
+        make_event('die', cid2, name2),
+        make_event('destroy', cid1, name1),
+    ]
+    await cache_agent.monitor_docker_events()
+    assert cached_statuses(cache_agent) == {}
+    # only the dead one is cleaned up.
+    (kernel_id, lifecycle_event, _), kwargs = \
+        cache_agent.inject_container_lifecycle_event.await_args
+    assert (kernel_id, lifecycle_event) == (kid2, LifecycleEvent.CLEAN)
+    assert kwargs['container_id'] == cid2
+    assert docker.containers.num_list_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_container_cache_invalidated_on_resubscription(cache_agent):
+    docker = cache_agent.docker
+    kid1, kid2 = uuid.uuid4(), uuid.uuid4()
+    docker.add_container(f'kernel.python.{kid1}')
+    await cache_agent.enumerate_containers()
+    assert cache_agent._container_cache_reconciled_at is not None
+
+    # the events may be missed until the event subscription restarts.
+    docker.add_container(f'kernel.python.{kid2}')
+    docker.events.events = []
+    await cache_agent.monitor_docker_events()
+    assert cache_agent._container_cache_reconciled_at is None
+    cache_agent.image_index.invalidate.assert_called()
+    containers = await cache_agent.enumerate_containers()
+    assert {kernel_id for kernel_id, _ in containers} == {kid1, kid2}
+    assert docker.containers.num_list_calls == 2
@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import struct
+
+import aiohttp
+from aiohttp.base_protocol import BaseProtocol
+import pytest
+
+from ai.backend.agent.docker.agent import DockerAgent
+
+
+def make_frame(stream_type, payload):
+    return struct.pack('>BxxxL', stream_type, len(payload)) + payload
+
+
+class FakeDocker:
+
+    def __init__(self, tty, log_data):
+        self.tty = tty
+        self.log_data = log_data
+        self.containers = SimpleNamespace(container=lambda cid: SimpleNamespace(show=self.show))
+
+    async def show(self):
+        return {'Config': {'Tty': self.tty}}
+
+    @asynccontextmanager
+    async def _query(self, path, method='GET', params=None, timeout=None):
+        loop = asyncio.get_running_loop()
+        reader = aiohttp.StreamReader(BaseProtocol(loop), 2 ** 16, loop=loop)
+        # Deliver the data in small pieces to split the frame headers as well.
+        for idx in range(0, len(self.log_data), 5):
+            reader.feed_data(self.log_data[idx:idx + 5])
+        reader.feed_eof()
+        yield SimpleNamespace(content=reader)
+
+
+def make_agent(docker, chunk_size=4):
+    agent = DockerAgent.__new__(DockerAgent)
+    agent.docker = docker
+    agent.local_config = {'agent': {'container-logs': {'chunk-size': chunk_size}}}
+    return agent
+
+
+async def collect_logs(agent):
+    return b''.join([
+        fragment async for fragment
+        in agent.iter_container_logs('c-1', follow=False)
+    ])
+
+
+@pytest.mark.asyncio
+async def test_iter_container_logs_tty():
+    log_data = b'hello\r\nworld\r\n'
+    agent = make_agent(FakeDocker(True, log_data))
+    assert (await collect_logs(agent)) == log_data
+
+
+@pytest.mark.asyncio
+async def test_iter_container_logs_without_tty():
+    log_data = (
+        make_frame(1, b'hello\n')
+        + make_frame(2, b'error: something went wrong\n')
+        + make_frame(1, b'')
+        + make_frame(1, b'bye\n')
+    )
+    agent = make_agent(FakeDocker(False, log_data))
+    assert (await collect_logs(agent)) == b'hello\nerror: something went wrong\nbye\n'
+
+    # a truncated trailing frame is yielded as much as received, without partial headers.
+    agent = make_agent(FakeDocker(False, log_data[:-2]))
+    assert (await collect_logs(agent)) == b'hello\nerror: something went wrong\nby'
+    agent = make_agent(FakeDocker(False, log_data + make_frame(1, b'more')[:6]))
+    assert (await collect_logs(agent)) == b'hello\nerror: something went wrong\nbye\n'
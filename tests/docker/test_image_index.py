@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+
+from aiodocker.exceptions import DockerError
+import pytest
+
+from ai.backend.common.docker import ImageRef
+from ai.backend.common.exception import ImageNotAvailable
+from ai.backend.agent.docker.agent import DockerAgent
+from ai.backend.agent.docker.images import ImageIndex, normalize_image_ref
+from ai.backend.agent.images import ImagePullCoordinator
+
+
+class FakeDockerImages:
+
+    def __init__(self, images):
+        self.images = images
+        self.num_list_calls = 0
+        self.inspected = []
+
+    async def list(self):
+        self.num_list_calls += 1
+        return [
+            {'Id': image_id, 'RepoTags': tags, 'Labels': labels}
+            for image_id, (tags, labels) in self.images.items()
+        ]
+
+    async def inspect(self, ref):
+        self.inspected.append(ref)
+        for image_id, (tags, labels) in self.images.items():
+            if ref == image_id or normalize_image_ref(ref) in tags:
+                return {'Id': image_id, 'RepoTags': tags, 'Config': {'Labels': labels}}
+        raise DockerError(404, {'message': 'no such image'})
+
+
+class FakeDockerContainers:
+
+    def __init__(self, docker):
+        self.docker = docker
+        self.created = []
+
+    async def create(self, config, name):
+        if not any(
+            normalize_image_ref(config['Image']) in tags
+            for tags, _ in self.docker.images.images.values()
+        ):
+            raise DockerError(404, {'message': 'no such image'})
+        self.created.append(name)
+        return SimpleNamespace(_id=f'c-{name}')
+
+
+class FakeDocker:
+
+    def __init__(self, images):
+        self.images = FakeDockerImages(images)
+        self.containers = FakeDockerContainers(self)
+
+
+kernel_labels = {'ai.backend.kernelspec': '1'}
+
+
+def test_normalize_image_ref():
+    assert normalize_image_ref('index.docker.io/lablup/python:3.8') == 'lablup/python:3.8'
+    assert normalize_image_ref('docker.io/library/python') == 'python:latest'
+    assert normalize_image_ref('cr.backend.ai/stable/python:3.8') == 'cr.backend.ai/stable/python:3.8'
+    assert normalize_image_ref('localhost:5000/python') == 'localhost:5000/python:latest'
+
+
+@pytest.mark.asyncio
+async def test_image_index_sync_and_events():
+    docker = FakeDocker({
+        'sha256:1': (['lablup/python:3.8'], kernel_labels),
+        'sha256:2': (['lablup/lua:5.3', 'lablup/lua:latest'], kernel_labels),
+        'sha256:3': (['<none>:<none>'], None),
+        'sha256:4': (['redis:latest'], {}),
+    })
+    index = ImageIndex(docker)
+    await index.ensure_synced()
+    await index.ensure_synced()
+    assert docker.images.num_list_calls == 1
+    assert docker.images.inspected == []
+    assert index.get_kernel_images() == {
+        'lablup/python:3.8': 'sha256:1',
+        'lablup/lua:5.3': 'sha256:2',
+        'lablup/lua:latest': 'sha256:2',
+    }
+    assert index.get_image_id('index.docker.io/lablup/python:3.8') == 'sha256:1'
+
+    # a newer version is pulled and takes over the tag.
+    docker.images.images['sha256:5'] = (['lablup/python:3.8'], kernel_labels)
+    docker.images.images['sha256:1'] = ([], kernel_labels)
+    await index.handle_event({
+        'Type': 'image', 'Action': 'pull', 'Actor': {'ID': 'lablup/python:3.8'},
+    })
+    assert index.get_image_id('lablup/python:3.8') == 'sha256:5'
+
+    docker.images.images['sha256:2'] = (['lablup/lua:5.3'], kernel_labels)
+    await index.handle_event({'Type': 'image', 'Action': 'untag', 'Actor': {'ID': 'sha256:2'}})
+    await index.handle_event({'Type': 'image', 'Action': 'delete', 'Actor': {'ID': 'sha256:1'}})
+    assert index.get_kernel_images() == {
+        'lablup/python:3.8': 'sha256:5',
+        'lablup/lua:5.3': 'sha256:2',
+    }
+
+    # an unknown image is looked up on demand.
+    assert (await index.refresh('lablup/missing:latest')) is None
+    index.invalidate()
+    await index.ensure_synced()
+    assert docker.images.num_list_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_image_rechecked_upon_container_creation():
+    docker = FakeDocker({'sha256:1': (['lablup/python:3.8'], kernel_labels)})
+    agent = DockerAgent.__new__(DockerAgent)
+    agent.docker = docker
+    agent.image_index = ImageIndex(docker)
+    agent.image_pulls = ImagePullCoordinator(max_concurrency=1)
+    pulled = []
+
+    async def pull_image(image_ref, registry_conf, *, progress_cb=None):
+        pulled.append(image_ref.canonical)
+        docker.images.images['sha256:2'] = (['lablup/python:3.8'], kernel_labels)
+
+    agent.pull_image = pull_image
+    await agent.image_index.ensure_synced()
+    image_ref = ImageRef('index.docker.io/lablup/python:3.8', ['index.docker.io'])
+    ctx = SimpleNamespace(image_ref=image_ref, kernel_config={
+        'image': {'digest': 'sha256:1', 'registry': {}},
+        'auto_pull': 'digest',
+    })
+    config = {'Image': image_ref.canonical}
+
+    # the image is removed after the index is synced, without its deletion event.
+    del docker.images.images['sha256:1']
+    container = await agent._create_container(ctx, config, 'kernel.python.k1')
+    assert container._id == 'c-kernel.python.k1'
+    assert pulled == [image_ref.canonical]
+
+    # the image is not pulled again if auto-pull is disabled.
+    docker.images.images.clear()
+    ctx.kernel_config['auto_pull'] = 'none'
+    with pytest.raises(ImageNotAvailable):
+        await agent._create_container(ctx, config, 'kernel.python.k2')
+    assert pulled == [image_ref.canonical]
+    assert docker.containers.created == ['kernel.python.k1']
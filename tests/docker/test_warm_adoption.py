@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import uuid
+
+from aiodocker.exceptions import DockerError
+import pytest
+
+from ai.backend.agent.docker.agent import DockerAgent
+
+
+class FakeContainer:
+
+    def __init__(self, docker, cid):
+        self.docker = docker
+        self._id = cid
+
+    async def show(self):
+        return {'Id': self._id, 'State': {'Running': self.docker.running}}
+
+    async def rename(self, name):
+        if self.docker.rename_error is not None:
+            raise self.docker.rename_error
+        self.docker.names[self._id] = name
+
+
+class FakeDocker:
+
+    def __init__(self):
+        self.running = True
+        self.rename_error = None
+        self.names = {}
+        self.updates = []
+        self.containers = SimpleNamespace(container=lambda cid: FakeContainer(self, cid))
+
+    async def _query_json(self, path, method='GET', data=None):
+        self.updates.append((path, method, data))
+
+
+class FakeWarmKernel:
+
+    def __init__(self, kernel_id, container_id):
+        self.kernel_id = kernel_id
+        self.runner = SimpleNamespace(kernel_id=kernel_id)
+        self.resource_spec = None
+        self.data = {'container_id': container_id}
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+
+@pytest.fixture
+def adoption(tmp_path):
+    agent = DockerAgent.__new__(DockerAgent)
+    agent.docker = FakeDocker()
+    agent.local_config = {'container': {'scratch-root': tmp_path}}
+    cpu_plugin = SimpleNamespace(generate_docker_args=AsyncMock(return_value={
+        'HostConfig': {'CpuPeriod': 100000, 'CpuQuota': 200000, 'Devices': []},
+    }))
+    mem_plugin = SimpleNamespace(generate_docker_args=AsyncMock(return_value={
+        'HostConfig': {'Memory': 1073741824, 'MemorySwap': 1073741824},
+    }))
+    agent.computers = {
+        'cpu': SimpleNamespace(instance=cpu_plugin),
+        'mem': SimpleNamespace(instance=mem_plugin),
+    }
+    agent._write_resource_spec = AsyncMock()
+    agent._update_container_cache = AsyncMock()
+    agent.discard_warm_kernel = AsyncMock()
+
+    warm_kernel_id, kernel_id = uuid.uuid4(), uuid.uuid4()
+    (tmp_path / str(warm_kernel_id) / 'work').mkdir(parents=True)
+    (tmp_path / str(warm_kernel_id) / 'work' / '.bashrc').write_text('# warm\n')
+    warm_kernel = FakeWarmKernel(warm_kernel_id, 'c-warm')
+    ctx = SimpleNamespace(
+        kernel_id=kernel_id,
+        scratch_dir=tmp_path / str(kernel_id),
+        image_ref=SimpleNamespace(name='lablup/python'),
+    )
+    resource_spec = SimpleNamespace(
+        allocations={'cpu': {'cpu': {'0': 2}}, 'mem': {'mem': {'root': 1073741824}}},
+        container_id=None,
+    )
+    return agent, ctx, warm_kernel, resource_spec
+
+
+@pytest.mark.asyncio
+async def test_adopt_warm_kernel(adoption):
+    agent, ctx, warm_kernel, resource_spec = adoption
+    warm_scratch_dir = ctx.scratch_dir.parent / str(warm_kernel.kernel_id)
+    kernel_obj = await agent.create_kernel__adopt_warm_kernel(ctx, warm_kernel, resource_spec)
+
+    # only the resource limits changeable for running containers are updated.
+    assert agent.docker.updates == [('containers/c-warm/update', 'POST', {
+        'CpuPeriod': 100000, 'CpuQuota': 200000,
+        'Memory': 1073741824, 'MemorySwap': 1073741824,
+    })]
+    assert not warm_scratch_dir.exists()
+    assert (ctx.scratch_dir / 'work' / '.bashrc').read_text() == '# warm\n'
+    assert agent.docker.names == {'c-warm': f'kernel.python.{ctx.kernel_id}'}
+    assert kernel_obj is warm_kernel
+    assert kernel_obj.kernel_id == ctx.kernel_id
+    assert kernel_obj.runner.kernel_id == ctx.kernel_id
+    assert kernel_obj.resource_spec is resource_spec
+    assert resource_spec.container_id == 'c-warm'
+    agent._update_container_cache.assert_awaited_once_with(ctx.kernel_id, 'c-warm')
+    agent.discard_warm_kernel.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_adopt_warm_kernel_failures(adoption):
+    agent, ctx, warm_kernel, resource_spec = adoption
+    warm_scratch_dir = ctx.scratch_dir.parent / str(warm_kernel.kernel_id)
+
+    # the renamed scratch directory is removed when the container rename fails.
+    agent.docker.rename_error = DockerError(409, {'message': 'name conflict'})
+    with pytest.raises(DockerError):
+        await agent.create_kernel__adopt_warm_kernel(ctx, warm_kernel, resource_spec)
+    agent.discard_warm_kernel.assert_awaited_once_with(warm_kernel)
+    assert not ctx.scratch_dir.exists()
+    assert not warm_scratch_dir.exists()
+    assert warm_kernel.kernel_id != ctx.kernel_id
+    agent._update_container_cache.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_adopt_stopped_warm_kernel(adoption):
+    agent, ctx, warm_kernel, resource_spec = adoption
+    agent.docker.running = False
+    with pytest.raises(RuntimeError):
+        await agent.create_kernel__adopt_warm_kernel(ctx, warm_kernel, resource_spec)
+    assert agent.docker.updates == []
+    assert agent.docker.names == {}
+    agent.discard_warm_kernel.assert_awaited_once_with(warm_kernel)
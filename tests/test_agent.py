@@ -2,10 +2,14 @@
 TODO: rewrite
 '''
 
+import asyncio
+
 import pytest
 
 from unittest.mock import AsyncMock
 
+from ai.backend.common.types import HostPortPair
+from ai.backend.agent.agent import AbstractAgent
 from ai.backend.agent.server import AgentRPCServer
 
 
@@ -62,3 +66,161 @@ async def test_read_agent_config_container_2valid(arpcs_no_ainit, mocker):
 
     assert arpcs_no_ainit.local_config[ctnr][kgid] == 10
     assert arpcs_no_ainit.local_config[ctnr][kuid] == 20
+
+
+class DummyCreationContext:
+
+    def __init__(self):
+        self.kernel_id = 'k1'
+        self.cancellation_handlers = []
+
+
+def make_dummy_creating_agent(events, failing_step=None):
+    agent = Dummy()
+
+    def make_step(name, delay):
+        async def step(*args):
+            events.append(f'{name}-begin')
+            await asyncio.sleep(delay)
+            if name == failing_step:
+                raise ValueError(name)
+            events.append(f'{name}-end')
+        return step
+
+    agent.create_kernel__prepare_scratch = make_step('scratch', 0.05)
+    agent.create_kernel__install_ssh_keypair = make_step('keypair', 0)
+    agent.create_kernel__apply_network = make_step('network', 0.01)
+    agent._create_kernel__mount_krunner = make_step('krunner', 0.02)
+
+    async def get_attached_devices(resource_spec):
+        return {'cpu': []}
+
+    agent._get_attached_devices = get_attached_devices
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_create_kernel_prepare_runs_independent_steps_concurrently():
+    events = []
+    agent = make_dummy_creating_agent(events)
+    attached_devices = await AbstractAgent._create_kernel__prepare(
+        agent, DummyCreationContext(), None, {}, {},
+    )
+    assert attached_devices == {'cpu': []}
+    assert events[:3] == ['scratch-begin', 'network-begin', 'krunner-begin']
+    # the keypair is written after the scratch directories are ready.
+    assert events.index('keypair-begin') > events.index('scratch-end')
+
+
+@pytest.mark.asyncio
+async def test_create_kernel_prepare_failure_and_rollback():
+    events = []
+    agent = make_dummy_creating_agent(events, failing_step='krunner')
+    with pytest.raises(ValueError):
+        await AbstractAgent._create_kernel__prepare(
+            agent, DummyCreationContext(), None, {}, {},
+        )
+    # the slower sibling steps are cancelled.
+    assert 'scratch-end' not in events
+
+    ctx = DummyCreationContext()
+
+    async def failing_handler():
+        events.append('rollback-1')
+        raise RuntimeError('oops')
+
+    async def handler():
+        events.append('rollback-2')
+
+    ctx.cancellation_handlers.extend([failing_handler, handler])
+    agent.free_resource_spec = AsyncMock()
+    await AbstractAgent._create_kernel__rollback(agent, ctx, 'resource-spec')
+    assert events[-2:] == ['rollback-2', 'rollback-1']
+    agent.free_resource_spec.assert_awaited_once_with('resource-spec')
+
+
+class DummyComputer:
+
+    slot_types = [('cpu', 'count')]
+
+    def __init__(self):
+        self.num_extra_info_calls = 0
+
+    def get_version(self):
+        return '1.0'
+
+    async def extra_info(self):
+        self.num_extra_info_calls += 1
+        return {'driver': 'dummy'}
+
+
+def make_dummy_heartbeating_agent(heartbeat_mode):
+    agent = Dummy()
+    agent.local_config = {
+        'agent': {
+            'rpc-listen-addr': HostPortPair('127.0.0.1', 6001),
+            'region': None,
+            'scaling-group': 'default',
+            'heartbeat-mode': heartbeat_mode,
+        },
+    }
+    agent.computer = DummyComputer()
+    agent.computers = {'cpu': Dummy()}
+    agent.computers['cpu'].instance = agent.computer
+    agent.slots = {'cpu': 4}
+    agent.images = {}
+    agent._images_sent_digest = None
+    agent._full_heartbeat_requested = False
+    agent._compute_plugins_info = None
+    agent._compute_plugins_info_updated_at = 0.0
+    agent.produce_event = AsyncMock()
+    agent.error_monitor = AsyncMock()
+    for name in ('_update_images', '_pack_images', '_get_compute_plugins_info', 'heartbeat'):
+        setattr(agent, name, getattr(AbstractAgent, name).__get__(agent))
+    agent._pack_images()
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_digest_mode():
+    agent = make_dummy_heartbeating_agent('digest')
+    agent._update_images({'lablup/python:3.8': 'sha256:1', 'lablup/lua:5.3': 'sha256:2'})
+    blob = agent._images_blob
+    digest = agent._images_digest
+    sent_infos = []
+
+    async def heartbeat():
+        await agent.heartbeat(3.0)
+        sent_infos.append(agent.produce_event.await_args[0][1])
+
+    await heartbeat()
+    await heartbeat()
+    assert sent_infos[0]['images'] is blob
+    assert 'images' not in sent_infos[1]
+    assert sent_infos[0]['images_digest'] == sent_infos[1]['images_digest'] == digest
+    assert agent.computer.num_extra_info_calls == 1
+
+    # the same images in a different order do not rebuild the blob.
+    agent._update_images({'lablup/lua:5.3': 'sha256:2', 'lablup/python:3.8': 'sha256:1'})
+    assert agent._images_blob is blob
+
+    agent._update_images({'lablup/python:3.8': 'sha256:1'})
+    await heartbeat()
+    assert sent_infos[2]['images_digest'] != digest
+    assert 'images' in sent_infos[2]
+
+    agent._full_heartbeat_requested = True
+    await heartbeat()
+    await heartbeat()
+    assert 'images' in sent_infos[3]
+    assert 'images' not in sent_infos[4]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_full_mode():
+    agent = make_dummy_heartbeating_agent('full')
+    for _ in range(2):
+        await agent.heartbeat(3.0)
+        agent_info = agent.produce_event.await_args[0][1]
+        assert agent_info['images'] == agent._images_blob
+        assert agent_info['compute_plugins'] == {'cpu': {'version': '1.0', 'driver': 'dummy'}}
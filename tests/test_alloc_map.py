@@ -9,6 +9,7 @@ from ai.backend.agent.resources import (
     DeviceSlotInfo,
     DiscretePropertyAllocMap,
     FractionAllocMap, FractionAllocationStrategy,
+    diff_allocations,
 )
 from ai.backend.agent.exception import (
     InsufficientResource,
@@ -691,3 +692,28 @@ def test_heterogeneous_resource_slots_with_fractional_alloc_map():
     alloc_map.free(result1)
     alloc_map.free(result2)
     check_clean()
+
+
+def test_free_and_diff_allocations():
+    alloc_map = DiscretePropertyAllocMap(
+        device_slots={
+            DeviceId('a0'): DeviceSlotInfo(SlotTypes.COUNT, SlotName('x'), Decimal(4)),
+            DeviceId('a1'): DeviceSlotInfo(SlotTypes.COUNT, SlotName('x'), Decimal(4)),
+        },
+    )
+    first = alloc_map.allocate({SlotName('x'): Decimal(3)})
+    second = alloc_map.allocate({SlotName('x'): Decimal(2)})
+
+    rebuilt = DiscretePropertyAllocMap(device_slots=alloc_map.device_slots)
+    rebuilt.apply_allocation(second)
+    alloc_map.free(first)
+    assert diff_allocations(alloc_map.allocations, rebuilt.allocations) == []
+
+    # a leaked allocation is reported per device.
+    rebuilt.free(second)
+    mismatches = diff_allocations(alloc_map.allocations, rebuilt.allocations)
+    assert mismatches == [
+        (SlotName('x'), device_id, amount, Decimal(0))
+        for device_id, amount in sorted(second[SlotName('x')].items())
+        if amount != 0
+    ]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from ai.backend.agent.events import EventBatchProducer
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+        self.spool_flags = []
+
+    async def send(self, encoded_events, spool):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError('redis is down')
+        self.batches.append(list(encoded_events))
+        self.spool_flags.append(spool)
+
+
+@pytest.mark.asyncio
+async def test_events_are_sent_in_batches_in_order():
+    redis = FakeRedis()
+    producer = EventBatchProducer(redis.send, max_batch_size=4, max_delay=0.01)
+    producer.start()
+    events = [f'ev{idx}'.encode() for idx in range(10)]
+    await asyncio.gather(*[producer.produce(ev) for ev in events])
+    assert [ev for batch in redis.batches for ev in batch] == events
+    assert max(len(batch) for batch in redis.batches) == 4
+    assert len(redis.batches) < len(events)
+
+    # the remaining events are sent upon closing.
+    for ev in (b'a', b'b', b'c'):
+        await producer.produce(ev, wait=False)
+    await producer.close()
+    assert redis.batches[-1] == [b'a', b'b', b'c']
+    with pytest.raises(RuntimeError):
+        await producer.produce(b'd')
+
+
+@pytest.mark.asyncio
+async def test_event_delivery_errors():
+    redis = FakeRedis()
+    producer = EventBatchProducer(redis.send, max_delay=0.01)
+    producer.start()
+    redis.fail = True
+    results = await asyncio.gather(
+        producer.produce(b'ev1'),
+        producer.produce(b'ev2', wait=False),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], ConnectionError)
+    assert results[1] is None
+    redis.fail = False
+    await producer.produce(b'ev3')
+    assert redis.batches == [[b'ev3']]
+    await producer.close()
+
+
+@pytest.mark.asyncio
+async def test_events_are_batched_by_spool_flag():
+    redis = FakeRedis()
+    producer = EventBatchProducer(redis.send, max_delay=0.01)
+    producer.start()
+    await asyncio.gather(
+        producer.produce(b'ev1'),
+        producer.produce(b'hb1', spool=False),
+        producer.produce(b'hb2', spool=False),
+        producer.produce(b'ev2'),
+    )
+    await producer.close()
+    assert redis.batches == [[b'ev1'], [b'hb1', b'hb2'], [b'ev2']]
+    assert redis.spool_flags == [True, False, True]
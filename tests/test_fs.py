@@ -0,0 +1,130 @@
+import os
+import time
+
+from ai.backend.agent.fs import ScratchSizeTracker, ScratchSkeleton
+
+
+def _age_dirs(root, age=3600):
+    # Make the directory mtimes old enough to be trusted by the tracker.
+    past = time.time() - age
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (past, past))
+
+
+def test_scratch_size_tracker(tmp_path):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'a' / 'b').mkdir()
+    (tmp_path / 'x.txt').write_bytes(b'x' * 100)
+    (tmp_path / 'a' / 'y.txt').write_bytes(b'y' * 20)
+    (tmp_path / 'a' / 'b' / 'z.txt').write_bytes(b'z' * 3)
+    os.symlink('x.txt', tmp_path / 'link')
+    link_size = os.lstat(tmp_path / 'link').st_size
+    _age_dirs(tmp_path)
+
+    tracker = ScratchSizeTracker(tmp_path)
+    assert tracker.refresh() == 123 + link_size
+
+    # new and deleted entries change the directory mtime.
+    (tmp_path / 'a' / 'b' / 'w.txt').write_bytes(b'w' * 1000)
+    assert tracker.refresh() == 1123 + link_size
+    (tmp_path / 'a' / 'y.txt').unlink()
+    assert tracker.refresh() == 1103 + link_size
+    _age_dirs(tmp_path)
+    assert tracker.refresh() == 1103 + link_size
+
+    # in-place modifications are caught after the rescan interval.
+    (tmp_path / 'x.txt').write_bytes(b'x' * 200)
+    assert tracker.refresh() == 1103 + link_size
+    tracker.rescan_interval = 0
+    assert tracker.refresh() == 1203 + link_size
+
+
+def test_scratch_size_tracker_recently_modified(tmp_path):
+    tracker = ScratchSizeTracker(tmp_path)
+    assert tracker.refresh() == 0
+    # Even when the mtime does not change due to the coarse timestamp granularity,
+    # recently modified directories are re-listed.
+    mtime_ns = os.stat(tmp_path).st_mtime_ns
+    (tmp_path / 'x.txt').write_bytes(b'x' * 10)
+    os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+    assert tracker.refresh() == 10
+
+
+def test_scratch_size_tracker_budget(tmp_path):
+    for idx in range(3):
+        subdir = tmp_path / f'd{idx}'
+        subdir.mkdir()
+        for fidx in range(4):
+            (subdir / f'{fidx}.dat').write_bytes(b'.' * 10)
+    _age_dirs(tmp_path)
+
+    tracker = ScratchSizeTracker(tmp_path, stat_budget=5)
+    sizes = [tracker.refresh() for _ in range(4)]
+    # the tree is scanned over multiple refreshes and the reported size never goes backward.
+    assert sizes == sorted(sizes)
+    assert sizes[0] < 120
+    assert sizes[-1] == 120
+
+
+def test_scratch_size_tracker_budget_covers_directory_stats(tmp_path, monkeypatch):
+    for idx in range(20):
+        (tmp_path / f'd{idx}').mkdir()
+    (tmp_path / 'd0' / 'x.dat').write_bytes(b'.' * 10)
+    _age_dirs(tmp_path)
+    tracker = ScratchSizeTracker(tmp_path, stat_budget=100)
+    assert tracker.refresh() == 10
+
+    # the walk over the already cached tree continues across refreshes.
+    num_stats = []
+    orig_stat = os.stat
+
+    def counting_stat(*args, **kwargs):
+        num_stats[-1] += 1
+        return orig_stat(*args, **kwargs)
+
+    monkeypatch.setattr(os, 'stat', counting_stat)
+    tracker.stat_budget = 5
+    sizes = []
+    for _ in range(5):
+        num_stats.append(0)
+        sizes.append(tracker.refresh())
+    assert max(num_stats) <= 5
+    assert sizes == [10] * 5
+
+
+def test_scratch_size_tracker_missing_root(tmp_path):
+    tracker = ScratchSizeTracker(tmp_path / 'nonexistent')
+    assert tracker.refresh() == 0
+
+
+def test_scratch_skeleton(tmp_path):
+    src = tmp_path / 'src'
+    src.mkdir()
+    (src / 'bashrc').write_bytes(b'export PS1="$ "\n')
+    (src / 'custom.css').write_bytes(b'body {}\n' * 1000)
+    os.chmod(src / 'custom.css', 0o664)
+    skeleton = ScratchSkeleton(tmp_path / '.skeleton', {
+        '.bashrc': src / 'bashrc',
+        '.jupyter/custom/custom.css': src / 'custom.css',
+    })
+    skeleton.build()
+    skeleton.build()  # rebuilding replaces the previous one
+    # the parent directories come before their children (e.g., to chown them in order).
+    assert skeleton.paths == [
+        '.jupyter', '.jupyter/custom', '.bashrc', '.jupyter/custom/custom.css',
+    ]
+
+    work_dirs = [tmp_path / 'k1' / 'work', tmp_path / 'k2' / 'work']
+    for work_dir in work_dirs:
+        work_dir.mkdir(parents=True)
+        skeleton.instantiate(work_dir)
+        assert (work_dir / '.bashrc').read_bytes() == b'export PS1="$ "\n'
+        assert (work_dir / '.jupyter' / 'custom' / 'custom.css').read_bytes() == b'body {}\n' * 1000
+        assert os.stat(work_dir / '.jupyter' / 'custom' / 'custom.css').st_mode & 0o777 == 0o664
+
+    # the instances do not share the contents with the skeleton and each other.
+    with open(work_dirs[0] / '.bashrc', 'ab') as f:
+        f.write(b'alias ll="ls -l"\n')
+    assert (tmp_path / '.skeleton' / '.bashrc').read_bytes() == b'export PS1="$ "\n'
+    assert (work_dirs[1] / '.bashrc').read_bytes() == b'export PS1="$ "\n'
+    assert os.stat(work_dirs[0] / '.bashrc').st_ino != os.stat(work_dirs[1] / '.bashrc').st_ino
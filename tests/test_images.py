@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from ai.backend.common.docker import ImageRef
+from ai.backend.agent.images import ImagePullCoordinator, ImagePullProgress
+
+
+class FakeRegistry:
+    """
+    A local registry stand-in which serves each image as two layers.
+    """
+
+    def __init__(self):
+        self.pulled = []
+        self.active = 0
+        self.max_active = 0
+        self.gate = asyncio.Event()
+
+    def puller(self, image_ref, *, fail=False):
+        async def pull(progress_cb):
+            self.pulled.append(image_ref.canonical)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                progress = ImagePullProgress(image_ref.canonical)
+                progress.update_layer('layer1', 50, 100)
+                progress.update_layer('layer2', 0, 200)
+                await progress_cb(progress)
+                await self.gate.wait()
+                if fail:
+                    raise RuntimeError('registry error')
+                progress.complete_layer('layer1')
+                progress.complete_layer('layer2')
+            finally:
+                self.active -= 1
+        return pull
+
+
+def make_ref(name):
+    return ImageRef(f'index.docker.io/lablup/{name}:latest', ['index.docker.io'])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_pulls_of_same_image_are_coalesced():
+    registry = FakeRegistry()
+    coordinator = ImagePullCoordinator(max_concurrency=2, progress_interval=0)
+    image_ref = make_ref('python')
+    reports = [[], []]
+
+    def reporter(idx):
+        async def report(progress):
+            reports[idx].append(progress.to_serializable_dict())
+        return report
+
+    tasks = [
+        asyncio.create_task(coordinator.pull(
+            image_ref, registry.puller(image_ref), progress_cb=reporter(idx),
+        ))
+        for idx in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    registry.gate.set()
+    await asyncio.gather(*tasks)
+    assert registry.pulled == [image_ref.canonical]
+    # both requesters receive the progress of the shared pull.
+    assert reports[0] == reports[1] == [
+        {'current': 50, 'total': 300, 'layers': 2, 'completed_layers': 0},
+    ]
+
+    # a later request pulls again.
+    await coordinator.pull(image_ref, registry.puller(image_ref))
+    assert registry.pulled == [image_ref.canonical] * 2
+
+
+@pytest.mark.asyncio
+async def test_pull_concurrency_limit_and_errors():
+    registry = FakeRegistry()
+    coordinator = ImagePullCoordinator(max_concurrency=2)
+    refs = [make_ref(f'image{idx}') for idx in range(4)]
+    tasks = [
+        asyncio.create_task(coordinator.pull(
+            ref, registry.puller(ref, fail=(idx == 0)),
+        ))
+        for idx, ref in enumerate(refs)
+    ]
+    await asyncio.sleep(0.01)
+    assert registry.active == 2
+    registry.gate.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [None, None, None]
+    assert registry.max_active == 2
+
+    # cancelling a requester does not cancel the shared pull.
+    registry.gate.clear()
+    first = asyncio.create_task(coordinator.pull(refs[0], registry.puller(refs[0])))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(coordinator.pull(refs[0], registry.puller(refs[0])))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    registry.gate.set()
+    await second
+    assert registry.pulled.count(refs[0].canonical) == 2
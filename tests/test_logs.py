@@ -0,0 +1,286 @@
+import asyncio
+
+import pytest
+
+from ai.backend.agent.agent import AbstractAgent
+from ai.backend.agent.logs import (
+    ContainerLogReader,
+    LogChunkIndexEntry,
+    LogChunker,
+    LogChunkWriter,
+    LogFollower,
+)
+
+
+def test_log_chunker():
+    chunker = LogChunker(4)
+    assert chunker.feed(b'ab') == []
+    assert chunker.feed(b'cdefghijk') == [b'abcd', b'efgh']
+    assert chunker.feed(b'') == []
+    assert chunker.flush() == b'ijk'
+    assert chunker.flush() is None
+    # an aligned fragment is passed through without copies.
+    aligned = b'lmno'
+    assert chunker.feed(aligned)[0] is aligned
+    assert chunker.feed(b'pqrstuvwxyz') == [b'pqrs', b'tuvw']
+    assert chunker.feed(b'0') == [b'xyz0']
+    assert chunker.flush() is None
+
+
+class Dummy:
+    pass
+
+
+class FakeRedis:
+    """
+    An in-memory stand-in of the Redis lists used to store the container logs.
+    """
+
+    def __init__(self):
+        self.lists = {}
+        self.expires = {}
+        self.commands = []
+        self.before_transaction = None
+
+    async def execute(self, commands):
+        for command, args in commands:
+            self.commands.append((command, args[0]))
+            getattr(self, f'_{command}')(*args)
+
+    def _rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    def _ltrim(self, key, start, stop):
+        self.lists[key] = self.lists.get(key, [])[start:(stop + 1) or None]
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.lists.pop(key, None)
+
+    def _expire(self, key, seconds):
+        self.expires[key] = seconds
+
+    async def lrange(self, key, start, stop):
+        return self.lists.get(key, [])[start:(stop + 1) or None]
+
+    async def exists(self, key):
+        return int(key in self.lists)
+
+    def multi_exec(self):
+        return FakeTransaction(self)
+
+
+class FakeTransaction:
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    def lrange(self, *args):
+        self.queued.append(self.redis.lrange(*args))
+
+    async def execute(self):
+        # Let the tests interleave writes between the reads of the reader.
+        if self.redis.before_transaction is not None:
+            commands, self.redis.before_transaction = self.redis.before_transaction, None
+            await self.redis.execute(commands)
+        return [await aw for aw in self.queued]
+
+
+def make_dummy_logging_agent(redis, events, log_stream, compression='none', max_followers=4):
+    agent = Dummy()
+    agent.local_config = {'agent': {'container-logs': {
+        'chunk-size': 4, 'max-length': 16, 'follow': True, 'follow-rate-limit': 0,
+        'max-followers': max_followers,
+        'compression': compression,
+    }}}
+    agent._log_followers = {}
+    agent.redis_producer_pool = redis
+    agent.redis_spool = Dummy()
+    agent.redis_spool.is_empty = True
+
+    async def produce_event(*args):
+        events.append(args)
+
+    async def iter_container_logs(container_id, *, follow):
+        async for fragment in log_stream():
+            yield fragment
+
+    agent.write_redis = redis.execute
+    agent.produce_event = produce_event
+    agent.iter_container_logs = iter_container_logs
+    for name in (
+        '_store_logs', '_start_log_follower', '_are_followed_logs_kept', 'read_container_logs',
+    ):
+        setattr(agent, name, getattr(AbstractAgent, name).__get__(agent))
+    return agent
+
+
+async def numbered_log_stream():
+    for idx in range(100):
+        yield b'%03d\n' % idx
+    yield b'end'
+
+
+numbered_log = b''.join(b'%03d\n' % idx for idx in range(100)) + b'end'
+
+
+@pytest.mark.asyncio
+async def test_collect_logs_in_batches():
+    redis = FakeRedis()
+    events = []
+    agent = make_dummy_logging_agent(redis, events, numbered_log_stream, compression='snappy')
+    await AbstractAgent.collect_logs(agent, 'k1', 'c1')
+    assert redis.commands[0] == ('delete', 'containerlog.c1')
+    assert redis.commands.count(('rpush', 'containerlog.c1')) == 7
+    stored_chunks = redis.lists['containerlog.c1']
+    assert len(stored_chunks) == len(redis.lists['containerlog.c1.index']) == 101
+    assert b''.join(stored_chunks) != numbered_log  # compressed
+    assert redis.expires == {'containerlog.c1': 3600.0, 'containerlog.c1.index': 3600.0}
+    assert events == [('kernel_log', 'k1', 'c1')]
+
+    # the parts of the log are read without decompressing everything.
+    assert await agent.read_container_logs('c1') == numbered_log
+    assert await agent.read_container_logs('c1', start=10, end=30) == numbered_log[10:30]
+    assert await agent.read_container_logs('c1', start=398) == b'9\nend'
+    assert await agent.read_container_logs('c1', tail_lines=3) == b'098\n099\nend'
+    assert await agent.read_container_logs('c1', tail_lines=0) == b''
+
+
+@pytest.mark.asyncio
+async def test_read_container_logs_by_period():
+    redis = FakeRedis()
+    writer = LogChunkWriter('c1', compress=False)
+    for idx in range(5):
+        await redis.execute(writer.store([b'%03d\n' % idx]))
+    # let each chunk be stored at 100, 110, 120, ... seconds.
+    redis.lists['containerlog.c1.index'] = [
+        LogChunkIndexEntry(idx * 4, 4, 100.0 + idx * 10, False).pack()
+        for idx in range(5)
+    ]
+    reader = ContainerLogReader(redis, 'c1')
+    assert await reader.read_period(115.0, 125.0) == b'002\n003\n'
+    assert await reader.read_period(0.0, 100.0) == b'000\n001\n'
+    assert await reader.read_period(141.0) == b''
+
+
+@pytest.mark.asyncio
+async def test_read_container_logs_trimmed_while_reading():
+    redis = FakeRedis()
+    writer = LogChunkWriter('c1', compress=True, max_chunks=4)
+    await redis.execute(writer.store([b'%03d\n' % idx for idx in range(4)]))
+    reader = ContainerLogReader(redis, 'c1')
+
+    # the chunks are trimmed after the reader has loaded the index.
+    redis.before_transaction = writer.store([b'004\n', b'005\n'])
+    assert await reader.read_range(0, 12) == b'002\n'
+    redis.before_transaction = writer.store([b'006\n'])
+    assert await reader.read_tail_lines(3, batch_size=2) == b'004\n005\n006\n'
+    redis.before_transaction = writer.store([b'007\n', b'008\n'])
+    assert await reader.read_tail_lines(5, batch_size=2) == b'005\n006\n007\n008\n'
+    assert await reader.read_range(0) == b'005\n006\n007\n008\n'
+
+
+@pytest.mark.asyncio
+async def test_collect_logs_after_following():
+    redis = FakeRedis()
+    events = []
+    agent = make_dummy_logging_agent(redis, events, numbered_log_stream)
+    await agent._start_log_follower('k1', 'c1')
+    await agent._start_log_follower('k1', 'c1')  # no duplicate followers
+    assert len(agent._log_followers) == 1
+    await asyncio.sleep(0.01)
+    # the followed logs are trimmed to the maximum length.
+    assert redis.lists['containerlog.c1'] == [b'096\n', b'097\n', b'098\n', b'099\n']
+    assert len(redis.lists['containerlog.c1.index']) == 4
+    assert redis.expires == {'containerlog.c1': 86400.0, 'containerlog.c1.index': 86400.0}
+    del redis.commands[:]
+    await AbstractAgent.collect_logs(agent, 'k1', 'c1')
+    # only the tail is stored upon the final collection.
+    assert redis.commands == [
+        ('rpush', 'containerlog.c1'),
+        ('rpush', 'containerlog.c1.index'),
+        ('expire', 'containerlog.c1'),
+        ('expire', 'containerlog.c1.index'),
+    ]
+    assert agent._log_followers == {}
+    assert await agent.read_container_logs('c1', start=396) == b'099\nend'
+    assert await agent.read_container_logs('c1', start=0, end=10) == b''
+
+    # the whole logs are collected again if the followed logs have expired.
+    await agent._start_log_follower('k1', 'c1')
+    await asyncio.sleep(0.01)
+    redis._delete('containerlog.c1', 'containerlog.c1.index')
+    del redis.commands[:]
+    await AbstractAgent.collect_logs(agent, 'k1', 'c1')
+    assert redis.commands[0] == ('delete', 'containerlog.c1')
+    assert await agent.read_container_logs('c1', start=396) == b'099\nend'
+
+
+@pytest.mark.asyncio
+async def test_log_followers_limited():
+    redis = FakeRedis()
+    events = []
+    agent = make_dummy_logging_agent(redis, events, numbered_log_stream, max_followers=2)
+    open_streams = set()
+    container_exited = asyncio.Event()
+
+    async def iter_container_logs(container_id, *, follow):
+        # Each followed stream holds a connection until the container exits.
+        open_streams.add(container_id)
+        try:
+            yield b'%s\n' % container_id.encode()
+            if follow:
+                await container_exited.wait()
+        finally:
+            open_streams.discard(container_id)
+
+    agent.iter_container_logs = iter_container_logs
+    for idx in range(5):
+        await agent._start_log_follower(f'k{idx}', f'c{idx}')
+    await asyncio.sleep(0.01)
+    assert agent._log_followers.keys() == {'k0', 'k1'}
+    assert open_streams == {'c0', 'c1'}
+
+    # the logs of the kernels not followed are collected as a whole.
+    await AbstractAgent.collect_logs(agent, 'k4', 'c4')
+    assert await agent.read_container_logs('c4') == b'c4\n'
+    container_exited.set()
+    for idx in range(2):
+        await AbstractAgent.collect_logs(agent, f'k{idx}', f'c{idx}')
+    assert agent._log_followers == {}
+    assert open_streams == set()
+
+
+@pytest.mark.asyncio
+async def test_log_follower_restarts_and_limits_rate():
+    stored = []
+    interruptions = [ConnectionResetError()]
+    lines = [b'%03d\n' % idx for idx in range(20)]
+
+    async def log_stream():
+        for idx, line in enumerate(lines):
+            yield line
+            if idx == 4 and interruptions:
+                raise interruptions.pop()
+
+    async def store(chunks):
+        stored.extend(chunks)
+
+    async def reset():
+        stored.clear()
+
+    # the interrupted stream is shipped again from the beginning.
+    follower = LogFollower(log_stream, store, reset, chunk_size=8, retry_delay=0)
+    follower.start()
+    assert await follower.stop(1.0) is True
+    assert b''.join(stored) == b''.join(lines)
+    assert follower.offset == 80
+    assert follower.flush() is None
+
+    # only a burst of one second worth of bytes is shipped without delays.
+    stored.clear()
+    follower = LogFollower(log_stream, store, reset, chunk_size=8, rate_limit=40)
+    follower.start()
+    assert await follower.stop(0.1) is False
+    assert 40 <= follower.offset < 80
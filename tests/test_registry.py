@@ -0,0 +1,49 @@
+import uuid
+
+import pytest
+
+from ai.backend.common.types import KernelId
+from ai.backend.agent.registry import KernelRegistryJournal
+
+
+@pytest.mark.asyncio
+async def test_registry_journal_replay(tmp_path):
+    path = tmp_path / 'registry.journal'
+    k1, k2, k3 = (KernelId(uuid.uuid4()) for _ in range(3))
+    journal = KernelRegistryJournal(path)
+    await journal.record_kernel(k1, {'host_ports': [30000]})
+    await journal.record_kernel(k2, {'host_ports': [30001]})
+    await journal.record_kernel(k1, {'host_ports': [30000, 30002]})
+    await journal.forget_kernel(k2)
+    await journal.record_kernel(k3, {'host_ports': [30003]})
+    # simulate a crash in the middle of appending a record.
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'\x00\x00\x01\x00garbage')
+
+    journal = KernelRegistryJournal(path)
+    registry = await journal.load()
+    assert registry == {
+        k1: {'host_ports': [30000, 30002]},
+        k3: {'host_ports': [30003]},
+    }
+    # the torn tail is gone after loading, so new records are replayed as well.
+    await journal.forget_kernel(k3)
+    journal.close()
+    assert (await KernelRegistryJournal(path).load()) == {
+        k1: {'host_ports': [30000, 30002]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_registry_journal_compaction(tmp_path):
+    path = tmp_path / 'registry.journal'
+    kernel_id = KernelId(uuid.uuid4())
+    journal = KernelRegistryJournal(path, compaction_threshold=4)
+    for idx in range(10):
+        await journal.record_kernel(kernel_id, {'seq': idx})
+    size_after_updates = path.stat().st_size
+    journal.snapshot({kernel_id: {'seq': 10}})
+    assert path.stat().st_size <= size_after_updates
+    journal.close()
+    assert (await KernelRegistryJournal(path).load()) == {kernel_id: {'seq': 10}}
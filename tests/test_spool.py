@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from ai.backend.agent.agent import AbstractAgent
+from ai.backend.agent.spool import RedisSpool
+
+
+class Dummy:
+    pass
+
+
+class PausableRedis:
+    """
+    A Redis stand-in which refuses connections while paused.
+    """
+
+    def __init__(self):
+        self.paused = False
+        self.executed = []
+
+    async def execute(self, commands):
+        await asyncio.sleep(0)
+        if self.paused:
+            raise ConnectionRefusedError()
+        self.executed.extend(commands)
+
+
+def make_spool(path, **kwargs):
+    spool = RedisSpool(path, segment_size=kwargs.get('segment_size', 64),
+                       max_size=kwargs.get('max_size', 4096))
+    spool.open()
+    return spool
+
+
+@pytest.mark.asyncio
+async def test_agent_spools_redis_writes_while_paused(tmp_path):
+    redis = PausableRedis()
+    agent = Dummy()
+    agent.redis_spool = make_spool(tmp_path)
+    agent._execute_redis_commands = redis.execute
+    agent.error_monitor = None
+    for name in ('write_redis', 'replay_spool'):
+        setattr(agent, name, getattr(AbstractAgent, name).__get__(agent))
+
+    await agent.write_redis([('rpush', ('events', b'ev1'))])
+    redis.paused = True
+    await agent.write_redis([('rpush', ('events', b'ev2'))])
+    for idx in range(3, 10):
+        await agent.write_redis([('rpush', ('log', b'x' * 20)), ('rpush', ('events', b'ev%d' % idx))])
+    await agent.replay_spool(1.0)
+    assert not agent.redis_spool.is_empty
+    assert agent.redis_spool.to_serializable_dict()['spooled_commands'] == 15
+    assert agent.redis_spool.to_serializable_dict()['segments'] > 1
+
+    redis.paused = False
+    # new writes are spooled behind the pending ones to keep the order.
+    await agent.write_redis([('rpush', ('events', b'ev10'))])
+    await agent.replay_spool(1.0)
+    assert agent.redis_spool.is_empty
+    assert list(tmp_path.iterdir()) == []
+    events = [args[1] for cmd, args in redis.executed if args[0] == 'events']
+    assert events == [b'ev%d' % idx for idx in range(1, 11)]
+    await agent.write_redis([('rpush', ('events', b'ev11'))])
+    assert redis.executed[-1] == ('rpush', ('events', b'ev11'))
+
+
+@pytest.mark.asyncio
+async def test_agent_drops_unspooled_redis_writes(tmp_path):
+    redis = PausableRedis()
+    agent = Dummy()
+    agent.redis_spool = make_spool(tmp_path)
+    agent._execute_redis_commands = redis.execute
+    agent.write_redis = AbstractAgent.write_redis.__get__(agent)
+
+    redis.paused = True
+    await agent.write_redis([('rpush', ('events', b'hb1'))], spool=False)
+    assert agent.redis_spool.is_empty
+    await agent.write_redis([('rpush', ('events', b'ev1'))])
+    assert not agent.redis_spool.is_empty
+
+    # the commands are dropped while the spooled ones are pending.
+    redis.paused = False
+    await agent.write_redis([('rpush', ('events', b'hb2'))], spool=False)
+    assert agent.redis_spool.to_serializable_dict()['spooled_commands'] == 1
+    assert redis.executed == []
+    await agent.redis_spool.replay(redis.execute)
+    await agent.write_redis([('rpush', ('events', b'hb3'))], spool=False)
+    assert redis.executed == [('rpush', ('events', b'ev1')), ('rpush', ('events', b'hb3'))]
+
+
+@pytest.mark.asyncio
+async def test_spool_survives_restarts_and_is_bounded(tmp_path):
+    spool = make_spool(tmp_path, max_size=200)
+    for idx in range(3):
+        assert await spool.append([('publish', ('events', b'ev%d' % idx))])
+    assert not await spool.append([('rpush', ('log', b'x' * 200))])
+    assert spool.to_serializable_dict()['dropped_commands'] == 1
+
+    # a record partially written upon a crash is ignored.
+    segments = sorted(tmp_path.iterdir())
+    with open(segments[-1], 'ab') as f:
+        f.write(b'\x00\x00\x01\x00partial')
+
+    redis = PausableRedis()
+    spool = make_spool(tmp_path, max_size=200)
+    await spool.append([('publish', ('events', b'ev3'))])
+    await spool.replay(redis.execute, batch_size=2)
+    assert redis.executed == [('publish', ('events', b'ev%d' % idx)) for idx in range(4)]
+    assert spool.is_empty
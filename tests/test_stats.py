@@ -1 +1,243 @@
-# currently empty
+from array import array
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from ai.backend.common.types import DeviceId, KernelId, MetricKey
+from ai.backend.agent.stats import (
+    BatchMeasurement,
+    ContainerMeasurement,
+    Measurement,
+    Metric,
+    MetricStore,
+    MetricTypes,
+    NodeMeasurement,
+    StatContext,
+    StatModes,
+    current_diff,
+)
+
+
+class DummyAgent:
+    pass
+
+
+@pytest.mark.asyncio
+async def test_container_sample_fetched_once_per_tick():
+    ctx = StatContext(DummyAgent(), mode=StatModes.DOCKER)
+    call_count = 0
+
+    async def fetch():
+        nonlocal call_count
+        call_count += 1
+        await asyncio.sleep(0.01)
+        return {'value': call_count}
+
+    results = await asyncio.gather(
+        ctx.get_container_sample('docker-api', 'c1', fetch),
+        ctx.get_container_sample('docker-api', 'c1', fetch),
+    )
+    assert results == [{'value': 1}, {'value': 1}]
+    assert call_count == 1
+    assert (await ctx.get_container_sample('docker-api', 'c1', fetch)) == {'value': 1}
+    assert call_count == 1
+
+    # different containers and sample keys are fetched separately.
+    await ctx.get_container_sample('docker-api', 'c2', fetch)
+    await ctx.get_container_sample('cgroup', 'c1', fetch)
+    assert call_count == 3
+
+    # a new tick invalidates the cached samples.
+    ctx._reset_samples()
+    assert (await ctx.get_container_sample('docker-api', 'c1', fetch)) == {'value': 4}
+
+
+def test_metric_store_slot_reuse():
+    store = MetricStore(initial_slots=1)
+    metrics = [
+        Metric('mem', MetricTypes.USAGE, store=store, current=Decimal(i))
+        for i in range(5)
+    ]
+    assert len(store) == 5
+    assert [m.current for m in metrics] == [Decimal(i) for i in range(5)]
+    metrics[2].release()
+    assert len(store) == 4
+    reused = Metric('cpu_util', MetricTypes.UTILIZATION, store=store, current=Decimal(7))
+    assert len(store) == 5
+    assert reused.current == Decimal(7)
+    assert reused.stats.max == Decimal(7)
+    assert reused.capacity is None
+
+
+def test_metric_serialization():
+    store = MetricStore()
+    metric = Metric(
+        'mem', MetricTypes.USAGE, store=store,
+        current=Decimal('100'), capacity=Decimal('400'),
+        unit_hint='bytes',
+        stats_filter=frozenset({'max', 'avg', 'diff'}),
+    )
+    metric.update(Measurement(Decimal('300.5')))
+    assert metric.to_serializable_dict() == {
+        'current': '300.5',
+        'capacity': '400',
+        'pct': '75.12',  # rounded half-to-even as Decimal.quantize() does
+        'unit_hint': 'bytes',
+        'stats.max': '300.5',
+        'stats.avg': '200.25',
+        'stats.diff': '200.5',
+    }
+    stats = metric.stats.to_serializable_dict()
+    assert stats['min'] == '100'
+    assert stats['sum'] == '400.5'
+    assert stats['version'] == 2
+
+
+def test_metric_current_hook():
+    store = MetricStore()
+    metric = Metric(
+        'cpu_used', MetricTypes.USAGE, store=store,
+        current=Decimal('1000'),
+        current_hook=lambda metric: metric.stats.diff,
+    )
+    # the hook is applied only upon updates.
+    assert metric.current == Decimal('1000')
+    metric.update(Measurement(Decimal('1250.125')))
+    assert metric.current == Decimal('250.125')
+    assert metric.to_serializable_dict()['current'] == '250.125'
+    assert metric.to_serializable_dict()['pct'] is None
+
+
+class RecordingPipeline:
+
+    def __init__(self, existing_keys):
+        self.existing_keys = existing_keys
+        self.commands = []
+
+    def set(self, key, value, *, pexpire=0):
+        self.commands.append(('set', key))
+        self.existing_keys.add(key)
+
+    def pexpire(self, key, timeout):
+        self.commands.append(('pexpire', key))
+
+
+class FakeIntrinsicPlugin:
+
+    def __init__(self, values):
+        self.values = values
+
+    async def gather_node_measures(self, ctx):
+        return []
+
+    async def gather_container_measures(self, ctx, container_ids):
+        return [
+            ContainerMeasurement(
+                'mem', MetricTypes.USAGE,
+                per_container={
+                    cid: Measurement(Decimal(self.values[cid]))
+                    for cid in container_ids
+                },
+            ),
+        ]
+
+
+@pytest.mark.asyncio
+async def test_collect_stat_publishes_only_changed_kernels(mocker):
+    existing_keys = set()
+    pipelines = []
+    failures = []
+    agent = DummyAgent()
+    agent.local_config = {
+        'agent': {'id': 'i-test', 'spool': {'latency-budget': 2.0}},
+        'debug': {'log-stats': False},
+    }
+    agent.kernel_registry = {
+        KernelId('k1'): {'container_id': 'c1'},
+        KernelId('k2'): {'container_id': 'c2'},
+    }
+    plugin = FakeIntrinsicPlugin({'c1': 100, 'c2': 200})
+    agent.computers = {'intrinsic': mocker.Mock(instance=plugin)}
+
+    async def execute(builder):
+        if failures:
+            raise failures.pop()
+        pipe = builder()
+        pipelines.append(pipe)
+        return [
+            True if cmd == 'set' else int(key in existing_keys)
+            for cmd, key in pipe.commands
+        ]
+
+    agent.redis_stat_pool = mocker.Mock()
+    agent.redis_stat_pool.pipeline.side_effect = lambda: RecordingPipeline(existing_keys)
+    mocker.patch('ai.backend.agent.stats.redis.execute_with_retries', new=execute)
+    ctx = StatContext(agent, mode=StatModes.DOCKER)
+
+    assert await ctx.collect_stat() == ['k1', 'k2']
+    assert pipelines[-1].commands == [('set', 'i-test'), ('set', 'k1'), ('set', 'k2')]
+
+    # idle kernels only get their TTLs refreshed.
+    assert await ctx.collect_stat() == []
+    assert pipelines[-1].commands == [('set', 'i-test'), ('pexpire', 'k1'), ('pexpire', 'k2')]
+
+    plugin.values['c2'] = 300
+    assert await ctx.collect_stat() == ['k2']
+    assert pipelines[-1].commands == [('set', 'i-test'), ('set', 'k2'), ('pexpire', 'k1')]
+
+    # keys lost in the Redis server are re-published in the next pass.
+    existing_keys.discard('k1')
+    assert await ctx.collect_stat() == []
+    assert await ctx.collect_stat() == ['k1']
+    assert pipelines[-1].commands == [('set', 'i-test'), ('set', 'k1'), ('pexpire', 'k2')]
+
+    # a pass is skipped while Redis is unavailable and then all values are re-published.
+    failures.append(ConnectionRefusedError())
+    assert await ctx.collect_stat() == []
+    assert await ctx.collect_stat() == ['k1', 'k2']
+
+
+class FakeCPUPlugin:
+
+    def __init__(self):
+        self.usage = [100.0, 200.0]
+
+    async def gather_node_measures(self, ctx):
+        return [
+            NodeMeasurement(
+                'cpu_util', MetricTypes.UTILIZATION,
+                current_hook=current_diff,
+                per_node=Measurement(Decimal(str(sum(self.usage))), Decimal(5000)),
+                per_device_batch=BatchMeasurement(
+                    [DeviceId('0'), DeviceId('1')],
+                    array('d', self.usage),
+                    capacity=5000.0,
+                ),
+            ),
+        ]
+
+    async def gather_container_measures(self, ctx, container_ids):
+        return []
+
+
+@pytest.mark.asyncio
+async def test_node_metrics_batch_update(mocker):
+    agent = DummyAgent()
+    agent.kernel_registry = {}
+    plugin = FakeCPUPlugin()
+    agent.computers = {'cpu': mocker.Mock(instance=plugin)}
+    ctx = StatContext(agent, mode=StatModes.DOCKER)
+
+    await ctx._update_node_metrics()
+    device_metrics = ctx.device_metrics[MetricKey('cpu_util')]
+    assert device_metrics.keys() == {'0', '1'}
+    assert device_metrics[DeviceId('1')].current == Decimal(200)
+    assert device_metrics[DeviceId('1')].capacity == Decimal(5000)
+
+    plugin.usage = [600.0, 450.0]
+    await ctx._update_node_metrics()
+    assert device_metrics[DeviceId('0')].current == Decimal(500)
+    assert device_metrics[DeviceId('1')].current == Decimal(250)
+    assert device_metrics[DeviceId('1')].to_serializable_dict()['pct'] == '5'
+    assert ctx.node_metrics[MetricKey('cpu_util')].current == Decimal(750)
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from ai.backend.agent.timing import PhaseLatencyHistogram, PhaseTimer, phase
+
+
+@pytest.mark.asyncio
+async def test_phase_timer_records_active_spans():
+
+    async def spawn():
+        # backends time their own phases via the active timer.
+        with phase('container-start'):
+            await asyncio.sleep(0.01)
+
+    with phase('ignored'):
+        pass  # no active timer
+    timer = PhaseTimer('create_kernel')
+    with timer.activate():
+        with phase('image-check'):
+            pass
+        await asyncio.create_task(spawn())
+        for _ in range(2):
+            with phase('allocation'):
+                await asyncio.sleep(0.01)
+    with phase('ignored'):
+        pass
+    timer.finish()
+    spans = timer.to_serializable_dict()
+    assert spans.keys() == {'image-check', 'container-start', 'allocation', 'total'}
+    assert spans['allocation'] >= 0.02
+    assert spans['total'] >= spans['allocation'] + spans['container-start']
+
+
+def test_phase_latency_histogram_window():
+    histogram = PhaseLatencyHistogram(window_size=4)
+    for elapsed in (0.002, 0.2, 0.3, 2.0, 20.0, 40.0):
+        timer = PhaseTimer('clean_kernel')
+        timer.spans['scratch-deletion'] = elapsed
+        histogram.observe(timer)
+    summary = histogram.to_serializable_dict()['clean_kernel']['scratch-deletion']
+    # only the latest 4 samples are kept.
+    assert summary['count'] == 4
+    assert summary['max'] == 40.0
+    assert summary['p50'] == 2.0
+    assert summary['buckets']['0.005'] == 0
+    assert summary['buckets']['0.5'] == 1
+    assert summary['buckets']['2.5'] == 1
+    assert summary['buckets']['30.0'] == 1
+    assert summary['buckets']['60.0'] == 1
+    assert sum(summary['buckets'].values()) == 4
+
+
+def test_phase_latency_histogram_tracks_failures():
+    histogram = PhaseLatencyHistogram()
+    with histogram.track('create_kernel') as timer:
+        with phase('image-pull'):
+            pass
+    assert timer.operation == 'create_kernel'
+    with pytest.raises(RuntimeError):
+        with histogram.track('create_kernel'):
+            with phase('image-pull'):
+                raise RuntimeError('pull failed')
+    summary = histogram.to_serializable_dict()
+    assert summary['create_kernel']['image-pull']['count'] == 1
+    assert summary['create_kernel_failed']['image-pull']['count'] == 1
+    assert summary['create_kernel_failed']['total']['count'] == 1
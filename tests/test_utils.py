@@ -1,3 +1,5 @@
+import os
+from pathlib import Path
 import tempfile
 
 import pytest
@@ -88,3 +90,116 @@ def test_update_nested_dict():
     utils.update_nested_dict(o, {'a': [4, 5], 'b': 6})
     assert o['a'] == [1, 2, 4, 5]
     assert o['b'] == 6
+
+
+def test_get_cgroup_path(mocker):
+    cid = 'abcdef0123'
+    mocker.patch.object(utils, 'get_cgroup_version', return_value='1')
+    assert utils.get_cgroup_path('memory', cid) == \
+        Path(f'/sys/fs/cgroup/memory/docker/{cid}')
+    assert utils.get_cgroup_path('memory', cid, driver='systemd') == \
+        Path(f'/sys/fs/cgroup/memory/system.slice/docker-{cid}.scope')
+    mocker.patch.object(utils, 'get_cgroup_version', return_value='2')
+    assert utils.get_cgroup_path('memory', cid) == \
+        Path(f'/sys/fs/cgroup/docker/{cid}')
+    assert utils.get_cgroup_path('memory', cid, driver='systemd') == \
+        Path(f'/sys/fs/cgroup/system.slice/docker-{cid}.scope')
+
+
+def test_parse_cgroup_stat():
+    stat = utils.parse_cgroup_stat('usage_usec 12345\nuser_usec 10000\nsystem_usec 2345\n')
+    assert stat['usage_usec'] == 12345
+    assert stat['system_usec'] == 2345
+
+
+def test_parse_cgroup_io_stat():
+    assert utils.parse_cgroup_io_stat(
+        '8:0 rbytes=13918208 wbytes=0 rios=340 wios=0 dbytes=0 dios=0\n'
+        '253:0 rbytes=4096 wbytes=8192 rios=1 wios=2 dbytes=0 dios=0\n'
+    ) == (13918208 + 4096, 8192)
+    assert utils.parse_cgroup_io_stat('') == (0, 0)
+
+
+def test_cgroup_file_cache(tmp_path):
+    cache = utils.CgroupFileCache()
+    path1 = tmp_path / 'memory.current'
+    path2 = tmp_path / 'cpu.stat'
+    path1.write_text('1024\n')
+    path2.write_text('usage_usec 5\n')
+    assert cache.read_text('c1', path1) == '1024\n'
+    assert cache.read_text('c2', path2) == 'usage_usec 5\n'
+    # the cached file descriptor is reused and re-read from the beginning.
+    with open(path1, 'r+') as f:
+        f.write('2048\n')
+    assert cache.read_text('c1', path1) == '2048\n'
+    assert cache._fds.keys() == {'c1', 'c2'}
+
+    cache.invalidate('c1')
+    assert cache._fds.keys() == {'c2'}
+    cache.retain(['c3'])
+    assert not cache._fds
+
+    with pytest.raises(IOError):
+        cache.read_text('c1', tmp_path / 'nonexistent')
+
+
+def test_cgroup_file_cache_closes_files_after_reads(tmp_path, mocker):
+    cache = utils.CgroupFileCache()
+    path = tmp_path / 'memory.current'
+    path.write_text('1024\n')
+    orig_pread = os.pread
+    read_fds = []
+
+    def pread_and_invalidate(fd, size, offset):
+        # the container dies while its file is being read.
+        cache.invalidate('c1')
+        read_fds.append(fd)
+        return orig_pread(fd, size, offset)
+
+    mocker.patch.object(utils.os, 'pread', side_effect=pread_and_invalidate)
+    assert cache.read_text('c1', path) == '1024\n'
+    assert not cache._fds and not cache._num_readers and not cache._closing
+    with pytest.raises(OSError):
+        os.fstat(read_fds[0])
+
+
+def test_parse_proc_net_dev():
+    content = (
+        'Inter-|   Receive                                                |  Transmit\n'
+        ' face |bytes    packets errs drop fifo frame compressed multicast|'
+        'bytes    packets errs drop fifo colls carrier compressed\n'
+        '    lo:     620       8    0    0    0     0          0         0'
+        '      620       8    0    0    0     0       0          0\n'
+        '  eth0:   18733     144    0    0    0     0          0         0'
+        '    11382     103    0    0    0     0       0          0\n'
+        '  eth1:1000000000    144    0    0    0     0          0         0'
+        '       18       1    0    0    0     0       0          0\n'
+    )
+    assert utils.parse_proc_net_dev(content) == (1000018733, 11400)
+
+
+def test_parse_pressure():
+    pressure = utils.parse_pressure(
+        'some avg10=1.53 avg60=0.87 avg300=0.20 total=1234567\n'
+        'full avg10=0.25 avg60=0.10 avg300=0.02 total=89012\n'
+    )
+    assert pressure == utils.PressureStat(1.53, 1234567, 0.25, 89012)
+    # the node-level CPU pressure may not have the "full" line.
+    pressure = utils.parse_pressure('some avg10=0.00 avg60=0.00 avg300=0.00 total=42\n')
+    assert pressure == utils.PressureStat(0.0, 42, 0.0, 0)
+    assert utils.read_pressure('/nonexistent/pressure/cpu') is None
+
+
+def test_read_proc_stat_cpu_usage(tmp_path, mocker):
+    mocker.patch.object(utils.os, 'sysconf', return_value=100)
+    path = tmp_path / 'stat'
+    path.write_text(
+        'cpu  3357 10 4313 1362393 0 0 0 0 0 0\n'
+        'cpu0 1679 10 2150 681160 0 0 0 0 0 0\n'
+        'cpu2 1678 0 2163 681233 0 0 0 0 0 0\n'
+        'intr 114930548 113199788 3 0 5 263 0 4\n'
+        'ctxt 1990473\n'
+    )
+    core_ids, usage = utils.read_proc_stat_cpu_usage(path)
+    assert core_ids == [0, 2]
+    assert list(usage) == [38290.0, 38410.0]
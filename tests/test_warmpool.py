@@ -0,0 +1,112 @@
+import uuid
+
+from ai.backend.common.types import KernelId
+from ai.backend.agent.warmpool import WarmPool, get_warm_pool_key
+
+
+def make_request(**overrides):
+    kernel_config = {
+        'image': {
+            'canonical': 'index.docker.io/lablup/python:3.8-ubuntu18.04',
+            'digest': 'sha256:1234',
+            'labels': {},
+        },
+        'cluster_hostname': 'main1',
+        'environ': {'LANG': 'C.UTF-8'},
+        'mounts': [],
+        'resource_slots': {'cpu': '1', 'mem': '1073741824', 'cuda.device': '0'},
+        'resource_opts': {},
+        'internal_data': None,
+        'preopen_ports': [],
+    }
+    kernel_config.update(overrides)
+    cluster_info = {
+        'size': 1,
+        'network_name': None,
+        'ssh_keypair': None,
+    }
+    return kernel_config, cluster_info
+
+
+def test_warm_pool_key_eligibility():
+    kernel_config, cluster_info = make_request()
+    key = get_warm_pool_key(kernel_config, cluster_info)
+    assert key is not None
+    assert key.cpu_count is None
+    # resource limits of cpu and mem are adjusted upon adoption.
+    kernel_config, cluster_info = make_request(resource_slots={'cpu': '4', 'mem': '2147483648'})
+    assert get_warm_pool_key(kernel_config, cluster_info) == key
+
+    kernel_config, cluster_info = make_request(mounts=[['vf', 'vf-id', 'rw']])
+    assert get_warm_pool_key(kernel_config, cluster_info) is None
+    kernel_config, cluster_info = make_request(
+        resource_slots={'cpu': '1', 'mem': '1073741824', 'cuda.device': '1'})
+    assert get_warm_pool_key(kernel_config, cluster_info) is None
+    kernel_config, cluster_info = make_request(internal_data={'dotfiles': [{'path': '.vimrc'}]})
+    assert get_warm_pool_key(kernel_config, cluster_info) is None
+    kernel_config, cluster_info = make_request()
+    cluster_info['size'] = 2
+    assert get_warm_pool_key(kernel_config, cluster_info) is None
+
+    kernel_config, cluster_info = make_request()
+    kernel_config['image']['labels'] = {'ai.backend.envs.corecount': 'OMP_NUM_THREADS'}
+    assert get_warm_pool_key(kernel_config, cluster_info).cpu_count == '1'
+
+
+def test_warm_pool_bookkeeping():
+    pool = WarmPool(size=2, max_keys=1)
+    config_a, cluster_a = make_request()
+    config_b, cluster_b = make_request(environ={'LANG': 'ko_KR.UTF-8'})
+    key_a = get_warm_pool_key(config_a, cluster_a)
+    key_b = get_warm_pool_key(config_b, cluster_b)
+    pool.note_usage(key_a, config_a, cluster_a)
+    assert pool.get_shortages() == [(key_a, config_a, cluster_a)] * 2
+
+    kid1, kid2 = KernelId(uuid.uuid4()), KernelId(uuid.uuid4())
+    pool.begin_warming(kid1, key_a)
+    pool.begin_warming(kid2, key_a)
+    assert pool.get_shortages() == []
+    pool.set_spawned(kid1, 'kernel-1')
+    pool.set_spawned(kid2, 'kernel-2')
+    assert sorted(pool.kernels()) == ['kernel-1', 'kernel-2']
+    assert pool.finish_warming(kid1, success=True) == 'kernel-1'
+    assert pool.finish_warming(kid2, success=False) == 'kernel-2'
+    assert pool.kernels() == ['kernel-1']
+    assert pool.get_shortages() == [(key_a, config_a, cluster_a)]
+
+    assert pool.claim(key_b) is None
+    assert pool.claim(key_a) == 'kernel-1'
+    assert pool.claim(key_a) is None
+
+    # the kernels of keys no longer frequently requested are taken out.
+    kid3 = KernelId(uuid.uuid4())
+    pool.begin_warming(kid3, key_a)
+    pool.set_spawned(kid3, 'kernel-3')
+    pool.finish_warming(kid3, success=True)
+    for _ in range(3):
+        pool.note_usage(key_b, config_b, cluster_b)
+    assert pool.take_unwanted() == ['kernel-3']
+    assert pool.evict() is None
+
+
+def test_warm_pool_remove_terminated():
+
+    class FakeKernel:
+        def __init__(self, kernel_id):
+            self.kernel_id = kernel_id
+
+    pool = WarmPool(size=2, max_keys=1)
+    config, cluster_info = make_request()
+    key = get_warm_pool_key(config, cluster_info)
+    pool.note_usage(key, config, cluster_info)
+    kid1, kid2 = KernelId(uuid.uuid4()), KernelId(uuid.uuid4())
+    kernels = {kid1: FakeKernel(kid1), kid2: FakeKernel(kid2)}
+    for kid, kernel in kernels.items():
+        pool.begin_warming(kid, key)
+        pool.set_spawned(kid, kernel)
+        pool.finish_warming(kid, success=True)
+
+    assert pool.remove(kid1) is kernels[kid1]
+    assert pool.remove(kid1) is None
+    assert pool.claim(key) is kernels[kid2]
+    assert pool.remove(kid2) is None  # already claimed